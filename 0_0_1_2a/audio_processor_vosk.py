@@ -1,145 +1,147 @@
 import threading
-import queue
 import time
-import numpy as np
-import soundcard as sc
 import vosk
 from PyQt5.QtCore import pyqtSignal, QObject
-import json
 from datetime import datetime
+from audio_sources import default_sources, is_exhausted
+from source_recognizer import SourceRecognizer, SOURCE_LABELS, load_vocabulary
+from transcript_store import TranscriptStore
 
 # Константы
 RATE = 16000
 CHANNELS = 1
 CHUNK_SIZE = RATE // 4  # 0.25 секунды аудио
 DISPLAY_WINDOW = 30  # Показывать последние 30 секунд транскрибации
+STATS_INTERVAL = 5  # Как часто сообщать задержку подписей и RTF, секунд
+SOURCE_NAMES = ("speaker", "mic")  # Порядок совпадает с self.sources
 
 
 class Signals(QObject):
     text_updated = pyqtSignal(str)
     debug_log = pyqtSignal(str)
-
-
-class RecognizedSegment:
-    def __init__(self, text, timestamp):
-        self.text = text
-        self.timestamp = timestamp  # Используем один timestamp для упрощения
-
-    def __str__(self):
-        return self.text
+    latency_updated = pyqtSignal(float)  # Задержка подписей в секундах
 
 
 class AudioProcessor(threading.Thread):
-    def __init__(self, model_path):
+    def __init__(self, model_path, sources=None, vocabulary=None):
         super().__init__()
         self.daemon = True
-        self.audio_queue = queue.Queue()
         self.signals = Signals()
         self.running = True
         self.model_path = model_path
-        self.segments = []  # Список сегментов с временными метками
+        self.sources = sources or default_sources()  # (loopback, микрофон)
+        self.recognizers = []  # По распознавателю на источник, создаются в run()
+        self.vocabulary = None  # Словарь предметной области (None - открытый словарь)
+        self.set_vocabulary(vocabulary)
+        # Распознанный текст с временными метками и подписями источников
+        self.transcript = TranscriptStore(labels=SOURCE_LABELS)
         self.last_update_time = time.time()
-        self.partial_text = ""
         self.current_text = ""  # Текущий полный текст для отображения
 
     def run(self):
         model = vosk.Model(self.model_path)
-        rec = vosk.KaldiRecognizer(model, RATE)
-        rec.SetWords(True)
+        # Собеседник и микрофон распознаются отдельно и параллельно, без смешивания
+        self.recognizers = [SourceRecognizer(model, name, self._on_final, self._on_partial, grammar=self.vocabulary)
+                            for name in SOURCE_NAMES]
+        for recognizer in self.recognizers:
+            recognizer.start()
 
         audio_thread = threading.Thread(target=self.record_audio)
         audio_thread.daemon = True
         audio_thread.start()
 
-        while self.running:
-            try:
-                audio_data = self.audio_queue.get(timeout=1)
-                current_time = time.time()
-
-                if rec.AcceptWaveform(audio_data):
-                    result = json.loads(rec.Result())
-                    if "text" in result and result["text"].strip():
-                        # Добавляем новый сегмент с текущим временем
-                        segment = RecognizedSegment(result["text"], current_time)
-                        self.segments.append(segment)
-
-                        # Обновляем отображаемый текст
-                        self.update_display_text()
-
-                        # Логируем для отладки
-                        timestamp_str = datetime.fromtimestamp(current_time).strftime('%H:%M:%S')
-                        self.signals.debug_log.emit(f"[{timestamp_str}] {self.current_text}")
-                else:
-                    partial_result = json.loads(rec.PartialResult())
-                    self.partial_text = partial_result.get("partial", "")
-
-                    # Обновляем текст с частичным результатом не чаще чем раз в 0.3 секунды
-                    if current_time - self.last_update_time > 0.3 and self.partial_text:
-                        self.update_display_text()
-                        timestamp_str = datetime.fromtimestamp(current_time).strftime('%H:%M:%S')
-                        self.signals.debug_log.emit(f"[{timestamp_str}] {self.current_text}")
-
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Ошибка распознавания: {e}")
-                import traceback
-                traceback.print_exc()
+        # Распознаватели работают сами; здесь только раз в STATS_INTERVAL сообщаем их нагрузку
+        while self.running and any(r.is_alive() for r in self.recognizers):
+            for recognizer in self.recognizers:
+                recognizer.join(STATS_INTERVAL / len(self.recognizers))
+            self.signals.debug_log.emit(" | ".join(r.format() for r in self.recognizers))
 
-    def update_display_text(self):
-        current_time = time.time()
-        self.last_update_time = current_time
+    def _on_final(self, recognizer, result, current_time):
+        if "text" in result and result["text"].strip():
+            # Добавляем новый сегмент с текущим временем
+            self.transcript.append(result["text"], current_time, source=recognizer.source)
+            self.transcript.set_partial("", recognizer.source)
 
-        # Очищаем старые сегменты (старше DISPLAY_WINDOW секунд)
-        cutoff_time = current_time - DISPLAY_WINDOW
-        self.segments = [seg for seg in self.segments if seg.timestamp > cutoff_time]
+            # Обновляем отображаемый текст
+            self.update_display_text()
 
-        # Формируем текст из последних сегментов
-        recent_texts = [seg.text for seg in self.segments]
-        display_text = " ".join(recent_texts)
+            # Логируем для отладки
+            timestamp_str = datetime.fromtimestamp(current_time).strftime('%H:%M:%S')
+            self.signals.debug_log.emit(f"[{timestamp_str}] {self.current_text}")
+        self.signals.latency_updated.emit(recognizer.latency.last)
 
-        # Добавляем частичный результат, если есть
-        if self.partial_text:
-            if display_text:
-                display_text += " " + self.partial_text
-            else:
-                display_text = self.partial_text
+    def _on_partial(self, recognizer, text):
+        self.transcript.set_partial(text, recognizer.source)
+        current_time = time.time()
 
-        self.current_text = display_text.strip()
+        # Обновляем текст с частичным результатом не чаще чем раз в 0.3 секунды
+        if current_time - self.last_update_time > 0.3 and text:
+            self.update_display_text()
+            timestamp_str = datetime.fromtimestamp(current_time).strftime('%H:%M:%S')
+            self.signals.debug_log.emit(f"[{timestamp_str}] {self.current_text}")
+        self.signals.latency_updated.emit(recognizer.latency.last)
+
+    def set_vocabulary(self, vocabulary):
+        """Словарь - путь к файлу или список фраз; None возвращает открытый словарь.
+        Модель не перезагружается, распознаватели переключаются на следующем фрагменте"""
+        if isinstance(vocabulary, str):
+            vocabulary = load_vocabulary(vocabulary)
+        self.vocabulary = vocabulary or None
+        for recognizer in self.recognizers:
+            recognizer.set_grammar(self.vocabulary)
+
+    def caption_latency(self):
+        """Текущая задержка подписей в секундах (по самому отстающему источнику)"""
+        return max((r.latency.last for r in self.recognizers), default=0.0)
+
+    def rtf(self):
+        """Доля реального времени, которую занимает распознавание, по источникам"""
+        return {r.source: r.rtf() for r in self.recognizers}
+
+    def update_display_text(self):
+        current_time = time.time()
+        self.last_update_time = current_time
+
+        # Последние DISPLAY_WINDOW секунд и частичный результат - один срез готовой строки
+        self.current_text = self.transcript.display_text(current_time - DISPLAY_WINDOW)
         self.signals.text_updated.emit(self.current_text)
 
     def get_text_for_period(self, seconds):
-        current_time = time.time()
-        cutoff_time = current_time - seconds
-        period_segments = [seg for seg in self.segments if seg.timestamp >= cutoff_time]
-        period_texts = [seg.text for seg in period_segments]
-        full_text = " ".join(period_texts)
-        return full_text.strip()
+        return self.transcript.text_since(time.time() - seconds)
 
     def record_audio(self):
         try:
-            speaker = sc.default_speaker()
-            loopback_mic = sc.get_microphone(speaker.id, include_loopback=True)
-            default_mic = sc.default_microphone()
+            speaker_source, mic_source = self.sources
 
             print("Запись звука началась...")
             self.signals.debug_log.emit("Запись звука началась...")
 
-            with loopback_mic.recorder(samplerate=RATE, channels=CHANNELS) as speaker_rec, \
-                    default_mic.recorder(samplerate=RATE, channels=CHANNELS) as mic_rec:
+            with speaker_source.recorder(samplerate=RATE, channels=CHANNELS) as speaker_rec, \
+                    mic_source.recorder(samplerate=RATE, channels=CHANNELS) as mic_rec:
+                # Файлы и синтетика без темпа реального времени ждут места в очереди, живой звук - нет
+                block = not getattr(speaker_rec, "realtime", True)
                 while self.running:
                     speaker_data = speaker_rec.record(numframes=CHUNK_SIZE)
                     mic_data = mic_rec.record(numframes=CHUNK_SIZE)
-                    mixed_data = np.mean([speaker_data, mic_data], axis=0)
-                    audio_data = (mixed_data * 32767).astype(np.int16).tobytes()
-                    self.audio_queue.put(audio_data)
-                    time.sleep(0.01)  # Небольшая пауза для снижения нагрузки
+                    if is_exhausted(speaker_rec) or is_exhausted(mic_rec):
+                        break
+                    captured_at = time.monotonic()
+                    for recognizer, data in zip(self.recognizers, (speaker_data, mic_data)):
+                        recognizer.put(data, captured_at, block=block)
+                    if not block:
+                        time.sleep(0.01)  # Небольшая пауза для снижения нагрузки; файлы темп задает очередь
 
         except Exception as e:
             print(f"Ошибка записи звука: {e}")
             self.signals.debug_log.emit(f"Ошибка записи звука: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            # Распознаватели дорабатывают очередь и завершаются
+            for recognizer in self.recognizers:
+                recognizer.finish()
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
+        for recognizer in self.recognizers:
+            recognizer.stop()
\ No newline at end of file
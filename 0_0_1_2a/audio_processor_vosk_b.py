@@ -1,105 +1,113 @@
-import threading, queue, time, json, collections
+import threading, time
 from datetime import datetime
 
-import numpy as np
-import soundcard as sc
 import vosk
 from PyQt5.QtCore import pyqtSignal, QObject
 
+from audio_sources import default_sources, is_exhausted
+from source_recognizer import SourceRecognizer, SOURCE_LABELS, load_vocabulary
+from transcript_store import TranscriptStore
+
 RATE        = 16_000
 CHANNELS    = 1
 CHUNK_SIZE  = RATE // 4          # 0.25 c
 PARTIAL_GUI_DT = 0.25           # не чаще, c
 WINDOW_SEC  = 30
+STATS_DT    = 5                  # как часто сообщать задержку подписей и RTF, c
+SOURCES     = ('speaker', 'mic')  # в порядке self.sources
 
 # -----------------------------------------------------
 class Signals(QObject):
     text_updated = pyqtSignal(str)   # для GUI
     debug_log    = pyqtSignal(str)   # в консоль
-
-# -----------------------------------------------------
-class Word:
-    __slots__ = ('txt', 'ts')
-    def __init__(self, txt, ts): self.txt, self.ts = txt, ts
+    latency_updated = pyqtSignal(float)  # задержка подписей, c
 
 # -----------------------------------------------------
 class AudioProcessor(threading.Thread):
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, sources=None, vocabulary=None):
         super().__init__(daemon=True)
         self.signals   = Signals()
+        self.sources   = sources or default_sources()   # (loopback, mic)
         self.model     = vosk.Model(model_path)
-        self.rec       = vosk.KaldiRecognizer(self.model, RATE)
-        self.rec.SetWords(True)
-
-        self.audio_q   = queue.Queue()
+        # по распознавателю на источник: собеседник и микрофон не смешиваются
+        if isinstance(vocabulary, str):   # путь к файлу или список фраз
+            vocabulary = load_vocabulary(vocabulary)
+        self.recognizers = [SourceRecognizer(self.model, name, self._on_final, self._on_partial, RATE,
+                                             words=True, grammar=vocabulary)
+                            for name in SOURCES]
         self.running   = True
 
-        self.words     = collections.deque()   # deque[Word]
-        self.partial   = ''
+        self.words     = TranscriptStore(labels=SOURCE_LABELS)   # слова с метками и источником
         self.last_gui  = 0.0
-        self.seen_total_words = 0             # diff-счетчик
+        self._gui_lock = threading.Lock()     # колбэки приходят из двух потоков
 
     # --------------  public API  ----------------------
     def get_text_for_period(self, sec: int) -> str:
-        now = time.time()
-        return ' '.join(w.txt for w in self.words if w.ts >= now-sec)
+        return self.words.text_since(time.time() - sec)
+
+    def caption_latency(self) -> float:
+        return max(r.latency.last for r in self.recognizers)
+
+    def rtf(self) -> dict:
+        return {r.source: r.rtf() for r in self.recognizers}
+
+    def set_vocabulary(self, vocabulary):
+        """горячая замена словаря без перезагрузки модели; None - открытый словарь"""
+        if isinstance(vocabulary, str):
+            vocabulary = load_vocabulary(vocabulary)
+        for r in self.recognizers:
+            r.set_grammar(vocabulary)
 
     def stop(self):
         self.running = False
+        for r in self.recognizers:
+            r.stop()
 
     # --------------  thread run  ----------------------
     def run(self):
+        for r in self.recognizers:
+            r.start()
         threading.Thread(target=self._record, daemon=True).start()
-        while self.running:
-            try:
-                data = self.audio_q.get(timeout=1)
-            except queue.Empty:
-                continue
-
-            now = time.time()
-            if self.rec.AcceptWaveform(data):
-                res = json.loads(self.rec.Result())
-                self._append_final(res, now)
-                self._update_gui(now, force=True)
-            else:
-                part = json.loads(self.rec.PartialResult())['partial']
-                self.partial = part
-                self._update_gui(now)
+        # распознают потоки источников; здесь только отчет раз в STATS_DT
+        while self.running and any(r.is_alive() for r in self.recognizers):
+            for r in self.recognizers:
+                r.join(STATS_DT / len(self.recognizers))
+            self.signals.debug_log.emit(' | '.join(r.format() for r in self.recognizers))
+
+    # --------------------------------------------------
+    def _on_final(self, rec: SourceRecognizer, res: dict, wall_time: float):
+        self._append_final(rec.source, res, wall_time)
+        self.signals.latency_updated.emit(rec.latency.last)
+        self._update_gui(wall_time, force=True)
+
+    def _on_partial(self, rec: SourceRecognizer, part: str):
+        self.words.set_partial(part, rec.source)
+        self.signals.latency_updated.emit(rec.latency.last)
+        self._update_gui(time.time())
+
     # --------------------------------------------------
-    def _append_final(self, res: dict, wall_time: float):
+    def _append_final(self, source: str, res: dict, wall_time: float):
         """
-        Добавляем ТОЛЬКО новые слова из final-результата.
+        Final-результат содержит слова только своей фразы.
         start/end внутри res идут в секундах С МОМЕНТА СТАРТА recognizer’а,
         поэтому приводим их к абсолютному времени «сейчас».
         """
         words_json = res.get('result', [])
-        if not words_json:
-            return
-
-        # отсекаем уже увиденные
-        new_words = words_json[self.seen_total_words:]
-        self.seen_total_words = len(words_json)
-
-        for w in new_words:
-            ts = wall_time - (words_json[-1]['end'] - w['start'])
-            self.words.append(Word(w['word'], ts))
-
-        # чистим окно 30 с
-        cutoff = wall_time - WINDOW_SEC
-        while self.words and self.words[0].ts < cutoff:
-            self.words.popleft()
+        if words_json:
+            for w in words_json:
+                ts = wall_time - (words_json[-1]['end'] - w['start'])
+                self.words.append(w['word'], ts, source=source)
 
-        self.partial = ''   # partial обнуляем после финала
+        self.words.set_partial('', source)   # partial обнуляем после финала
 
     # --------------------------------------------------
     def _update_gui(self, now: float, force=False):
-        if not force and now - self.last_gui < PARTIAL_GUI_DT:
-            return
-        self.last_gui = now
+        with self._gui_lock:
+            if not force and now - self.last_gui < PARTIAL_GUI_DT:
+                return
+            self.last_gui = now
 
-        text = ' '.join(w.txt for w in self.words)
-        if self.partial:
-            text = f'{text} {self.partial}'.strip()
+        text = self.words.display_text(now - WINDOW_SEC)
 
         self.signals.text_updated.emit(text)
         stamp = datetime.fromtimestamp(now).strftime('%H:%M:%S')
@@ -108,28 +116,23 @@ class AudioProcessor(threading.Thread):
     # --------------  audio capture  -------------------
     def _record(self):
         try:
-            speaker = sc.default_speaker()
-            loopback = sc.get_microphone(speaker.id, include_loopback=True)
-            mic      = sc.default_microphone()
+            sp_src, mic_src = self.sources
 
-            with loopback.recorder(RATE, CHANNELS) as sp_rec,\
-                 mic     .recorder(RATE, CHANNELS) as mic_rec:
+            with sp_src .recorder(RATE, CHANNELS) as sp_rec,\
+                 mic_src.recorder(RATE, CHANNELS) as mic_rec:
                 self.signals.debug_log.emit('Запись звука началась…')
+                # без темпа реального времени (файл) ждем место, иначе теряем старое
+                block = not getattr(sp_rec, 'realtime', True)
                 while self.running:
                     sp = sp_rec.record(CHUNK_SIZE)
                     mc = mic_rec.record(CHUNK_SIZE)
-                    data = self._mix(sp, mc)
-                    self.audio_q.put(data)
+                    if is_exhausted(sp_rec) or is_exhausted(mic_rec):
+                        break
+                    now = time.monotonic()
+                    for r, data in zip(self.recognizers, (sp, mc)):
+                        r.put(data, now, block=block)
         except Exception as e:
             self.signals.debug_log.emit(f'Ошибка записи: {e}')
-
-    # --------------------------------------------------
-    @staticmethod
-    def _mix(a: np.ndarray, b: np.ndarray) -> bytes:
-        """
-        Быстро складываем два float32-массива, нормируем, отдаем int16 bytes.
-        """
-        mix = a + b
-        maxv = np.max(np.abs(mix)) or 1.0
-        mix = (mix / maxv * 32767).astype(np.int16)
-        return mix.tobytes()
\ No newline at end of file
+        finally:
+            for r in self.recognizers:
+                r.finish()
@@ -2,17 +2,18 @@ import threading
 import queue
 import time
 import numpy as np
-import soundcard as sc
 import whisper
 from PyQt5.QtCore import pyqtSignal, QObject
-import gc  # Добавляем сборщик мусора
+from audio_sources import default_sources, is_exhausted
+from segment_index import SegmentIndex
+from streaming_policy import LocalAgreement, WINDOW_SECONDS
 
 # Константы
 RATE = 16000
 CHANNELS = 1
 CHUNK_SIZE = RATE // 4  # 0.25 секунды аудио
-MAX_AUDIO_SECONDS = 15  # Уменьшаем с 30 до 10 секунд
-MAX_SAMPLES = int(MAX_AUDIO_SECONDS * RATE)
+DISPLAY_SECONDS = 10  # Сколько последних секунд подтвержденного текста показывать
+HISTORY_SECONDS = 30  # Храним историю только за 30 секунд
 
 
 class Signals(QObject):
@@ -30,18 +31,23 @@ class RecognizedSegment:
 
 
 class AudioProcessor(threading.Thread):
-    def __init__(self, model_name="small"):  # Используем tiny модель для экономии памяти
+    def __init__(self, model_name="small", sources=None):  # Используем tiny модель для экономии памяти
         super().__init__()
         self.daemon = True
         self.audio_queue = queue.Queue()
         self.signals = Signals()
         self.running = True
         self.model = whisper.load_model(model_name)
-        self.segments_dict = {}
+        self.sources = sources or default_sources()  # (loopback, микрофон)
+        self.segments = SegmentIndex()  # Подтвержденные сегменты по времени
         self.last_update_time = time.time()
-        self.last_recognition_time = time.time()
-        self.audio_buffer = []
+        # Растущий буфер перераспознается каждую секунду, подтверждается только устоявшийся текст
+        self.policy = LocalAgreement(self._transcribe, RATE)
+        # Нормализованная копия буфера для декодера; выделяется один раз
+        self._scratch = np.zeros(int(WINDOW_SECONDS * RATE), dtype=np.float32)
+        self.stream_origin = None  # Время time.time() первого сэмпла потока
         self.recognition_start_time = None
+        self.record_finished = False
 
     def run(self):
         audio_thread = threading.Thread(target=self.record_audio)
@@ -50,133 +56,87 @@ class AudioProcessor(threading.Thread):
 
         while self.running:
             try:
-                # Обрабатываем очередь, но не накапливаем слишком много данных
-                while not self.audio_queue.empty() and len(self.audio_buffer) < MAX_AUDIO_SECONDS * 4:
-                    try:
-                        audio_data, timestamp = self.audio_queue.get(timeout=0.1)
-                        self.audio_buffer.append((audio_data, timestamp))
-                    except queue.Empty:
-                        break
-
-                current_time = time.time()
-
-                # Обрабатываем каждые 5 секунд
-                if current_time - self.last_recognition_time > 5 and self.audio_buffer:
-                    # Берем только последние 5 секунд аудио
-                    cutoff_time = current_time - 5
-                    recent_audio = []
-                    recent_timestamps = []
-
-                    for chunk, ts in self.audio_buffer:
-                        if ts > cutoff_time:
-                            recent_audio.append(chunk)
-                            recent_timestamps.append(ts)
-
-                    if recent_audio:
-                        try:
-                            # Создаем временный файл для аудио вместо обработки в памяти
-                            import tempfile
-                            import soundfile as sf
-
-                            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                                temp_filename = temp_file.name
-
-                            audio_array = np.concatenate(recent_audio)
-                            # Нормализуем аудио
-                            if np.max(np.abs(audio_array)) > 0:
-                                audio_array = audio_array / np.max(np.abs(audio_array))
-
-                            # Сохраняем во временный файл
-                            sf.write(temp_filename, audio_array, RATE)
-
-                            # Освобождаем память
-                            del audio_array
-                            gc.collect()
-
-                            # Транскрибируем из файла
-                            result = self.model.transcribe(
-                                temp_filename,
-                                language="ru",
-                                beam_size=1,
-                                fp16=False,
-                                temperature=0  # Уменьшает вариативность и потребление памяти
-                            )
-
-                            # Удаляем временный файл
-                            import os
-                            os.unlink(temp_filename)
-
-                            t_start = min(recent_timestamps) if recent_timestamps else current_time - 5
-
-                            for segment in result["segments"]:
-                                start = t_start + segment["start"]
-                                end = t_start + segment["end"]
-                                text = segment["text"]
-                                while start in self.segments_dict:
-                                    start += 0.000001
-                                self.segments_dict[start] = RecognizedSegment(text, start, end)
-
-                            # Очистка старых сегментов
-                            cutoff_time = current_time - 30  # Храним историю только за 30 секунд
-                            self.segments_dict = {k: v for k, v in self.segments_dict.items() if
-                                                  v.end_time > cutoff_time}
-
-                            # Обновление текста
-                            display_text = self.get_display_text()
-                            self.signals.text_updated.emit(display_text)
-
-                            # Принудительно освобождаем память
-                            gc.collect()
-
-                        except Exception as e:
-                            print(f"Ошибка при обработке аудио: {e}")
-                            import traceback
-                            traceback.print_exc()
-
-                        self.last_recognition_time = current_time
-
-                    # Очистка старого аудио из буфера - важно для предотвращения утечек памяти
-                    cutoff_buffer_time = current_time - MAX_AUDIO_SECONDS
-                    self.audio_buffer = [(chunk, ts) for chunk, ts in self.audio_buffer if ts > cutoff_buffer_time]
-
-                # Небольшая пауза для снижения нагрузки на CPU
-                time.sleep(0.1)
+                # Ждем звук, а не спим: очередь разбирается целиком перед каждым проходом
+                try:
+                    self._take_audio(*self.audio_queue.get(timeout=0.5))
+                    while True:
+                        self._take_audio(*self.audio_queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                if self.policy.ready():
+                    self._commit(self.policy.process())
+                elif self.record_finished and self.audio_queue.empty() and self.policy.tentative_text():
+                    # Источник исчерпан - недоподтвержденный хвост больше не изменится
+                    self._commit(self.policy.flush())
 
             except Exception as e:
                 print(f"Ошибка распознавания: {e}")
                 import traceback
                 traceback.print_exc()
 
+    def _take_audio(self, audio_data, timestamp):
+        if self.stream_origin is None:
+            self.stream_origin = timestamp - len(audio_data) / RATE
+        self.policy.insert_audio(audio_data)
+
+    def _transcribe(self, audio, prompt):
+        """Проход декодера по буферу: слова со временем от начала буфера"""
+        # Нормализуем аудио в заранее выделенный буфер, без временных массивов
+        out = self._scratch[:len(audio)]
+        peak = max(float(audio.max()), -float(audio.min())) if len(audio) else 0.0
+        if peak > 0:
+            np.multiply(audio, 1.0 / peak, out=out)
+        else:
+            out[:] = audio
+        audio = out
+        result = self.model.transcribe(
+            audio,
+            language="ru",
+            beam_size=1,
+            fp16=False,
+            temperature=0,  # Уменьшает вариативность и потребление памяти
+            word_timestamps=True,
+            initial_prompt=prompt or None,
+            condition_on_previous_text=False,
+        )
+        return [(w["start"], w["end"], w["word"]) for segment in result["segments"] for w in segment.get("words", [])]
+
+    def _commit(self, words):
+        if words:
+            # Подтвержденные слова одного прохода - один сегмент на шкале настенного времени
+            start = self.stream_origin + words[0][0]
+            end = self.stream_origin + words[-1][1]
+            text = "".join(word for _, _, word in words).strip()
+            self.segments.append(RecognizedSegment(text, start, end))
+
+            # Очистка старых сегментов
+            self.segments.drop_before(time.time() - HISTORY_SECONDS)
+
+        # Обновление текста: подтвержденное плюс предварительный хвост
+        self.signals.text_updated.emit(self.get_display_text())
+
     def get_display_text(self):
-        current_time = time.time()
-        cutoff_time = current_time - 5
-        recent_segments = sorted([seg for seg in self.segments_dict.values() if seg.start_time > cutoff_time],
-                                 key=lambda x: x.start_time)
-        display_text = " ".join([seg.text for seg in recent_segments])
-        return display_text.strip()
+        committed = self.segments.text_between(time.time() - DISPLAY_SECONDS)
+        return f"{committed} {self.policy.tentative_text()}".strip()
 
     def get_text_for_period(self, seconds):
-        current_time = time.time()
-        cutoff_time = current_time - seconds
-        period_segments = sorted([seg for seg in self.segments_dict.values() if seg.start_time >= cutoff_time],
-                                 key=lambda x: x.start_time)
-        full_text = " ".join([seg.text for seg in period_segments])
-        return full_text.strip()
+        return self.segments.text_between(time.time() - seconds)
 
     def record_audio(self):
         try:
             self.recognition_start_time = time.time()
-            speaker = sc.default_speaker()
-            loopback_mic = sc.get_microphone(speaker.id, include_loopback=True)
-            default_mic = sc.default_microphone()
+            speaker_source, mic_source = self.sources
 
             print("Запись звука началась...")
 
-            with loopback_mic.recorder(samplerate=RATE, channels=CHANNELS) as speaker_rec, \
-                    default_mic.recorder(samplerate=RATE, channels=CHANNELS) as mic_rec:
+            with speaker_source.recorder(samplerate=RATE, channels=CHANNELS) as speaker_rec, \
+                    mic_source.recorder(samplerate=RATE, channels=CHANNELS) as mic_rec:
                 while self.running:
                     speaker_data = speaker_rec.record(numframes=CHUNK_SIZE)
                     mic_data = mic_rec.record(numframes=CHUNK_SIZE)
+                    if is_exhausted(speaker_rec) or is_exhausted(mic_rec):
+                        break
                     mixed_data = np.mean([speaker_data, mic_data], axis=0).astype(np.float32)
 
                     # Добавляем только если очередь не слишком большая
@@ -190,6 +150,8 @@ class AudioProcessor(threading.Thread):
             print(f"Ошибка записи звука: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            self.record_finished = True
 
     def stop(self):
         self.running = False
\ No newline at end of file
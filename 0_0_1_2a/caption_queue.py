@@ -0,0 +1,84 @@
+import collections
+import queue
+import threading
+import time
+
+# Константы
+MAX_CHUNKS = 40  # Емкость очереди: 40 фрагментов по 0.25 с = 10 секунд звука
+CATCH_UP_DEPTH = 2  # Столько фрагментов в очереди - распознавание отстает, догоняем
+MAX_MERGE = 8  # Сколько фрагментов склеивать в один вызов AcceptWaveform (2 секунды)
+LATENCY_WINDOW = 200  # Сколько последних измерений задержки учитывать
+
+
+class AudioChunkQueue:
+    """Ограниченная очередь фрагментов звука для распознавателя.
+
+    Поток записи никогда не ждет: при переполнении выбрасывается самый старый фрагмент
+    (для подписей важнее свежий звук). Источники без темпа реального времени (файлы)
+    передают block=True и ждут места, чтобы ничего не потерять. Если распознаватель
+    отстал, get_batch склеивает накопившиеся фрагменты в один большой.
+    """
+
+    def __init__(self, max_chunks=MAX_CHUNKS):
+        self.max_chunks = max_chunks
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def put(self, data, captured_at=None, block=False):
+        """data - байты int16; captured_at - время конца фрагмента (time.monotonic)"""
+        with self._cond:
+            if block:
+                while len(self._items) >= self.max_chunks:
+                    self._cond.wait()
+            elif len(self._items) >= self.max_chunks:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append((data, captured_at if captured_at is not None else time.monotonic()))
+            self._cond.notify_all()
+
+    def get_batch(self, timeout=None, max_merge=MAX_MERGE):
+        """Возвращает (байты, время захвата последнего фрагмента, сколько склеено, отстаем ли).
+        Если за timeout данных нет - queue.Empty, как у queue.Queue.get"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            behind = len(self._items) >= CATCH_UP_DEPTH
+            n = min(len(self._items), max_merge) if behind else 1
+            batch = [self._items.popleft() for _ in range(n)]
+            self._cond.notify_all()
+        data = batch[0][0] if n == 1 else b"".join(chunk for chunk, _ in batch)
+        return data, batch[-1][1], n, behind
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def empty(self):
+        return not self.qsize()
+
+
+class CaptionLatency:
+    """Задержка подписей: от конца захваченного фрагмента до готового результата распознавания"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._values = collections.deque(maxlen=window)
+        self.last = 0.0
+        self.catch_up_batches = 0
+
+    def add(self, captured_at, now=None):
+        self.last = (now if now is not None else time.monotonic()) - captured_at
+        self._values.append(self.last)
+
+    def percentile(self, q):
+        values = sorted(self._values)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+    def format(self, chunks=None):
+        text = (f"задержка подписей {self.last * 1000:.0f} мс "
+                f"(p50={self.percentile(50) * 1000:.0f} p99={self.percentile(99) * 1000:.0f})")
+        if chunks is not None:
+            text += f", в очереди {chunks.qsize()}, выброшено {chunks.dropped}"
+        return f"{text}, догоняющих пакетов {self.catch_up_batches}"
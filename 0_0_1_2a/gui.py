@@ -3,9 +3,11 @@ from PyQt5.QtCore import Qt
 import time
 
 class OverlayWindow(QWidget):
-    def __init__(self, audio_processor):
+    def __init__(self, audio_processor, vocabulary_path=None):
         super().__init__()
         self.audio_processor = audio_processor
+        self.vocabulary_path = vocabulary_path  # Словарь предметной области, Alt+V включает/выключает
+        self.vocabulary_on = False
 
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -73,6 +75,14 @@ class OverlayWindow(QWidget):
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_L and event.modifiers() & Qt.AltModifier:
             self.copy_text()
+        elif event.key() == Qt.Key_V and event.modifiers() & Qt.AltModifier:
+            self.toggle_vocabulary()
+
+    def toggle_vocabulary(self):
+        if not self.vocabulary_path or not hasattr(self.audio_processor, "set_vocabulary"):
+            return
+        self.vocabulary_on = not self.vocabulary_on
+        self.audio_processor.set_vocabulary(self.vocabulary_path if self.vocabulary_on else None)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
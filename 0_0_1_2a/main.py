@@ -4,22 +4,28 @@ import warnings
 from PyQt5.QtWidgets import QApplication
 from audio_processor_vosk import AudioProcessor
 from gui import OverlayWindow
-from soundcard.mediafoundation import SoundcardRuntimeWarning  # Добавлен импорт
 
-# Отключаем предупреждения SoundcardRuntimeWarning
-warnings.filterwarnings("ignore", category=SoundcardRuntimeWarning)
+# Отключаем предупреждения SoundcardRuntimeWarning (есть только в Windows-бэкенде soundcard)
+try:
+    from soundcard.mediafoundation import SoundcardRuntimeWarning
+    warnings.filterwarnings("ignore", category=SoundcardRuntimeWarning)
+except (ImportError, OSError, AssertionError):
+    pass
 
 # Указываем путь к папке platforms
 plugins_path = r'C:\Users\Пользователь\PycharmProjects\help tech sob\venv\Lib\site-packages\PyQt5\Qt5\plugins\platforms'
-os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = plugins_path
+if os.path.isdir(plugins_path):
+    os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = plugins_path
 
 # Путь к модели Vosk
 MODEL_PATH = "C:/model/vosk-model-small-ru-0.22"
+# Словарь технического собеседования; включается в оверлее по Alt+V без перезагрузки модели
+VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabulary.txt")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     audio_processor = AudioProcessor(MODEL_PATH)
     audio_processor.start()
-    overlay = OverlayWindow(audio_processor)
+    overlay = OverlayWindow(audio_processor, VOCABULARY_PATH)
     overlay.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,108 @@
+import bisect
+import copy
+import math
+import threading
+
+# Константы
+REPLACE_SHARE = 0.5  # Старый сегмент, перекрытый новым больше чем наполовину, заменяется целиком
+EPSILON = 1e-9  # Погрешность float при делении слов по времени
+
+
+class SegmentIndex:
+    """Упорядоченные непересекающиеся сегменты (start_time, end_time, text) с поиском по времени.
+
+    Сегменты хранятся отсортированными по началу; так как они не пересекаются, концы тоже
+    отсортированы, и любой диапазон находится двумя bisect. Новая транскрибация того же
+    участка заменяет старую: сегмент, перекрытый больше чем на REPLACE_SHARE, удаляется,
+    а частично перекрытый режется по краям нового - вместе со временем отрезается и текст
+    (см. _piece), так что слова не дублируются, а то, что было после нового сегмента, сохраняется.
+    Подтвержденный текст добавляется через append: он никогда не заменяется и не режется.
+    Пишет поток распознавания, читает GUI, поэтому два параллельных списка меняются под блокировкой.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._segments = []
+        self._lock = threading.Lock()
+
+    def insert(self, segment):
+        with self._lock:
+            self._insert(segment)
+
+    def append(self, segment):
+        """Добавляет подтвержденный сегмент после уже записанных, ничего не заменяя.
+
+        Слова подтверждаются с небольшим нахлестом по времени; начало нового сегмента
+        сдвигается к концу предыдущего, чтобы замена перекрытых не стерла уже показанный текст.
+        """
+        with self._lock:
+            if self._segments and segment.start_time < self._segments[-1].end_time:
+                segment.start_time = min(self._segments[-1].end_time, segment.end_time)
+            self._insert(segment)
+
+    def _insert(self, segment):
+        start, end = segment.start_time, segment.end_time
+        lo, hi = self._overlapping(start, end)
+        before, after = [], []
+        for old in self._segments[lo:hi]:
+            overlap = min(old.end_time, end) - max(old.start_time, start)
+            if overlap > REPLACE_SHARE * (old.end_time - old.start_time):
+                continue  # Новая версия того же участка
+            # Старый сегмент может выступать с обеих сторон нового - тогда он делится на два куска
+            if old.start_time < start:
+                before.append(self._piece(old, old.start_time, start))
+            if old.end_time > end:
+                after.append(self._piece(old, end, old.end_time))
+        ordered = [s for s in before if s is not None] + [segment] + [s for s in after if s is not None]
+        self._segments[lo:hi] = ordered
+        self._starts[lo:hi] = [s.start_time for s in ordered]
+
+    @staticmethod
+    def _piece(old, start, end):
+        """Копия старого сегмента на [start, end) с той же долей его слов.
+
+        Меток времени у слов нет, поэтому слова делятся пропорционально длительности.
+        Слово, задетое куском хотя бы частично, остается в нем: лучше повтор на стыке,
+        чем потерянное слово. Кусок без слов не нужен - None. Сам old не меняется:
+        его мог получить читатель.
+        """
+        words = old.text.split()
+        duration = old.end_time - old.start_time
+        first = math.floor(len(words) * (start - old.start_time) / duration + EPSILON)
+        last = math.ceil(len(words) * (end - old.start_time) / duration - EPSILON)
+        if first >= last:
+            return None
+        piece = copy.copy(old)
+        piece.start_time, piece.end_time = start, end
+        piece.text = " ".join(words[first:last])
+        return piece
+
+    def between(self, start, end=float("inf")):
+        """Сегменты, пересекающиеся с [start, end), по порядку"""
+        with self._lock:
+            lo, hi = self._overlapping(start, end)
+            return self._segments[lo:hi]
+
+    def text_between(self, start, end=float("inf")):
+        return " ".join(s.text.strip() for s in self.between(start, end)).strip()
+
+    def drop_before(self, time):
+        """Удаляет сегменты, закончившиеся до time"""
+        with self._lock:
+            lo, _ = self._overlapping(time, time)
+            del self._segments[:lo]
+            del self._starts[:lo]
+
+    def _overlapping(self, start, end):
+        # Первый сегмент, который может задевать start, - последний начавшийся до него
+        lo = max(0, bisect.bisect_right(self._starts, start) - 1)
+        if lo < len(self._segments) and self._segments[lo].end_time <= start:
+            lo += 1
+        hi = max(lo, bisect.bisect_left(self._starts, end))
+        return lo, hi
+
+    def __len__(self):
+        return len(self._segments)
+
+    def __iter__(self):
+        return iter(self._segments)
@@ -0,0 +1,156 @@
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import vosk
+
+from caption_queue import AudioChunkQueue, CaptionLatency
+
+# Константы
+RATE = 16000
+UNKNOWN = "[unk]"  # Слова вне словаря распознаются как [unk], а не подгоняются под словарь
+SOURCE_LABELS = {
+    "speaker": "Собеседник",
+    "mic": "Я",
+}
+
+
+def strip_unknown(text):
+    """Текст без [unk]: слова вне словаря в подписи и контекст LLM не попадают"""
+    return " ".join(word for word in text.split() if word != UNKNOWN)
+
+
+class SourceRecognizer(threading.Thread):
+    """Отдельный KaldiRecognizer для одного источника звука в своем потоке.
+
+    Речь собеседника и пользователя больше не смешивается в один поток, поэтому не мешает
+    распознаванию друг друга. Kaldi отпускает GIL внутри AcceptWaveform, так что два
+    распознавателя на многоядерной машине работают параллельно. Модель общая.
+
+    Результаты передаются колбэкам on_final(recognizer, result, wall_time) и
+    on_partial(recognizer, text) из потока распознавателя, уже без [unk]; финальные результаты,
+    в которых кроме [unk] ничего не было, не передаются. rtf() - доля реального времени,
+    которую занимает распознавание этого источника.
+
+    grammar - список слов и фраз предметной области: декодер ищет только среди них, что
+    быстрее и точнее на терминах. Меняется на лету через set_grammar без перезагрузки модели.
+    """
+
+    def __init__(self, model, name, on_final, on_partial=None, rate=RATE, words=False, grammar=None):
+        super().__init__(daemon=True, name=f"vosk-{name}")
+        self.source = name
+        self.label = SOURCE_LABELS.get(name, name)
+        self.rate = rate
+        self.on_final = on_final
+        self.on_partial = on_partial
+        self.model = model
+        self.words = words
+        self.grammar = grammar
+        self.rec = self._make_recognizer(grammar)
+        self._pending_grammar = None  # (grammar,) - новая грамматика, применяется потоком распознавателя
+        self.audio_queue = AudioChunkQueue()
+        self.latency = CaptionLatency()
+        self.audio_seconds = 0.0  # Сколько звука распознано
+        self.busy_seconds = 0.0  # Сколько времени на это ушло
+        self.running = True
+        self._finished = False  # Источник исчерпан - дорабатываем очередь и выходим
+
+    def put(self, samples, captured_at=None, block=False):
+        """samples - float32 в [-1, 1]; block=True для источников без темпа реального времени"""
+        data = (np.clip(np.asarray(samples, dtype=np.float32).reshape(-1), -1.0, 1.0) * 32767).astype(np.int16)
+        self.audio_queue.put(data.tobytes(), captured_at, block=block)
+
+    def _make_recognizer(self, grammar):
+        if grammar:
+            rec = vosk.KaldiRecognizer(self.model, self.rate, json.dumps(list(grammar) + [UNKNOWN], ensure_ascii=False))
+        else:
+            rec = vosk.KaldiRecognizer(self.model, self.rate)
+        rec.SetWords(self.words)
+        return rec
+
+    def set_grammar(self, grammar):
+        """Меняет словарь (None - открытый словарь). Применится перед следующим фрагментом"""
+        self._pending_grammar = (list(grammar) if grammar else None,)
+
+    def _apply_grammar(self):
+        grammar, = self._pending_grammar
+        self._pending_grammar = None
+        # Недоговоренную фразу завершаем старым распознавателем, чтобы не потерять
+        result = self._clean(json.loads(self.rec.FinalResult()))
+        if result is not None:
+            self.on_final(self, result, time.time())
+        # Распознаватель с другой грамматикой строится на той же загруженной модели - это дешево
+        self.rec = self._make_recognizer(grammar)
+        self.grammar = grammar
+        mode = f"словарь из {len(grammar)} фраз" if grammar else "открытый словарь"
+        print(f"{self.label}: {mode}")
+
+    @staticmethod
+    def _clean(result):
+        """Финальный результат без [unk] в тексте и в словах (SetWords) или None, если он пуст"""
+        text = strip_unknown(result.get("text", ""))
+        if not text:
+            return None
+        result = dict(result, text=text)
+        if "result" in result:
+            result["result"] = [word for word in result["result"] if word.get("word") != UNKNOWN]
+        return result
+
+    def finish(self):
+        self._finished = True
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            try:
+                data, captured_at, merged, behind = self.audio_queue.get_batch(timeout=0.5)
+            except queue.Empty:
+                if self._finished:
+                    break
+                continue
+            if merged > 1:
+                self.latency.catch_up_batches += 1
+            start = time.perf_counter()
+            try:
+                if self._pending_grammar is not None:
+                    self._apply_grammar()
+                accepted = self.rec.AcceptWaveform(data)
+                result = json.loads(self.rec.Result()) if accepted else None
+            except Exception as e:
+                # Один испорченный фрагмент не должен останавливать распознавание источника
+                print(f"Ошибка распознавания {self.label}: {e}")
+                continue
+            self.busy_seconds += time.perf_counter() - start
+            self.audio_seconds += len(data) / 2 / self.rate
+            self.latency.add(captured_at)
+
+            try:
+                if result is not None:
+                    result = self._clean(result)
+                    if result is not None:
+                        self.on_final(self, result, time.time())
+                    elif self.on_partial is not None:
+                        self.on_partial(self, "")  # Фраза из одних [unk] - убираем ее превью
+                elif not behind and self.on_partial is not None:
+                    # Пока догоняем, промежуточные результаты не разбираем - они сразу устаревают
+                    partial = json.loads(self.rec.PartialResult()).get("partial", "")
+                    self.on_partial(self, strip_unknown(partial))
+            except Exception as e:
+                print(f"Ошибка обработки результата {self.label}: {e}")
+
+    def rtf(self):
+        return self.busy_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+    def format(self):
+        return f"{self.label}: RTF {self.rtf():.2f}, {self.latency.format(self.audio_queue)}"
+
+
+def load_vocabulary(path):
+    """Словарь предметной области из текстового файла: одна фраза на строку, # - комментарии"""
+    with open(path, encoding="utf-8") as f:
+        phrases = [line.split("#", 1)[0].strip().lower() for line in f]
+    return [phrase for phrase in dict.fromkeys(phrases) if phrase]
@@ -0,0 +1,161 @@
+import numpy as np
+
+# Константы
+RATE = 16000
+MIN_STEP_SECONDS = 1.0  # Сколько нового звука копить между проходами декодера
+TRIM_SECONDS = 15  # Буфер длиннее этого обрезается по концу подтвержденного предложения
+MAX_BUFFER_SECONDS = 28  # Whisper видит не больше 30 с - дальше режем по последнему подтвержденному слову
+WINDOW_SECONDS = 32  # Емкость окна: MAX_BUFFER_SECONDS плюс звук, пришедший за время прохода
+PROMPT_CHARS = 200  # Сколько символов подтвержденного текста передавать подсказкой
+SENTENCE_END = (".", "?", "!", "…")
+
+
+def normalize_word(word):
+    return word.strip().lower().strip(".,!?…:;\"'«»()-")
+
+
+class LocalAgreement:
+    """Потоковая транскрибация с подтверждением по совпадению (local agreement).
+
+    Растущий буфер звука заново декодируется каждые MIN_STEP_SECONDS; подсказкой служит
+    уже подтвержденный текст, вышедший за начало буфера. Подтверждаются только слова
+    общего префикса двух последовательных проходов, остальное - предварительный хвост.
+    Буфер обрезается по концу подтвержденного предложения, поэтому слова на границах окон
+    не теряются и не повторяются, а работа декодера не растет со временем.
+
+    Звук лежит в заранее выделенном окне двойной емкости: добавление пишет на место,
+    обрезка только сдвигает начало, а раз в несколько десятков секунд данные переносятся
+    в начало окна. В установившемся режиме проход не выделяет памяти под звук.
+
+    transcribe(audio, prompt) -> [(start, end, word)] - время в секундах от начала audio;
+    audio - представление окна, действительное только на время вызова.
+    Все времена снаружи - секунды потока (от первого сэмпла).
+    """
+
+    def __init__(self, transcribe, rate=RATE):
+        self.transcribe = transcribe
+        self.rate = rate
+        self.reset()
+
+    def reset(self):
+        self._window = np.zeros(2 * int(WINDOW_SECONDS * self.rate), dtype=np.float32)
+        self._start = self._end = 0  # Буфер - это self._window[self._start:self._end]
+        self.dropped = 0  # Сэмплов выброшено, когда декодер отстал больше чем на окно
+        self.buffer_start = 0.0  # Время потока первого сэмпла буфера
+        self.committed = []  # Подтвержденные слова [(start, end, word)]
+        self._hypothesis = []  # Неподтвержденный хвост последнего прохода
+        self._pending = 0  # Сэмплов пришло после последнего прохода
+        self.passes = 0
+        self.decoded_seconds = 0.0  # Сколько секунд звука прошло через декодер
+
+    @property
+    def audio(self):
+        return self._window[self._start:self._end]
+
+    @property
+    def buffer_seconds(self):
+        return (self._end - self._start) / self.rate
+
+    def insert_audio(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        capacity = len(self._window) // 2
+        if len(chunk) > capacity:
+            chunk = chunk[-capacity:]
+        overflow = self._end - self._start + len(chunk) - capacity
+        if overflow > 0:
+            # Декодер отстал больше чем на окно - старый звук теряем, как при обрезке
+            self._advance(overflow)
+            self.dropped += overflow
+            self._hypothesis = [w for w in self._hypothesis if w[0] >= self.buffer_start]
+        if self._end + len(chunk) > len(self._window):
+            # Перенос в начало окна: начало буфера дальше capacity, поэтому куски не пересекаются
+            length = self._end - self._start
+            self._window[:length] = self._window[self._start:self._end]
+            self._start, self._end = 0, length
+        self._window[self._end:self._end + len(chunk)] = chunk
+        self._end += len(chunk)
+        self._pending += len(chunk)
+
+    def _advance(self, samples):
+        self._start += samples
+        self.buffer_start += samples / self.rate
+
+    def ready(self, min_step=MIN_STEP_SECONDS):
+        return self._pending >= min_step * self.rate
+
+    def process(self):
+        """Один проход декодера; возвращает слова, подтвержденные на этом проходе"""
+        self._pending = 0
+        words = [(start + self.buffer_start, end + self.buffer_start, word)
+                 for start, end, word in self.transcribe(self.audio, self._prompt())]
+        self.passes += 1
+        self.decoded_seconds += self.buffer_seconds
+
+        # Слова, которые уже подтверждены, декодер может выдать снова, а от слова на краю буфера
+        # может остаться обрывок - отбрасываем и то и другое, иначе обрывок не даст подтверждать дальше
+        last_end = self.committed[-1][1] if self.committed else 0.0
+        words = [w for w in words if w[0] >= last_end - 0.1 and w[1] > last_end + 0.05]
+        words = self._drop_repeated(words)
+
+        new = []
+        for prev, cur in zip(self._hypothesis, words):
+            if normalize_word(prev[2]) != normalize_word(cur[2]):
+                break
+            new.append(cur)
+        self.committed.extend(new)
+        self._hypothesis = words[len(new):]
+        self._trim()
+        return new
+
+    def flush(self):
+        """Конец потока: подтверждаем предварительный хвост как есть"""
+        new, self._hypothesis = self._hypothesis, []
+        self.committed.extend(new)
+        return new
+
+    def tentative_text(self):
+        return " ".join(word.strip() for _, _, word in self._hypothesis)
+
+    def _drop_repeated(self, words):
+        """Убирает начало прохода, совпадающее с концом подтвержденного текста (до 5 слов)"""
+        tail = [normalize_word(w) for _, _, w in self.committed[-5:]]
+        head = [normalize_word(w) for _, _, w in words[:5]]
+        for n in range(min(len(tail), len(head)), 0, -1):
+            if tail[-n:] == head[:n]:
+                return words[n:]
+        return words
+
+    def _trim(self):
+        if self.buffer_seconds <= TRIM_SECONDS:
+            return
+        cut = None
+        for _, end, word in reversed(self.committed):
+            if end <= self.buffer_start:
+                break
+            if word.strip().endswith(SENTENCE_END):
+                cut = end
+                break
+        if (cut is None or cut <= self.buffer_start) and self.buffer_seconds > MAX_BUFFER_SECONDS:
+            # Предложение так и не закончилось (или в буфере тишина) - режем по последнему
+            # подтвержденному слову, а если и его нет, оставляем последние TRIM_SECONDS
+            last_end = self.committed[-1][1] if self.committed else 0.0
+            if last_end > self.buffer_start:
+                cut = last_end
+            else:
+                cut = self.buffer_start + self.buffer_seconds - TRIM_SECONDS
+                self._hypothesis = [w for w in self._hypothesis if w[0] >= cut]
+        if cut is None or cut <= self.buffer_start:
+            return
+        drop = int(np.ceil((cut - self.buffer_start) * self.rate))  # Не оставляем хвост подтвержденного слова
+        self._advance(min(drop, self._end - self._start))
+
+    def _prompt(self):
+        parts, size = [], 0
+        for _, end, word in reversed(self.committed):
+            if end > self.buffer_start:
+                continue
+            parts.append(word.strip())
+            size += len(parts[-1]) + 1
+            if size >= PROMPT_CHARS:
+                break
+        return " ".join(reversed(parts))[-PROMPT_CHARS:]
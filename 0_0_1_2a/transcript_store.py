@@ -0,0 +1,110 @@
+import bisect
+import threading
+
+
+class TranscriptStore:
+    """Распознанный текст с временными метками: добавление O(1), выборка окна - bisect.
+
+    Каждая запись хранится готовым куском - разделитель перед ней (пробел или перевод строки
+    с подписью говорящего) плюс текст, поэтому текст за последние N секунд - это один join
+    кусков окна: время зависит от размера окна, а не от длины всей сессии. Общая строка
+    сессии не собирается - ее копирование на каждом добавлении стоило бы O(n).
+
+    Писатели (распознаватели источников) сериализуются блокировкой, читать можно из
+    любых потоков без блокировок: запись сначала дописывает данные и только потом
+    увеличивает _count, а читатели смотрят только на первые _count записей. Час текста -
+    это десятки килобайт, поэтому старые записи не удаляются.
+
+    Записи с тегом источника подписываются (labels[source]); при смене говорящего
+    реплика начинается с новой строки.
+    """
+
+    def __init__(self, sep=" ", labels=None):
+        self.sep = sep
+        self.labels = labels or {}
+        self._partials = {}  # Промежуточные результаты по источникам, еще не вошедшие в текст
+        self._times = []
+        self._pieces = []  # Разделитель + текст записи (вместе с подписью, если она есть)
+        self._leads = []  # Длина разделителя в начале куска - у первой записи окна он отрезается
+        self._sources = []
+        self._run_starts = []  # Запись начинает реплику (перед ней стоит подпись)
+        self._count = 0
+        self._write_lock = threading.Lock()
+
+    def append(self, text, timestamp, source=None):
+        """Добавляет запись; метки времени не убывают (более ранняя метка поднимается до последней)"""
+        text = text.strip()
+        if not text:
+            return
+        with self._write_lock:
+            n = self._count
+            if n and timestamp < self._times[n - 1]:
+                timestamp = self._times[n - 1]
+            run_start = source is not None and (not n or self._sources[n - 1] != source)
+            if run_start:
+                text = f"{self._label(source)}: {text}"
+                sep = "\n" if n else ""
+            else:
+                sep = self.sep if n else ""
+            self._times.append(timestamp)
+            self._pieces.append(sep + text)
+            self._leads.append(len(sep))
+            self._sources.append(source)
+            self._run_starts.append(run_start)
+            self._count = n + 1  # Публикуем запись последней
+
+    def text_since(self, since):
+        """Текст записей с меткой >= since"""
+        n = self._count
+        i = bisect.bisect_left(self._times, since, 0, n)
+        return self._slice(i, n)
+
+    def text_between(self, start, end):
+        """Текст записей с меткой в [start, end)"""
+        n = self._count
+        i = bisect.bisect_left(self._times, start, 0, n)
+        j = bisect.bisect_left(self._times, end, i, n)
+        return self._slice(i, j)
+
+    def _slice(self, i, j):
+        if i >= j:
+            return ""
+        out = "".join(self._pieces[i:j])[self._leads[i]:]
+        source = self._sources[i]
+        # Окно началось посреди реплики - подпись говорящего все равно нужна
+        if source is not None and not self._run_starts[i]:
+            out = f"{self._label(source)}: {out}"
+        return out
+
+    def set_partial(self, text, source=None):
+        self._partials[source] = text
+
+    @property
+    def partial(self):
+        return self.sep.join(text for text in list(self._partials.values()) if text)
+
+    @partial.setter
+    def partial(self, text):
+        self.set_partial(text)
+
+    def display_text(self, since):
+        """Текст окна вместе с промежуточными результатами - то, что показывает оверлей"""
+        text = self.text_since(since)
+        n = self._count
+        last = self._sources[n - 1] if n and text else None
+        for source, partial in list(self._partials.items()):
+            if not partial:
+                continue
+            if source is not None and source != last:
+                partial = f"{self._label(source)}: {partial}"
+                text = f"{text}\n{partial}" if text else partial
+                last = source
+            else:
+                text = f"{text}{self.sep}{partial}" if text else partial
+        return text
+
+    def _label(self, source):
+        return self.labels.get(source, source)
+
+    def __len__(self):
+        return self._count
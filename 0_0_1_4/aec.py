@@ -0,0 +1,92 @@
+import numpy as np
+
+# Константы
+RATE = 16000
+BLOCK = 256  # Размер блока адаптации (16 мс)
+PARTITIONS = 16  # Длина эхо-пути: BLOCK * PARTITIONS = 256 мс
+STEP = 0.5  # Шаг адаптации (нормированный)
+POWER_SMOOTHING = 0.9  # Сглаживание оценки мощности опорного сигнала по частотам
+DOUBLE_TALK = 0.6  # Порог детектора одновременной речи (Geigel)
+
+
+class EchoCanceller:
+    """Подавление эха собеседника в микрофоне: адаптивный фильтр в частотной области.
+
+    Разбитый на блоки фильтр (PBFDAF, overlap-save) моделирует путь "динамики -> микрофон"
+    по опорному сигналу loopback и вычитает оценку эха из микрофона. Все партиции
+    обрабатываются одним векторным вызовом FFT на блок. Пока говорит пользователь
+    (детектор Гейгеля), фильтр не адаптируется, чтобы не подстроиться под его голос.
+    """
+
+    def __init__(self, block=BLOCK, partitions=PARTITIONS, step=STEP):
+        self.block = block
+        self.partitions = partitions
+        self.step = step
+        self.bins = block + 1
+        self.reset()
+
+    def reset(self):
+        b, p = self.block, self.partitions
+        self.weights = np.zeros((p, self.bins), dtype=np.complex64)
+        self.ref_spectra = np.zeros((p, self.bins), dtype=np.complex64)  # Спектры последних P блоков опоры
+        self.power = np.full(self.bins, 1e-6, dtype=np.float32)
+        self._prev_ref = np.zeros(b, dtype=np.float32)
+        self._ref_peak = np.zeros(p, dtype=np.float32)  # Пики опоры по блокам для детектора Гейгеля
+        # Хвосты, не кратные блоку, ждут следующего фрагмента
+        self._ref_tail = np.zeros(0, dtype=np.float32)
+        self._mic_tail = np.zeros(0, dtype=np.float32)
+        self._out_tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, reference, mic):
+        """Возвращает микрофон без эха; длина выхода равна длине входного фрагмента"""
+        reference = np.concatenate((self._ref_tail, np.asarray(reference, dtype=np.float32).reshape(-1)))
+        mic_in = np.asarray(mic, dtype=np.float32).reshape(-1)
+        mic = np.concatenate((self._mic_tail, mic_in))
+
+        n_blocks = min(len(reference), len(mic)) // self.block
+        out = [self._out_tail]
+        for i in range(n_blocks):
+            sl = slice(i * self.block, (i + 1) * self.block)
+            out.append(self._process_block(reference[sl], mic[sl]))
+        used = n_blocks * self.block
+        self._ref_tail = reference[used:]
+        self._mic_tail = mic[used:]
+
+        # Выход запаздывает не больше чем на блок; недостающее в начале дополняем исходным микрофоном
+        out = np.concatenate(out)
+        need = len(mic_in)
+        if len(out) < need:
+            out = np.concatenate((mic_in[:need - len(out)], out))
+        self._out_tail = out[need:]
+        return out[:need]
+
+    def _process_block(self, x, d):
+        b = self.block
+        spectrum = np.fft.rfft(np.concatenate((self._prev_ref, x)))
+        self._prev_ref = x
+        self.ref_spectra = np.roll(self.ref_spectra, 1, axis=0)
+        self.ref_spectra[0] = spectrum
+        self._ref_peak = np.roll(self._ref_peak, 1)
+        self._ref_peak[0] = np.max(np.abs(x))
+
+        # Оценка эха и ошибка (это и есть очищенный микрофон)
+        echo = np.fft.irfft(np.sum(self.ref_spectra * self.weights, axis=0))[b:]
+        error = (d - echo).astype(np.float32)
+
+        # Мощность опоры обновляем всегда, чтобы после паузы шаг не оказался слишком большим
+        block_power = np.abs(spectrum) ** 2
+        self.power = POWER_SMOOTHING * self.power + (1 - POWER_SMOOTHING) * block_power
+        norm = self.partitions * np.maximum(self.power, block_power) + 1e-6
+
+        # Детектор Гейгеля: микрофон громче недавней опоры - говорит пользователь, не адаптируемся
+        if np.max(np.abs(d)) > DOUBLE_TALK * np.max(self._ref_peak) or not self._ref_peak.any():
+            return error
+
+        error_spectrum = np.fft.rfft(np.concatenate((np.zeros(b, dtype=np.float32), error)))
+        # Нормировка на суммарную мощность всех партиций, иначе при P партициях шаг в P раз больше
+        gradient = np.conj(self.ref_spectra) * (error_spectrum * self.step / norm)
+        # Ограничение градиента: отбрасываем циклическую часть свертки
+        constrained = np.fft.irfft(gradient, axis=1)
+        constrained[:, b:] = 0
+        self.weights += np.fft.rfft(constrained, axis=1).astype(np.complex64)
+        return error
@@ -1,7 +1,6 @@
 import threading
 import time
 import numpy as np
-import soundcard as sc
 import whisper
 import tempfile
 import soundfile as sf
@@ -9,6 +8,13 @@ import os
 import re
 import torch
 from scipy import signal
+from capture import CaptureThread, StreamMixer, ResampledRecorder, HistoryBuffer, AdaptiveBlockSize
+from audio_sources import default_sources
+from dsp import StreamingPreprocessor
+from features import IncrementalLogMel, N_FRAMES, load_mel_filters
+from tracks import make_tracks, merge_labeled, TRACKS_MIXED, TRACKS_REMOTE
+from aec import EchoCanceller
+from live_captions import LiveCaptions
 from PyQt5.QtCore import pyqtSignal, QObject, QThread
 
 # Константы
@@ -16,6 +22,15 @@ RATE = 16000
 CHANNELS = 1
 CHUNK_SIZE = RATE // 4  # 0.25 секунды аудио
 MAX_SEGMENT_LENGTH = 30 * RATE  # 30 секунд для разделения длинных аудио
+IDLE_TIMEOUT = 30  # Секунд паузы до закрытия устройств
+HISTORY_SECONDS = 180  # Сколько последних секунд хранит постоянная запись
+STATS_INTERVAL = 10  # Как часто (в секундах) писать строку с метриками захвата
+INITIAL_PROMPT = "Это транскрипция разговора на русском языке."
+# Повторы с температурой и пороги - как в whisper.transcribe
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4  # Выше - зацикленный текст
+LOGPROB_THRESHOLD = -1.0  # Ниже - неуверенное декодирование
+NO_SPEECH_THRESHOLD = 0.6  # Выше (при неуверенном тексте) - в окне нет речи
 
 
 def preprocess_audio(audio_data, sample_rate=RATE):
@@ -68,10 +83,12 @@ class TranscriptionWorker(QThread):
     progress = pyqtSignal(int)
     result = pyqtSignal(str)
 
-    def __init__(self, audio_data, model):
+    def __init__(self, audio_data, model, preprocess=True, model_lock=None):
         super().__init__()
         self.audio_data = audio_data
         self.model = model
+        self.model_lock = model_lock or threading.Lock()  # Модель общая с живыми подписями
+        self.preprocess = preprocess  # False, если аудио уже обработано во время записи
 
     def run(self):
         try:
@@ -80,7 +97,7 @@ class TranscriptionWorker(QThread):
                 temp_filename = temp_file.name
 
             # Применяем предобработку аудио
-            processed_audio = preprocess_audio(self.audio_data)
+            processed_audio = preprocess_audio(self.audio_data) if self.preprocess else self.audio_data
 
             # Сохраняем во временный файл
             sf.write(temp_filename, processed_audio, RATE)
@@ -92,14 +109,15 @@ class TranscriptionWorker(QThread):
                     time.sleep(0.1)  # Уменьшаем задержку для более быстрого отклика
 
             # Улучшенные параметры транскрибации
-            result = self.model.transcribe(
-                temp_filename,
-                language="ru",
-                beam_size=5,  # Увеличиваем для лучшего поиска
-                fp16=torch.cuda.is_available(),  # Используем fp16 если доступен GPU
-                temperature=0.2,  # Небольшая температура для более стабильных результатов
-                initial_prompt="Это транскрипция разговора на русском языке."  # Добавляем контекст
-            )
+            with self.model_lock:
+                result = self.model.transcribe(
+                    temp_filename,
+                    language="ru",
+                    beam_size=5,  # Увеличиваем для лучшего поиска
+                    fp16=torch.cuda.is_available(),  # Используем fp16 если доступен GPU
+                    temperature=0.2,  # Небольшая температура для более стабильных результатов
+                    initial_prompt=INITIAL_PROMPT  # Добавляем контекст
+                )
 
             # Удаляем временный файл
             os.unlink(temp_filename)
@@ -125,10 +143,12 @@ class SegmentTranscriptionWorker(QThread):
     progress = pyqtSignal(int)
     result = pyqtSignal(str)
 
-    def __init__(self, audio_segments, model):
+    def __init__(self, audio_segments, model, preprocess=True, model_lock=None):
         super().__init__()
         self.audio_segments = audio_segments
         self.model = model
+        self.model_lock = model_lock or threading.Lock()
+        self.preprocess = preprocess
 
     def run(self):
         try:
@@ -143,18 +163,19 @@ class SegmentTranscriptionWorker(QThread):
                     temp_filename = temp_file.name
 
                 # Предобработка и сохранение
-                processed_segment = preprocess_audio(segment)
+                processed_segment = preprocess_audio(segment) if self.preprocess else segment
                 sf.write(temp_filename, processed_segment, RATE)
 
                 # Транскрибируем
-                result = self.model.transcribe(
-                    temp_filename,
-                    language="ru",
-                    beam_size=5,
-                    fp16=torch.cuda.is_available(),
-                    temperature=0.2,
-                    initial_prompt="Это транскрипция разговора на русском языке."
-                )
+                with self.model_lock:
+                    result = self.model.transcribe(
+                        temp_filename,
+                        language="ru",
+                        beam_size=5,
+                        fp16=torch.cuda.is_available(),
+                        temperature=0.2,
+                        initial_prompt=INITIAL_PROMPT
+                    )
 
                 # Удаляем временный файл
                 os.unlink(temp_filename)
@@ -177,100 +198,417 @@ class SegmentTranscriptionWorker(QThread):
             self.result.emit(f"Ошибка транскрибации: {str(e)}")
 
 
+class MelTranscriptionWorker(QThread):
+    """Транскрибация по лог-мел спектрограмме, посчитанной во время записи: сразу в энкодер"""
+    progress = pyqtSignal(int)
+    result = pyqtSignal(str)
+
+    def __init__(self, mel, model, model_lock=None):
+        super().__init__()
+        self.mel = mel
+        self.model = model
+        self.model_lock = model_lock or threading.Lock()
+
+    def run(self):
+        try:
+            # Как в whisper.transcribe: спектрограмма дополнена N_FRAMES кадрами тишины
+            content_frames = self.mel.shape[1] - N_FRAMES
+
+            # Режем по 30 секунд (3000 кадров) - размер окна энкодера
+            starts = range(0, content_frames, N_FRAMES)
+            all_results = []
+            for i, start in enumerate(starts):
+                self.progress.emit(int((i / len(starts)) * 100))
+                segment = torch.from_numpy(self.mel[:, start:start + N_FRAMES])
+                segment = whisper.pad_or_trim(segment, N_FRAMES).to(self.model.device)
+                with self.model_lock:
+                    result = decode_with_fallback(self.model, segment)
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    continue  # Тишина - Whisper на ней сочиняет текст
+                all_results.append(result.text)
+
+            full_text = postprocess_transcription(" ".join(all_results))
+
+            self.progress.emit(100)
+            self.result.emit(full_text)
+
+        except Exception as e:
+            print(f"Ошибка при транскрибации: {e}")
+            import traceback
+            traceback.print_exc()
+            self.result.emit(f"Ошибка транскрибации: {str(e)}")
+
+
+def decode_with_fallback(model, segment):
+    """Декодирует окно, повышая температуру при зацикливании или неуверенности (как whisper.transcribe)"""
+    result = None
+    for temperature in TEMPERATURES:
+        options = whisper.DecodingOptions(
+            language="ru",
+            fp16=torch.cuda.is_available(),
+            temperature=temperature,
+            # Поиск лучом - только для жадного прохода, дальше выбор из нескольких сэмплов
+            beam_size=5 if temperature == 0 else None,
+            best_of=None if temperature == 0 else 5,
+            prompt=INITIAL_PROMPT
+        )
+        result = whisper.decode(model, segment, options)
+
+        needs_fallback = (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                          or result.avg_logprob < LOGPROB_THRESHOLD)
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+            needs_fallback = False  # Тишина - повторять бессмысленно
+        if not needs_fallback:
+            break
+    return result
+
+
+class DualTrackTranscriptionWorker(QThread):
+    """Транскрибирует дорожки по отдельности и собирает диалог с подписями говорящих"""
+    progress = pyqtSignal(int)
+    result = pyqtSignal(str)
+
+    def __init__(self, tracks, model, model_lock=None):
+        super().__init__()
+        self.tracks = [track for track in tracks if track.chunks]
+        self.model = model
+        self.model_lock = model_lock or threading.Lock()
+
+    def run(self):
+        try:
+            items = []
+            for i, track in enumerate(self.tracks):
+                self.progress.emit(int((i / len(self.tracks)) * 100))
+                with self.model_lock:
+                    result = self.model.transcribe(
+                        track.audio(),
+                        language="ru",
+                        beam_size=5,
+                        fp16=torch.cuda.is_available(),
+                        temperature=0.2,
+                        initial_prompt=INITIAL_PROMPT
+                    )
+                # Время сегмента - в склеенном аудио дорожки; переводим на общую шкалу
+                for segment in result["segments"]:
+                    position = track.timeline_position(int(segment["start"] * RATE))
+                    items.append((position, track.label, postprocess_transcription(segment["text"])))
+
+            self.progress.emit(100)
+            self.result.emit(merge_labeled(items))
+
+        except Exception as e:
+            print(f"Ошибка при транскрибации дорожек: {e}")
+            import traceback
+            traceback.print_exc()
+            self.result.emit(f"Ошибка транскрибации: {str(e)}")
+
+
 class AudioRecorderSignals(QObject):
     transcription_complete = pyqtSignal(str)
     transcription_progress = pyqtSignal(int)
+    capture_stats = pyqtSignal(str)  # Периодическая строка с метриками захвата
+    live_caption = pyqtSignal(str)  # Живые подписи во время записи (Vosk, уточненный Whisper)
+    capture_error = pyqtSignal(str)  # Устройство отказало, запись остановлена
 
 
 class AudioRecorder:
-    def __init__(self, model_name="medium"):  # Улучшаем модель до medium
+    def __init__(self, model_name="medium", sources=None, use_features=True,
+                 capture_rate=None, idle_timeout=IDLE_TIMEOUT,
+                 always_on=False, history_seconds=HISTORY_SECONDS,
+                 track_mode=TRACKS_MIXED, echo_cancel=True,
+                 stats_interval=STATS_INTERVAL, adaptive_block=True, live_model_path=None):  # Улучшаем модель до medium
         self.signals = AudioRecorderSignals()
+        # Пара источников (loopback, микрофон); по умолчанию - реальные устройства soundcard
+        self.sources = sources or default_sources()
+        # Нативная частота устройств (44100/48000): захват на ней и своя передискретизация в RATE.
+        # None - устройства открываются сразу на RATE и передискретизирует ОС
+        self.capture_rate = capture_rate
+        # Сколько секунд паузы держать устройства открытыми, прежде чем закрыть их
+        self.idle_timeout = idle_timeout
+        # Постоянная запись: устройства открыты всегда, последние history_seconds секунд лежат
+        # в кольцевом буфере, и можно транскрибировать вопрос уже после того, как он прозвучал
+        self.always_on = always_on
+        self.history = HistoryBuffer(history_seconds, RATE) if always_on else None
         self.running = False
         self.recording = False
-        self.audio_buffer = []
+        self._active = threading.Event()  # Установлен, пока идет запись (не пауза)
+        self._data_ready = threading.Event()  # Потоки захвата сообщают о новых данных
 
         # Используем GPU, если доступен
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Загрузка модели Whisper {model_name} на устройство {device}...")
         self.model = whisper.load_model(model_name, device=device)
 
+        # Лог-мел признаки считаются во время записи, чтобы не тратить на них время после клика
+        self.n_mels = self.model.dims.n_mels if use_features else None
+        self.mel_filters = load_mel_filters(self.n_mels) if use_features else None
+
+        # Дорожки записи: смешанный поток, только собеседник или собеседник и я по отдельности
+        self.track_mode = track_mode
+        self.tracks = make_tracks(track_mode, self.n_mels, self.mel_filters)
+        self.timeline = 0  # Позиция текущего фрагмента на общей шкале времени (в сэмплах)
+        # Микрофон слышит динамики: вычитаем эхо собеседника по опорному сигналу loopback.
+        # В режиме "remote" микрофон не используется, и подавлять нечего
+        use_aec = echo_cancel and track_mode != TRACKS_REMOTE
+        self.echo_canceller = EchoCanceller() if use_aec else None
+
         self.record_thread = None
         self.transcription_worker = None
+        self.capture_threads = []  # Потоки захвата текущей сессии, у каждого есть stats
+        self.stats_interval = stats_interval
+        # Размер блока захвата: подстраивается по нагрузке или фиксирован (CHUNK_SIZE)
+        self.block_size = AdaptiveBlockSize(RATE) if adaptive_block else None
+
+        # Whisper не рассчитан на параллельные вызовы (кэш ключей/значений вешается хуками
+        # на саму модель), а теперь ее делят транскрибация по кнопке и уточнение подписей
+        self.model_lock = threading.Lock()
+        # Гибридные живые подписи: Vosk во время записи, фразы уточняются Whisper в фоне.
+        # Без vosk или без модели - все как раньше, текст появляется после транскрибации
+        self.live_captions = None
+        if live_model_path:
+            try:
+                self.live_captions = LiveCaptions(live_model_path, self._refine_caption,
+                                                  on_update=self.signals.live_caption.emit)
+            except Exception as e:
+                print(f"Живые подписи выключены: {e}")
 
     def start_recording(self):
+        self.recording = True
+        self._start_capture()
+
+    def start_listening(self):
+        """Включает постоянную запись в кольцевой буфер без записи в основной буфер"""
+        if self.always_on:
+            self._start_capture()
+
+    def _start_capture(self):
+        self._active.set()
         if not self.running:
             self.running = True
-            self.recording = True
             self.record_thread = threading.Thread(target=self._record_audio)
             self.record_thread.daemon = True
             self.record_thread.start()
-        else:
-            self.recording = True
 
     def pause_recording(self):
         self.recording = False
+        if self.live_captions is not None:
+            self.live_captions.flush()
+        if not self.always_on:
+            self._active.clear()
 
     def resume_recording(self):
         self.recording = True
+        self._active.set()
 
     def clear_recording(self):
-        self.audio_buffer = []
+        for track in self.tracks.values():
+            track.clear()
+        if self.live_captions is not None:
+            self.live_captions.clear()
 
     def has_recording(self):
-        return len(self.audio_buffer) > 0
+        return any(track.chunks for track in self.tracks.values())
 
     def _record_audio(self):
         try:
-            speaker = sc.default_speaker()
-            loopback_mic = sc.get_microphone(speaker.id, include_loopback=True)
-            default_mic = sc.default_microphone()
+            while self.running:
+                # Устройства закрыты: спим до возобновления записи или остановки, без опроса
+                self._active.wait()
+                if not self.running:
+                    break
+                if self._capture_session():
+                    break
+        except Exception as e:
+            print(f"Ошибка записи звука: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def _capture_session(self):
+        """Открывает устройства и пишет, пока не наступит простой дольше idle_timeout.
+
+        Возвращает True, если конечные источники закончились и запись завершена.
+        """
+        speaker_source, mic_source = self.sources
+
+        print("Запись звука началась...")
 
-            print("Запись звука началась...")
+        device_rate = self.capture_rate or RATE
 
-            # Увеличиваем размер буфера для более стабильной записи
-            buffer_size = CHUNK_SIZE * 2
+        # Увеличиваем размер буфера для более стабильной записи
+        buffer_size = CHUNK_SIZE * 2 * device_rate // RATE
 
-            with loopback_mic.recorder(samplerate=RATE, channels=CHANNELS, blocksize=buffer_size) as speaker_rec, \
-                    default_mic.recorder(samplerate=RATE, channels=CHANNELS, blocksize=buffer_size) as mic_rec:
+        with speaker_source.recorder(samplerate=device_rate, channels=CHANNELS, blocksize=buffer_size) as speaker_rec, \
+                mic_source.recorder(samplerate=device_rate, channels=CHANNELS, blocksize=buffer_size) as mic_rec:
+            if self.capture_rate:
+                speaker_rec = ResampledRecorder(speaker_rec, device_rate, RATE)
+                mic_rec = ResampledRecorder(mic_rec, device_rate, RATE)
+
+            # Каждое устройство читается в своем потоке, чтобы чтение одного не блокировало другое
+            block = self.block_size.size if self.block_size else CHUNK_SIZE
+            self._data_ready.clear()
+            speaker_thread = CaptureThread(speaker_rec, block, data_ready=self._data_ready, name="speaker")
+            mic_thread = CaptureThread(mic_rec, block, data_ready=self._data_ready, name="mic")
+            mixer = StreamMixer(speaker_thread, mic_thread)
+            self.capture_threads = [speaker_thread, mic_thread]
+            if self.block_size is not None:
+                self.block_size.reset_losses()  # Счетчики потерь у новых потоков начинаются с нуля
+            speaker_thread.start()
+            mic_thread.start()
+            last_stats = time.monotonic()
+
+            try:
                 while self.running:
-                    if self.recording:
-                        speaker_data = speaker_rec.record(numframes=CHUNK_SIZE)
-                        mic_data = mic_rec.record(numframes=CHUNK_SIZE)
-
-                        # Умное смешивание: используем только тот источник, где есть речь
-                        speaker_level = np.max(np.abs(speaker_data))
-                        mic_level = np.max(np.abs(mic_data))
-
-                        if speaker_level > 0.05 and speaker_level > mic_level * 1.5:
-                            # Используем звук с динамиков
-                            mixed_data = speaker_data
-                        elif mic_level > 0.05:
-                            # Используем звук с микрофона
-                            mixed_data = mic_data
-                        else:
-                            # Смешиваем, если нет явного источника
-                            mixed_data = np.mean([speaker_data, mic_data], axis=0)
-
-                        # Преобразуем в float32 для обработки
-                        mixed_data = mixed_data.astype(np.float32)
-
-                        # Определяем, содержит ли фрагмент речь (VAD - Voice Activity Detection)
-                        if np.max(np.abs(mixed_data)) > 0.02:  # Простой VAD на основе амплитуды
-                            self.audio_buffer.append(mixed_data)
-                    time.sleep(0.01)
+                    if not self._active.is_set():
+                        # Пауза: устройства держим открытыми idle_timeout секунд для быстрого
+                        # возобновления, потом закрываем их до следующего resume_recording.
+                        # Потоки захвата на паузе звук не копят, а выбрасывают
+                        for thread in self.capture_threads:
+                            thread.pause()
+                        if not self._active.wait(self.idle_timeout):
+                            print("Простой записи, устройства закрыты")
+                            return False
+                        mixer.reset()  # Хвост до паузы не нужен
+                        if self.block_size is not None:
+                            self.block_size.reset_losses(self._lost_frames())
+                        for thread in self.capture_threads:
+                            thread.resume()
+                        continue
+
+                    self._data_ready.wait()
+                    self._data_ready.clear()
+                    # Одно устройство отказало - второе будет писать в никуда: смешивать не с чем
+                    failed = next((t for t in self.capture_threads if t.error is not None), None)
+                    if failed is not None:
+                        # Сам поток захвата ошибку уже напечатал
+                        message = f"Ошибка захвата {failed.name}: {failed.error}"
+                        self.running = False
+                        self.signals.capture_error.emit(message)
+                        return True
+                    # Флаги читаем до разбора буферов, чтобы не потерять последние блоки
+                    finished = speaker_thread.finished and mic_thread.finished
+                    while True:
+                        data = mixer.read(block)
+                        if data is None:
+                            break
+                        start = time.perf_counter()
+                        self._process_chunk(*data)
+                        if self.block_size is not None:
+                            block = self._adapt_block(time.perf_counter() - start, len(data[0]))
+                    # Конечные источники (файл, синтетика) закончились - запись завершена
+                    if finished:
+                        data = mixer.flush()  # Последний неполный блок
+                        if data is not None:
+                            self._process_chunk(*data)
+                        return True
+
+                    now = time.monotonic()
+                    if self.stats_interval and now - last_stats >= self.stats_interval:
+                        last_stats = now
+                        self._report_stats()
+            finally:
+                speaker_thread.stop()
+                mic_thread.stop()
+                speaker_thread.join(timeout=1.0)
+                mic_thread.join(timeout=1.0)
+        return False
+
+    def _adapt_block(self, processing_seconds, frames):
+        """Сообщает контроллеру размера блока о нагрузке и раздает новый размер потокам захвата"""
+        lost = self._lost_frames()
+        queued = max(t.ring.available() for t in self.capture_threads)
+        block = self.block_size.observe(processing_seconds, frames, lost, queued)
+        for thread in self.capture_threads:
+            thread.numframes = block
+        return block
+
+    def _lost_frames(self):
+        # Только выброшенное кольцевым буфером: это и есть "не успеваем разбирать".
+        # Дефицит по часам хоста - оценка, и расхождение часов устройства оно не отличает от потерь
+        return sum(t.stats.dropped for t in self.capture_threads)
+
+    def capture_stats(self):
+        """Снимки метрик захвата по каждому устройству текущей сессии"""
+        return [thread.stats.snapshot() for thread in self.capture_threads]
+
+    def _report_stats(self):
+        line = " | ".join(thread.stats.format() for thread in self.capture_threads)
+        if self.block_size is not None:
+            line = f"{self.block_size.format()} | {line}"
+        if self.live_captions is not None:
+            line = f"{line} | {self.live_captions.format()}"
+        print(f"[capture] {line}")
+        self.signals.capture_stats.emit(line)
+
+    def _process_chunk(self, speaker_data, mic_data):
+        position = self.timeline
+        self.timeline += len(speaker_data)
+
+        if self.echo_canceller is not None:
+            mic_data = self.echo_canceller.process(speaker_data, mic_data)
+
+        if self.track_mode == TRACKS_MIXED:
+            main_data = self._mix(speaker_data, mic_data)
+        else:
+            # Основной поток - собеседник; свой голос не смешиваем с вопросом
+            main_data = speaker_data.astype(np.float32)
 
-        except Exception as e:
-            print(f"Ошибка записи звука: {e}")
-            import traceback
-            traceback.print_exc()
+        if self.history is not None:
+            self.history.write(main_data)
+        if not self.recording:
+            return
+
+        if self.live_captions is not None:
+            self.live_captions.feed(main_data, position)
+
+        if self.track_mode == TRACKS_MIXED:
+            self.tracks["mixed"].append(main_data, position)
+        else:
+            self.tracks["remote"].append(main_data, position)
+            if "local" in self.tracks:
+                self.tracks["local"].append(mic_data.astype(np.float32), position)
+
+    @staticmethod
+    def _mix(speaker_data, mic_data):
+        # Умное смешивание: используем только тот источник, где есть речь
+        speaker_level = np.max(np.abs(speaker_data))
+        mic_level = np.max(np.abs(mic_data))
+
+        if speaker_level > 0.05 and speaker_level > mic_level * 1.5:
+            # Используем звук с динамиков
+            mixed_data = speaker_data
+        elif mic_level > 0.05:
+            # Используем звук с микрофона
+            mixed_data = mic_data
+        else:
+            # Смешиваем, если нет явного источника
+            mixed_data = (speaker_data + mic_data) * 0.5
+
+        # Преобразуем в float32 для обработки
+        return mixed_data.astype(np.float32)
 
     def transcribe(self):
-        if not self.audio_buffer:
+        if not self.has_recording():
             self.signals.transcription_complete.emit("Нет аудио для транскрибации")
             return
 
+        if len(self.tracks) > 1:
+            # Две дорожки: каждая транскрибируется отдельно, реплики подписываются
+            self.transcription_worker = DualTrackTranscriptionWorker(self.tracks.values(), self.model, model_lock=self.model_lock)
+            self.transcription_worker.progress.connect(self.signals.transcription_progress)
+            self.transcription_worker.result.connect(self.signals.transcription_complete)
+            self.transcription_worker.start()
+            return
+
+        track = next(iter(self.tracks.values()))
+        if track.features is not None:
+            self.transcription_worker = MelTranscriptionWorker(track.features.log_mel(padding=N_FRAMES), self.model, model_lock=self.model_lock)
+            self.transcription_worker.progress.connect(self.signals.transcription_progress)
+            self.transcription_worker.result.connect(self.signals.transcription_complete)
+            self.transcription_worker.start()
+            return
+
         # Объединяем все фрагменты аудио
-        audio_array = np.concatenate(self.audio_buffer)
+        audio_array = track.audio()
 
         # Если аудио длинное, разделяем на сегменты для лучшей транскрибации
         if len(audio_array) > MAX_SEGMENT_LENGTH:
@@ -280,23 +618,70 @@ class AudioRecorder:
                 segments.append(segment)
 
             # Транскрибируем каждый сегмент отдельно
-            self.transcription_worker = SegmentTranscriptionWorker(segments, self.model)
+            self.transcription_worker = SegmentTranscriptionWorker(segments, self.model, preprocess=False, model_lock=self.model_lock)
             self.transcription_worker.progress.connect(self.signals.transcription_progress)
             self.transcription_worker.result.connect(self.signals.transcription_complete)
             self.transcription_worker.start()
         else:
             # Для коротких аудио используем стандартный подход
-            self.transcription_worker = TranscriptionWorker(audio_array, self.model)
+            self.transcription_worker = TranscriptionWorker(audio_array, self.model, preprocess=False, model_lock=self.model_lock)
             self.transcription_worker.progress.connect(self.signals.transcription_progress)
             self.transcription_worker.result.connect(self.signals.transcription_complete)
             self.transcription_worker.start()
 
+    def live_text(self):
+        """Текст живых подписей или None, если они выключены"""
+        return self.live_captions.text() if self.live_captions is not None else None
+
+    def _refine_caption(self, audio):
+        """Уточнение одной фразы живых подписей: Whisper видит только ее звук"""
+        processed = StreamingPreprocessor(RATE).process(audio)
+        with self.model_lock:
+            result = self.model.transcribe(
+                processed,
+                language="ru",
+                beam_size=5,
+                fp16=torch.cuda.is_available(),
+                temperature=0.2,
+                initial_prompt=INITIAL_PROMPT
+            )
+        return postprocess_transcription(" ".join(segment["text"] for segment in result["segments"]))
+
+    def transcribe_last(self, seconds=None):
+        """Транскрибирует последние seconds секунд постоянной записи или, если seconds=None, последнюю фразу"""
+        if self.history is None:
+            self.signals.transcription_complete.emit("Постоянная запись выключена")
+            return
+
+        audio = self.history.last(seconds) if seconds else self.history.last_utterance()
+        if not len(audio):
+            self.signals.transcription_complete.emit("Нет аудио для транскрибации")
+            return
+
+        # В модель уходит только этот кусок, поэтому задержка зависит от длины вопроса, а не сессии
+        processed = StreamingPreprocessor(RATE).process(audio)
+        if self.n_mels:
+            features = IncrementalLogMel(self.n_mels, filters=self.mel_filters)
+            features.append(processed)
+            self.transcription_worker = MelTranscriptionWorker(features.log_mel(padding=N_FRAMES), self.model, model_lock=self.model_lock)
+        else:
+            self.transcription_worker = TranscriptionWorker(processed, self.model, preprocess=False, model_lock=self.model_lock)
+        self.transcription_worker.progress.connect(self.signals.transcription_progress)
+        self.transcription_worker.result.connect(self.signals.transcription_complete)
+        self.transcription_worker.start()
+
     def stop(self):
         self.running = False
         self.recording = False
+        # Будим поток записи, где бы он ни ждал
+        self._active.set()
+        self._data_ready.set()
         if self.record_thread and self.record_thread.is_alive():
             self.record_thread.join(timeout=1.0)
 
+        if self.live_captions is not None:
+            self.live_captions.stop()
+
         if self.transcription_worker and self.transcription_worker.isRunning():
             self.transcription_worker.terminate()
             self.transcription_worker.wait()
\ No newline at end of file
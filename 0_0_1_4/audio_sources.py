@@ -0,0 +1,210 @@
+import time
+import wave
+import numpy as np
+
+# Константы
+RATE = 16000
+
+
+class AudioSource:
+    """Источник звука с тем же интерфейсом, что у микрофона soundcard.
+
+    source.recorder(samplerate, channels, blocksize) возвращает контекстный менеджер,
+    у которого есть record(numframes) -> np.ndarray формы (numframes, channels) в float32.
+    Конечные источники (файл, синтетика с длительностью) выставляют recorder.exhausted.
+    """
+
+    name = "source"
+
+    def recorder(self, samplerate=RATE, channels=1, blocksize=None):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class SoundcardSource(AudioSource):
+    """Реальное устройство через soundcard: loopback динамиков или микрофон по умолчанию"""
+
+    def __init__(self, loopback=False):
+        self.loopback = loopback
+        self.name = "loopback" if loopback else "microphone"
+
+    def recorder(self, samplerate=RATE, channels=1, blocksize=None):
+        import soundcard as sc  # Импорт здесь, чтобы модуль работал на машинах без звука
+
+        if self.loopback:
+            speaker = sc.default_speaker()
+            device = sc.get_microphone(speaker.id, include_loopback=True)
+        else:
+            device = sc.default_microphone()
+        return device.recorder(samplerate=samplerate, channels=channels, blocksize=blocksize)
+
+
+class _ArrayRecorder:
+    """Отдает заранее подготовленный сигнал блоками в реальном времени или без задержек"""
+
+    def __init__(self, samples, samplerate, channels, realtime, loop=False):
+        self.samples = samples
+        self.samplerate = samplerate
+        self.channels = channels
+        self.realtime = realtime
+        self.loop = loop
+        self.pos = 0
+        self.exhausted = False
+        self._next_time = None
+
+    def __enter__(self):
+        self._next_time = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, numframes):
+        block = self._take(numframes)
+        if self.realtime:
+            # Держим темп устройства: блок отдается не раньше, чем он "записался бы"
+            self._next_time += numframes / self.samplerate
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if self.channels > 1:
+            return np.repeat(block[:, None], self.channels, axis=1)
+        return block[:, None]
+
+    @property
+    def total(self):
+        return len(self.samples)
+
+    def _slice(self, start, n):
+        return self.samples[start:start + n]
+
+    def _take(self, numframes):
+        total = self.total
+        if self.pos >= total and self.loop and total:
+            self.pos = 0
+        block = self._slice(self.pos, min(numframes, total - self.pos))
+        self.pos += len(block)
+        if self.pos >= total and not self.loop:
+            if len(block) == 0:
+                self.exhausted = True
+            if self.realtime:
+                # В реальном времени после конца файла идет тишина, как у настоящего устройства
+                block = np.concatenate((block, np.zeros(numframes - len(block), dtype=np.float32)))
+        return block
+
+
+class WavFileSource(AudioSource):
+    """Воспроизведение WAV-файла (PCM 16 бит) в реальном времени или на максимальной скорости"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.name = path
+
+    def _load(self, samplerate):
+        with wave.open(self.path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: поддерживается только PCM 16 бит")
+            n_channels = wf.getnchannels()
+            file_rate = wf.getframerate()
+            raw = wf.readframes(wf.getnframes())
+
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768
+        if n_channels > 1:
+            samples = samples.reshape(-1, n_channels).mean(axis=1)
+        if file_rate != samplerate:
+            # Простая линейная передискретизация - для тестовых файлов достаточно
+            n_out = int(len(samples) * samplerate / file_rate)
+            samples = np.interp(np.arange(n_out) * file_rate / samplerate,
+                                np.arange(len(samples)), samples).astype(np.float32)
+        return samples
+
+    def recorder(self, samplerate=RATE, channels=1, blocksize=None):
+        return _ArrayRecorder(self._load(samplerate), samplerate, channels, self.realtime, self.loop)
+
+
+class SyntheticSource(AudioSource):
+    """Синтетический сигнал: тон, белый шум или похожая на речь последовательность слогов"""
+
+    KINDS = ("tone", "noise", "speech")
+
+    def __init__(self, kind="speech", duration=60.0, realtime=True, level=0.3, freq=220.0, seed=0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Неизвестный тип синтетического сигнала: {kind}")
+        self.kind = kind
+        self.duration = duration
+        self.realtime = realtime
+        self.level = level
+        self.freq = freq
+        self.seed = seed
+        self.name = f"synthetic-{kind}"
+
+    def length(self, samplerate=RATE):
+        return int(self.duration * samplerate)
+
+    def generate(self, samplerate=RATE):
+        """Весь сигнал целиком; то же самое, что recorder отдает блоками"""
+        return self.block(_SynthesisState(self.seed), 0, self.length(samplerate), samplerate)
+
+    def block(self, state, start, n, samplerate=RATE):
+        """n сэмплов начиная с позиции start; state хранит ГСЧ и фазу между блоками"""
+        t = (start + np.arange(n)) / samplerate
+        if self.kind == "tone":
+            audio = np.sin(2 * np.pi * self.freq * t)
+        elif self.kind == "noise":
+            audio = state.rng.uniform(-1.0, 1.0, n)
+        else:
+            audio = self._speech(t, state, samplerate)
+        return (audio * self.level).astype(np.float32)
+
+    def _speech(self, t, state, samplerate):
+        # Гармоники с плавающим тоном, модулированные слогами по ~0.2 с и паузами между фразами
+        pitch = self.freq * (1 + 0.1 * np.sin(2 * np.pi * 0.5 * t))
+        phase = state.phase + 2 * np.pi * np.cumsum(pitch) / samplerate
+        if len(phase):
+            state.phase = phase[-1] % (2 * np.pi)
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        syllables = np.clip(np.sin(2 * np.pi * 5 * t), 0, None) ** 2
+        phrases = (np.sin(2 * np.pi * 0.25 * t) > -0.3).astype(np.float32)
+        breath = 0.05 * state.rng.standard_normal(len(t))
+        return (voiced * syllables + breath) * phrases
+
+    def recorder(self, samplerate=RATE, channels=1, blocksize=None):
+        return _SyntheticRecorder(self, samplerate, channels, self.realtime)
+
+
+class _SynthesisState:
+    def __init__(self, seed):
+        self.rng = np.random.default_rng(seed)
+        self.phase = 0.0
+
+
+class _SyntheticRecorder(_ArrayRecorder):
+    """Синтетика считается блоками по мере чтения: память - на один блок при любой длительности,
+    открытие мгновенное. Сигнал тот же, что у SyntheticSource.generate()"""
+
+    def __init__(self, source, samplerate, channels, realtime):
+        super().__init__(None, samplerate, channels, realtime)
+        self.source = source
+        self.state = _SynthesisState(source.seed)
+        self._total = source.length(samplerate)
+
+    @property
+    def total(self):
+        return self._total
+
+    def _slice(self, start, n):
+        return self.source.block(self.state, start, n, self.samplerate)
+
+
+def default_sources():
+    """Пара (loopback, микрофон) из реальных устройств по умолчанию"""
+    return SoundcardSource(loopback=True), SoundcardSource(loopback=False)
+
+
+def is_exhausted(recorder):
+    """True, если конечный источник отдал все данные (у устройств soundcard всегда False)"""
+    return getattr(recorder, "exhausted", False)
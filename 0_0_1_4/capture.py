@@ -0,0 +1,422 @@
+import collections
+import threading
+import time
+import numpy as np
+from audio_sources import is_exhausted
+from dsp import StreamingResampler
+from metrics import CaptureStats, RollingWindow
+
+# Константы
+RATE = 16000
+RING_SECONDS = 10  # Емкость кольцевого буфера каждого источника
+DRIFT_MIN_SECONDS = 2.0  # Сколько секунд копим, прежде чем оценивать дрейф часов
+DRIFT_SMOOTHING = 0.05  # Коэффициент сглаживания оценки частоты устройства
+SPEECH_LEVEL = 0.02  # Порог амплитуды фрагмента, выше которого считаем, что в нем речь
+UTTERANCE_GAP = 1.0  # Пауза в секундах, после которой фраза считается законченной
+MIN_BLOCK = RATE // 20  # 50 мс - минимальная задержка захвата
+MAX_BLOCK = RATE // 2  # 500 мс - минимум накладных расходов Python на вызов
+CPU_PRESSURE = 0.5  # Обработка блока дольше этой доли его длительности - блок пора увеличить
+CALM_SECONDS = 30  # Сколько секунд без проблем, прежде чем снова уменьшить блок
+GROW_COOLDOWN = 2.0  # Не увеличивать блок чаще, чем раз в столько секунд
+
+
+class RingBuffer:
+    """Кольцевой буфер float32 для одного писателя и одного читателя без блокировок.
+
+    Писатель двигает только write_pos, читатель - только read_pos. Оба счетчика
+    монотонные (всего сэмплов), поэтому под GIL достаточно обновлять их после копирования.
+    Если читатель не успевает, лишние входящие сэмплы отбрасываются и считаются в dropped.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.dropped = 0
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, data):
+        n = len(data)
+        free = self.capacity - (self.write_pos - self.read_pos)
+        if n > free:
+            self.dropped += n - free
+            data = data[:free]
+            n = free
+        if n == 0:
+            return 0
+
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        self.write_pos += n
+        return n
+
+    def read(self, n, out=None):
+        n = min(n, self.available())
+        if out is None:
+            out = np.empty(n, dtype=np.float32)
+        start = self.read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._buf[start:start + first]
+        if first < n:
+            out[first:n] = self._buf[:n - first]
+        self.read_pos += n
+        return out[:n]
+
+    def skip(self, n):
+        n = min(n, self.available())
+        self.read_pos += n
+        return n
+
+    def clear(self):
+        self.read_pos = self.write_pos
+
+
+class AdaptiveBlockSize:
+    """Размер блока захвата, подстраиваемый по измеренной нагрузке.
+
+    Начинает с маленьких блоков (низкая задержка). При переполнении кольцевого буфера или когда
+    обработка блока занимает больше CPU_PRESSURE его длительности, блок удваивается; после
+    CALM_SECONDS спокойной работы с запасом по времени - уменьшается вдвое.
+    """
+
+    def __init__(self, rate=RATE, min_block=MIN_BLOCK, max_block=MAX_BLOCK, start=None,
+                 clock=time.monotonic):
+        self.rate = rate
+        self.min_block = min_block
+        self.max_block = max_block
+        self.size = start or min_block
+        self.clock = clock
+        self.changes = 0
+        self.latency_ms = RollingWindow()  # Задержка от захвата до обработки
+        self._lost = 0
+        self._last_grow = -GROW_COOLDOWN
+        self._calm_since = clock()
+
+    def observe(self, processing_seconds, frames, lost, queued):
+        """processing_seconds - время обработки блока из frames сэмплов; lost - сколько всего кадров
+        выбросили кольцевые буферы; queued - сколько сэмплов еще ждет в буфере после этого блока"""
+        now = self.clock()
+        duration = frames / self.rate
+        self.latency_ms.add((duration + queued / self.rate) * 1000)
+
+        overrun = lost > self._lost
+        self._lost = lost
+        pressure = processing_seconds > CPU_PRESSURE * duration
+
+        if overrun or pressure:
+            self._calm_since = now
+            if self.size < self.max_block and now - self._last_grow >= GROW_COOLDOWN:
+                self._resize(min(self.size * 2, self.max_block))
+                self._last_grow = now
+        elif now - self._calm_since >= CALM_SECONDS and processing_seconds < 0.1 * duration:
+            self._calm_since = now
+            if self.size > self.min_block:
+                self._resize(max(self.size // 2, self.min_block))
+        return self.size
+
+    def reset_losses(self, lost=0):
+        """Новая точка отсчета потерь: у потоков новой сессии счетчики снова с нуля,
+        а после паузы прирост относительно прежнего итога не должен считаться переполнением"""
+        self._lost = lost
+
+    def _resize(self, size):
+        print(f"Размер блока захвата: {self.size * 1000 // self.rate} -> {size * 1000 // self.rate} мс")
+        self.size = size
+        self.changes += 1
+
+    def format(self):
+        return (f"блок {self.size * 1000 // self.rate} мс, задержка p50={self.latency_ms.percentile(50):.0f} "
+                f"p99={self.latency_ms.percentile(99):.0f} мс")
+
+
+class HistoryBuffer:
+    """Кольцо последних нескольких минут звука: новые данные затирают самые старые.
+
+    Рядом с аудио хранится пиковый уровень каждого фрагмента, по нему находится
+    последняя фраза. Пишет поток записи, читает GUI, поэтому доступ под блокировкой.
+    """
+
+    def __init__(self, seconds, rate=RATE):
+        self.rate = rate
+        self.capacity = int(seconds * rate)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self.total = 0  # Всего записано сэмплов
+        self._chunks = collections.deque()  # (начало, конец, пиковый уровень) в глобальных позициях
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        data = np.asarray(data, dtype=np.float32)[-self.capacity:]
+        n = len(data)
+        if n == 0:
+            return
+        with self._lock:
+            pos = self.total % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buf[pos:pos + first] = data[:first]
+            self._buf[:n - first] = data[first:]
+            self._chunks.append((self.total, self.total + n, float(np.max(np.abs(data)))))
+            self.total += n
+            # Фрагменты, начало которых уже затерто, больше не нужны
+            while self._chunks and self._chunks[0][0] < self.total - self.capacity:
+                self._chunks.popleft()
+
+    def _slice(self, start, end):
+        """Копия сэмплов с глобальными позициями [start, end); вызывать под блокировкой"""
+        start = max(start, self.total - self.capacity, 0)
+        n = max(0, end - start)
+        out = np.empty(n, dtype=np.float32)
+        pos = start % self.capacity
+        first = min(n, self.capacity - pos)
+        out[:first] = self._buf[pos:pos + first]
+        out[first:] = self._buf[:n - first]
+        return out
+
+    def last(self, seconds):
+        """Последние seconds секунд звука"""
+        with self._lock:
+            return self._slice(self.total - int(seconds * self.rate), self.total)
+
+    def last_utterance(self, threshold=SPEECH_LEVEL, max_gap=UTTERANCE_GAP):
+        """Последняя фраза: фрагменты с речью, разделенные паузами короче max_gap"""
+        gap = int(max_gap * self.rate)
+        with self._lock:
+            start = end = None
+            for chunk_start, chunk_end, level in reversed(self._chunks):
+                if level < threshold:
+                    continue
+                if end is None:
+                    end = chunk_end
+                elif start - chunk_end > gap:
+                    break
+                start = chunk_start
+            if end is None:
+                return np.zeros(0, dtype=np.float32)
+            return self._slice(start, end)
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+            self._chunks.clear()
+
+
+class ResampledRecorder:
+    """Обертка над recorder, открытым на нативной частоте устройства: отдает блоки в out_rate.
+
+    Передискретизация идет в нашем потоке захвата потоковым полифазным фильтром,
+    а не внутри звуковой подсистемы ОС. cpu_time - суммарное время на передискретизацию.
+    """
+
+    def __init__(self, recorder, in_rate, out_rate=RATE):
+        self.recorder = recorder
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.resampler = StreamingResampler(in_rate, out_rate)
+        self.realtime = getattr(recorder, "realtime", True)
+        self.cpu_time = 0.0
+        self.frames_out = 0
+
+    @property
+    def exhausted(self):
+        return is_exhausted(self.recorder)
+
+    def record(self, numframes):
+        data = self.recorder.record(numframes=int(round(numframes * self.in_rate / self.out_rate)))
+        start = time.perf_counter()
+        block = np.asarray(data, dtype=np.float32)
+        if block.ndim > 1:
+            block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        out = self.resampler.process(block)
+        self.cpu_time += time.perf_counter() - start
+        self.frames_out += len(out)
+        return out[:, None]
+
+
+class CaptureThread(threading.Thread):
+    """Поток захвата одного устройства: читает блоки и пишет их в собственный RingBuffer"""
+
+    def __init__(self, recorder, numframes, rate=RATE, ring_seconds=RING_SECONDS,
+                 data_ready=None, clock=time.monotonic, name=None):
+        super().__init__(name=name)
+        self.daemon = True
+        self.recorder = recorder
+        self.numframes = numframes
+        self.rate = rate
+        self.ring = RingBuffer(rate * ring_seconds)
+        self.data_ready = data_ready or threading.Event()
+        self.clock = clock
+        self.error = None
+
+        self.t0 = None  # Время первого сэмпла по часам хоста
+        self.frames = 0  # Сколько сэмплов получено от устройства
+        self.measured_rate = float(rate)  # Оценка фактической частоты устройства
+        self.finished = False  # Поток завершился (источник исчерпан или ошибка)
+        # Источники без темпа реального времени (файл на максимальной скорости) не теряют данные,
+        # а ждут читателя; дрейф часов для них не оценивается
+        self.realtime = getattr(recorder, "realtime", True)
+        self.stats = CaptureStats(name or "capture", rate)
+        self.discarded = 0  # Кадры, прочитанные на паузе и выброшенные, - это не потери
+        self._stop_event = threading.Event()
+        self._running = threading.Event()  # Сброшен на паузе записи
+        self._running.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                if not self.realtime and not self._running.is_set():
+                    # Файл на паузе просто не читаем - он подождет
+                    self._running.wait()
+                    continue
+                read_start = self.clock()
+                data = self.recorder.record(numframes=self.numframes)
+                now = self.clock()
+                if is_exhausted(self.recorder):
+                    break
+                block = np.asarray(data, dtype=np.float32)
+                if block.ndim > 1:
+                    block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                if not len(block):
+                    continue
+
+                if self.t0 is None:
+                    self.t0 = now - len(block) / self.rate
+                self.frames += len(block)
+                if self.realtime:
+                    self._update_rate(now)
+                else:
+                    self._wait_for_space(len(block))
+
+                if self._running.is_set():
+                    self.ring.write(block)
+                else:
+                    # Пауза: устройство вычитываем, чтобы не переполнился его буфер в ОС,
+                    # но в кольцо не пишем - иначе оно переполнится и это сочтется потерей
+                    self.discarded += len(block)
+                self.stats.record_block(now - read_start, len(block), now, self.ring.available(), self.ring.dropped,
+                                        self.discarded)
+                self.data_ready.set()
+        except Exception as e:
+            self.error = e
+            print(f"Ошибка захвата {self.name}: {e}")
+        finally:
+            self.finished = True
+            self.data_ready.set()
+
+    def _wait_for_space(self, n):
+        while self.ring.capacity - self.ring.available() < n and not self._stop_event.is_set():
+            time.sleep(0.001)
+
+    def _update_rate(self, now):
+        elapsed = now - self.t0
+        if elapsed < DRIFT_MIN_SECONDS:
+            return
+        rate = self.frames / elapsed
+        self.measured_rate += (rate - self.measured_rate) * DRIFT_SMOOTHING
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._running.set()
+
+
+class StreamMixer:
+    """Выравнивает два потока по временным меткам и компенсирует дрейф часов.
+
+    Первый поток (loopback) считается опорным. Второй поток (микрофон) при старте
+    сдвигается так, чтобы первые сэмплы совпали по времени, а затем передискретизируется
+    линейной интерполяцией с коэффициентом measured_rate второго / measured_rate первого.
+    """
+
+    def __init__(self, reference, secondary, rate=RATE):
+        self.reference = reference
+        self.secondary = secondary
+        self.rate = rate
+        self.aligned = False
+        self._phase = 0.0  # Дробная позиция чтения второго потока
+        self._tail = np.zeros(0, dtype=np.float32)  # Непрочитанный хвост второго потока
+
+    def drift_ratio(self):
+        return self.secondary.measured_rate / self.reference.measured_rate
+
+    def _align(self):
+        if self.reference.t0 is None or self.secondary.t0 is None:
+            return False
+        offset = 0
+        if self.reference.realtime and self.secondary.realtime:
+            offset = int(round((self.secondary.t0 - self.reference.t0) * self.rate))
+        if offset > 0:
+            # Второй поток стартовал позже - пропускаем начало опорного
+            if self.reference.ring.available() < offset:
+                return False
+            self.reference.ring.skip(offset)
+        elif offset < 0:
+            if self.secondary.ring.available() < -offset:
+                return False
+            self.secondary.ring.skip(-offset)
+        self.aligned = True
+        return True
+
+    def read(self, numframes):
+        """Возвращает (reference, secondary) по numframes сэмплов или None, если данных мало"""
+        if not self.aligned and not self._align():
+            return None
+
+        ratio = self.drift_ratio()
+        # Сколько сэмплов второго потока нужно для numframes выходных (+1 для интерполяции)
+        need = int(np.ceil(self._phase + numframes * ratio)) + 1
+        if self.reference.ring.available() < numframes or \
+                len(self._tail) + self.secondary.ring.available() < need:
+            return None
+
+        ref = self.reference.ring.read(numframes)
+        fresh = self.secondary.ring.read(max(0, need - len(self._tail)))
+        src = np.concatenate((self._tail, fresh)) if len(self._tail) else fresh
+
+        positions = self._phase + np.arange(numframes) * ratio
+        sec = np.interp(positions, np.arange(len(src)), src).astype(np.float32)
+
+        consumed = int(self._phase + numframes * ratio)
+        self._phase = self._phase + numframes * ratio - consumed
+        self._tail = src[consumed:]
+        return ref, sec
+
+    def flush(self):
+        """Остаток после остановки потоков: все выровненные сэмплы, которых меньше блока.
+        Возвращает (reference, secondary) одинаковой длины или None, если смешивать нечего"""
+        if not self.aligned and not self._align():
+            return None
+
+        ratio = self.drift_ratio()
+        fresh = self.secondary.ring.read(self.secondary.ring.available())
+        src = np.concatenate((self._tail, fresh)) if len(self._tail) else fresh
+        # Выходной сэмпл k берется с позиции phase + k * ratio, и она должна попадать внутрь src
+        numframes = min(self.reference.ring.available(),
+                        int(np.floor((len(src) - 1 - self._phase) / ratio)) + 1 if len(src) else 0)
+        if numframes <= 0:
+            self._tail = src
+            return None
+
+        ref = self.reference.ring.read(numframes)
+        positions = self._phase + np.arange(numframes) * ratio
+        sec = np.interp(positions, np.arange(len(src)), src).astype(np.float32)
+
+        consumed = int(self._phase + numframes * ratio)
+        self._phase = self._phase + numframes * ratio - consumed
+        self._tail = src[consumed:]
+        return ref, sec
+
+    def reset(self):
+        self.reference.ring.clear()
+        self.secondary.ring.clear()
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._phase = 0.0
@@ -0,0 +1,114 @@
+import numpy as np
+from scipy import signal
+
+# Константы
+RATE = 16000
+HIGHPASS_HZ = 300
+COMPRESS_THRESHOLD = 0.1
+COMPRESS_RATIO = 0.5
+PEAK_FLOOR = 1e-3  # Минимальный пик для нормализации, чтобы не раздувать тишину
+
+
+class StreamingPreprocessor:
+    """Потоковая версия preprocess_audio: обрабатывает аудио по кусочкам во время записи.
+
+    Коэффициенты фильтра (SOS) считаются один раз, состояние фильтра (zi) переносится между
+    кусочками, вся обработка идет в float32 на месте с одним переиспользуемым буфером.
+    Глобальный пик заранее неизвестен, поэтому нормализация идет по максимуму,
+    накопленному к текущему моменту.
+    """
+
+    def __init__(self, sample_rate=RATE, cutoff=HIGHPASS_HZ,
+                 threshold=COMPRESS_THRESHOLD, ratio=COMPRESS_RATIO):
+        self.sos = signal.butter(2, cutoff / (sample_rate / 2), 'highpass', output='sos').astype(np.float32)
+        self.threshold = np.float32(threshold)
+        self.ratio = np.float32(ratio)
+        # Пик после компрессии нормализованного сигнала, по нему выравниваем выход к 1.0
+        self.output_gain = np.float32(1.0 / (threshold + (1.0 - threshold) * ratio))
+        self._scratch = np.empty(0, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros((self.sos.shape[0], 2), dtype=np.float32)
+        self.peak = PEAK_FLOOR
+
+    def process(self, chunk):
+        """Обрабатывает кусочек и возвращает новый float32-массив той же длины"""
+        x = np.asarray(chunk, dtype=np.float32)
+        n = len(x)
+        if n == 0:
+            return x.copy()
+
+        # Нормализация по накопленному пику
+        self.peak = max(self.peak, float(np.max(np.abs(x))))
+
+        # Фильтр высоких частот с переносом состояния (удаляет и постоянную составляющую)
+        y, self.zi = signal.sosfilt(self.sos, x, zi=self.zi)
+        y = y.astype(np.float32, copy=False)
+        y *= np.float32(1.0 / self.peak)
+
+        # Компрессия: y - sign(y) * max(|y| - threshold, 0) * (1 - ratio)
+        if len(self._scratch) < n:
+            self._scratch = np.empty(n, dtype=np.float32)
+        excess = self._scratch[:n]
+        np.abs(y, out=excess)
+        excess -= self.threshold
+        np.maximum(excess, 0, out=excess)
+        excess *= 1 - self.ratio
+        np.copysign(excess, y, out=excess)
+        y -= excess
+
+        y *= self.output_gain
+        return y
+
+
+class StreamingResampler:
+    """Потоковый полифазный передискретизатор с переносом состояния между кусочками.
+
+    Фильтр НЧ проектируется один раз и раскладывается на up фаз. Для каждого выходного
+    сэмпла берется нужная фаза и L последних входных сэмплов, поэтому кусочки любого
+    размера склеиваются без щелчков и без переходных процессов на границах.
+    """
+
+    def __init__(self, in_rate, out_rate=RATE, taps_per_phase=32):
+        from math import gcd
+
+        g = gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+
+        # Фильтр в "повышенной" частоте: срез по меньшей из двух частот Найквиста
+        numtaps = taps_per_phase * self.up
+        h = signal.firwin(numtaps, 0.95 / max(self.up, self.down), window=('kaiser', 8.0)) * self.up
+        # phases[p, j] = h[p + j * up]; свертка идет от новых сэмплов к старым
+        self.taps = taps_per_phase
+        self.phases = h.reshape(taps_per_phase, self.up).T.astype(np.float32)
+        self.delay = (numtaps - 1) / 2 / self.up  # Групповая задержка во входных сэмплах
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._in_pos = 0  # Сколько входных сэмплов получено всего
+        self._out_pos = 0  # Сколько выходных сэмплов выдано всего
+
+    def process(self, chunk):
+        x = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        buf = np.concatenate((self._history, x))
+        first_in = self._in_pos - (self.taps - 1)  # Глобальный индекс buf[0]
+        self._in_pos += len(x)
+
+        # Выходные сэмплы, у которых последний нужный входной сэмпл уже пришел
+        end_out = (self._in_pos * self.up + self.down - 1) // self.down
+        k = np.arange(self._out_pos, end_out)
+        self._out_pos = end_out
+        self._history = buf[len(buf) - (self.taps - 1):]
+        if not len(k):
+            return np.zeros(0, dtype=np.float32)
+
+        t = k * self.down
+        base = t // self.up - first_in  # Индекс самого нового входного сэмпла в buf
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps)[base - (self.taps - 1)]
+        # windows[:, -1] - самый новый сэмпл, ему соответствует phases[:, 0]
+        return np.einsum('ij,ij->i', windows[:, ::-1], self.phases[t % self.up])
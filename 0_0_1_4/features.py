@@ -0,0 +1,117 @@
+import numpy as np
+
+# Параметры признаков Whisper (whisper/audio.py)
+RATE = 16000
+N_FFT = 400
+HOP_LENGTH = 160
+N_MELS = 80
+N_FRAMES = 3000  # Кадров в 30-секундном окне энкодера
+DYNAMIC_RANGE = 8.0  # Whisper ограничивает логарифм диапазоном max - 8
+LOG_FLOOR = 1e-10
+
+
+def load_mel_filters(n_mels=N_MELS):
+    """Банк мел-фильтров из ресурсов Whisper, формы (n_mels, N_FFT // 2 + 1)"""
+    import os
+    import whisper
+
+    path = os.path.join(os.path.dirname(whisper.__file__), "assets", "mel_filters.npz")
+    with np.load(path, allow_pickle=False) as f:
+        return f[f"mel_{n_mels}"].astype(np.float32)
+
+
+class IncrementalLogMel:
+    """Лог-мел спектрограмма Whisper, которая считается по мере поступления аудио.
+
+    Повторяет whisper.log_mel_spectrogram(audio, padding=N_SAMPLES): STFT с окном Ханна,
+    center=True (отражение в начале), тишина после конца записи. Хвост последних N_FFT
+    сэмплов переносится между кусочками, поэтому каждый кадр считается ровно один раз.
+    Хранятся "сырые" log10-кадры; ограничение диапазона по глобальному максимуму
+    и масштабирование делаются дешево в log_mel().
+    """
+
+    def __init__(self, n_mels=N_MELS, filters=None):
+        self.n_mels = n_mels
+        self.filters = filters if filters is not None else load_mel_filters(n_mels)
+        # Периодическое окно Ханна, как torch.hann_window(N_FFT)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        self.n_samples = 0
+        self.max_log = -np.inf
+        self._frames = []  # Список массивов (k, n_mels) с log10-энергиями
+        self._head = np.zeros(0, dtype=np.float32)  # Начало записи, пока не хватает на отражение
+        self._tail = None  # Необработанный хвост в координатах дополненного сигнала
+
+    def append(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        self.n_samples += len(chunk)
+
+        if self._tail is None:
+            # Для отражения в начале нужен N_FFT // 2 + 1 сэмпл
+            self._head = np.concatenate((self._head, chunk))
+            if len(self._head) <= N_FFT // 2:
+                return
+            pad = self._head[1:N_FFT // 2 + 1][::-1]
+            self._tail = np.concatenate((pad, self._head))
+            self._head = np.zeros(0, dtype=np.float32)
+        else:
+            self._tail = np.concatenate((self._tail, chunk))
+
+        log_mel, self._tail = self._compute(self._tail)
+        if log_mel is not None:
+            self.max_log = max(self.max_log, float(log_mel.max()))
+            self._frames.append(log_mel)
+
+    def _compute(self, buf, limit=None):
+        """Считает полные кадры в buf; возвращает (log10-кадры или None, остаток для следующего кадра)"""
+        if len(buf) < N_FFT:
+            return None, buf
+        count = (len(buf) - N_FFT) // HOP_LENGTH + 1
+        if limit is not None:
+            count = min(count, limit)
+        if count <= 0:
+            return None, buf
+
+        frames = np.lib.stride_tricks.sliding_window_view(buf, N_FFT)[::HOP_LENGTH][:count]
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        mel = power @ self.filters.T
+        return np.log10(np.maximum(mel, LOG_FLOOR)), buf[count * HOP_LENGTH:]
+
+    def content_frames(self):
+        """Сколько кадров приходится на записанное аудио (как content_frames в whisper.transcribe)"""
+        return self.n_samples // HOP_LENGTH
+
+    def log_mel(self, padding=0):
+        """Нормализованная лог-мел спектрограмма формы (n_mels, content_frames + padding) в float32
+
+        padding - сколько кадров тишины досчитать после записи: с padding=N_FRAMES
+        результат совпадает с log_mel_spectrogram(audio, padding=N_SAMPLES), и окна
+        энкодера добиваются настоящими кадрами тишины, а не нулями.
+        """
+        # Снимок состояния: запись может продолжаться в другом потоке
+        total = self.content_frames() + padding
+        frames = list(self._frames)
+        n_frames = sum(len(f) for f in frames)
+        tail, head = self._tail, self._head
+        max_log = self.max_log
+
+        missing = total - n_frames
+        if missing > 0:
+            # Последние кадры захватывают тишину после конца записи - досчитываем их на копии хвоста
+            if tail is None:
+                pad = np.pad(head, (0, N_FFT // 2 + 1 - len(head)))[1:N_FFT // 2 + 1][::-1]
+                tail = np.concatenate((pad, head))
+            buf = np.concatenate((tail, np.zeros(missing * HOP_LENGTH + N_FFT, dtype=np.float32)))
+            log_mel, _ = self._compute(buf, limit=missing)
+            if log_mel is not None:
+                frames.append(log_mel)
+                max_log = max(max_log, float(log_mel.max()))
+
+        if not frames:
+            return np.zeros((self.n_mels, 0), dtype=np.float32)
+        log_spec = np.concatenate(frames)[:total].T
+        log_spec = np.maximum(log_spec, max_log - DYNAMIC_RANGE)
+        return ((log_spec + 4.0) / 4.0).astype(np.float32)
@@ -6,41 +6,57 @@ torch.set_num_threads(1)
 from PyQt5.QtWidgets import (QWidget, QLabel, QVBoxLayout, QPushButton,
                              QHBoxLayout, QApplication, QProgressBar, QTextEdit)
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QTextCursor
 import time
 from audio_recorder import AudioRecorder
-import multiprocessing as mp
-import faulthandler, sys, traceback
+from llm_worker import LLMWorker, STATUS, CHUNK, REPLY, ERROR, RETRY
+from metrics import RollingWindow
+from pipe_notifier import PipeNotifier
+import faulthandler, sys
 faulthandler.enable()
 os.environ["PYTHONFAULTHANDLER"] = "1"
 
-class RequestProcess(mp.Process):
-    def __init__(self, conn, query, model="gpt-4o-mini"):
-        super().__init__()
-        self.conn  = conn
-        self.query = query
-        self.model = model
-
-    def run(self):
-        try:
-            print("[RequestProcess] start, pid =", os.getpid(), flush=True)
-            from duckai import DuckAI
-            duck = DuckAI()
-            self.conn.send("[RequestProcess] Запрос отправлен…")
-            resp = duck.chat(self.query, model=self.model)
-            self.conn.send(resp)
-        except Exception as e:
-            tb = traceback.format_exc()
-            self.conn.send(f"[RequestProcess] Python-ошибка: {e}\n{tb}")
-        finally:
-            self.conn.close()
+RETRO_SECONDS = 30  # Окно для "транскрибировать последние N секунд" (Alt+K)
+REPAINT_MS = 50  # Куски ответа копятся и дописываются в поле не чаще раза в REPAINT_MS
+REQUEST_PROMPT = ("Представь ты на собеседование мидл python разработчик, "
+                  "тебе надо коротко ответить на вопрос. "
+                  "Учитывай, что я могу опечататься…  Вот вопрос:")
+
+
+def format_age(seconds):
+    if seconds < 60:
+        return "меньше минуты"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} мин"
+    if seconds < 24 * 3600:
+        return f"{int(seconds // 3600)} ч"
+    return f"{int(seconds // (24 * 3600))} дн"
+
 
 class TranscriptionWindow(QWidget):
-    def __init__(self, audio_recorder):
+    def __init__(self, audio_recorder, llm_worker=None, response_cache=None, question_index=None):
         super().__init__()
         self.audio_recorder = audio_recorder
+        # Кэш ответов на диске (ResponseCache): повторный вопрос отвечается мгновенно, Alt+R - обновить
+        self.response_cache = response_cache
+        # Индекс похожих вопросов (QuestionIndex): ответ на похожий вопрос показывается сразу,
+        # а свежий ответ на точный вопрос приходит в фоне и заменяет его целиком
+        self.question_index = question_index
+        self._showing_similar = False
+        self._questions = {}  # номер запроса -> (текст вопроса, время отправки)
+        # Процесс LLM запускается вместе с окном: импорт duckai и соединение готовы к первому клику
+        self.llm_worker = llm_worker or LLMWorker()
+        if self.llm_worker.process is None:
+            self.llm_worker.start()
+        self.current_request = None  # Номер последнего отправленного запроса
+        self._sent_at = 0.0
+        self._stream_buffer = []  # Куски ответа, еще не дописанные в поле
+        self._streamed = False  # В поле уже есть начало ответа на текущий запрос
+        self.first_token_ms = RollingWindow(100)  # От клика до первого текста ответа на экране
+        self.first_token_ms_last = 0.0
         self.is_recording = False
         self.is_paused = False
+        self.showing_live = False  # В поле текста сейчас живые подписи, а не результат транскрибации
 
         # Настройка окна
         self.setWindowTitle("Транскрибация аудио")
@@ -183,7 +199,7 @@ class TranscriptionWindow(QWidget):
                 color: #BDBDBD;
             }
         """)
-        self.send_request_button.clicked.connect(self.send_request)
+        self.send_request_button.clicked.connect(lambda: self.send_request())
         self.send_request_button.setEnabled(False)
         buttons_layout.addWidget(self.send_request_button)
 
@@ -192,6 +208,15 @@ class TranscriptionWindow(QWidget):
         # Таймер записи
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_recording_time)
+
+        # Ответы процесса LLM будят GUI через цикл событий Qt, как только байты пришли в канал
+        self.reply_notifier = PipeNotifier(self)
+        self.reply_notifier.ready.connect(self._poll_reply)
+        self.reply_notifier.watch(self.llm_worker.conn)
+        # Отложенная дорисовка кусков ответа: одна вставка текста на пачку кусков
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.timeout.connect(self._flush_stream)
         self.recording_start_time = 0
         self.recording_elapsed_time = 0
 
@@ -218,18 +243,32 @@ class TranscriptionWindow(QWidget):
         self.response_output.setMinimumHeight(150)
         main_layout.addWidget(self.response_output)
 
+        # Отладочная строка с метриками захвата (Alt+D)
+        self.debug_label = QLabel("")
+        self.debug_label.setStyleSheet("color: #888888; font-size: 11px;")
+        self.debug_label.setWordWrap(True)
+        self.debug_label.hide()
+        main_layout.addWidget(self.debug_label)
+
         self.setLayout(main_layout)
         self.resize(600, 600)
 
         # Подключение сигналов от аудио рекордера
         self.audio_recorder.signals.transcription_complete.connect(self.handle_transcription_complete)
         self.audio_recorder.signals.transcription_progress.connect(self.handle_transcription_progress)
+        self.audio_recorder.signals.capture_stats.connect(self.debug_label.setText)
+        self.audio_recorder.signals.live_caption.connect(self.handle_live_caption)
+        self.audio_recorder.signals.capture_error.connect(self.handle_capture_error)
+
+        # Постоянная запись в кольцевой буфер (если включена в AudioRecorder)
+        self.audio_recorder.start_listening()
 
     def toggle_recording(self):
         if not self.is_recording:
             # Начать запись
             self.is_recording = True
             self.is_paused = False
+            self.showing_live = True
             self.audio_recorder.start_recording()
             self.record_button.setText("Пауза")
             self.status_label.setText("Запись...")
@@ -248,9 +287,13 @@ class TranscriptionWindow(QWidget):
             self.timer.stop()
             self.recording_elapsed_time = time.time() - self.recording_start_time
             self.transcribe_button.setEnabled(True)
+            # С живыми подписями текст уже есть (Whisper дочищает последнюю фразу) - можно отправлять
+            if self.audio_recorder.live_text():
+                self.send_request_button.setEnabled(True)
         else:
             # Продолжить запись
             self.is_paused = False
+            self.showing_live = True
             self.audio_recorder.resume_recording()
             self.record_button.setText("Пауза")
             self.status_label.setText("Запись...")
@@ -261,6 +304,7 @@ class TranscriptionWindow(QWidget):
             self.send_request_button.setEnabled(False)
 
     def clear_recording(self):
+        self.showing_live = False
         self.audio_recorder.clear_recording()
         self.text_output.setText("Здесь будет отображаться транскрибированный текст")
         self.status_label.setText("Запись очищена")
@@ -283,6 +327,7 @@ class TranscriptionWindow(QWidget):
 
     def transcribe_audio(self):
         if self.audio_recorder.has_recording():
+            self.showing_live = False
             self.status_label.setText("Транскрибация...")
             self.status_label.setStyleSheet("color: #2196F3; font-size: 14px;")
             self.transcribe_button.setEnabled(False)
@@ -298,6 +343,32 @@ class TranscriptionWindow(QWidget):
             self.status_label.setText("Нет записи для транскрибации")
             self.status_label.setStyleSheet("color: #F44336; font-size: 14px;")
 
+    def transcribe_last(self, seconds=None):
+        """Транскрибация последней фразы (или последних seconds секунд) из постоянной записи"""
+        if seconds:
+            self.status_label.setText(f"Транскрибация последних {seconds} секунд...")
+        else:
+            self.status_label.setText("Транскрибация последней фразы...")
+        self.status_label.setStyleSheet("color: #2196F3; font-size: 14px;")
+        self.showing_live = False
+        self.send_request_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.audio_recorder.transcribe_last(seconds)
+
+    def keyPressEvent(self, event):
+        # Alt+L - последняя фраза, Alt+K - последние RETRO_SECONDS секунд, Alt+D - метрики захвата,
+        # Alt+R - отправить запрос заново, мимо кэша ответов
+        if event.modifiers() & Qt.AltModifier:
+            if event.key() == Qt.Key_L:
+                self.transcribe_last()
+            elif event.key() == Qt.Key_K:
+                self.transcribe_last(RETRO_SECONDS)
+            elif event.key() == Qt.Key_D:
+                self.debug_label.setVisible(not self.debug_label.isVisible())
+            elif event.key() == Qt.Key_R:
+                self.send_request(force=True)
+
     def update_recording_time(self):
         if not self.is_paused:
             self.recording_elapsed_time = time.time() - self.recording_start_time
@@ -306,6 +377,14 @@ class TranscriptionWindow(QWidget):
         seconds = int(self.recording_elapsed_time % 60)
         self.time_label.setText(f"{minutes:02d}:{seconds:02d}")
 
+    def handle_live_caption(self, text):
+        # Поздние уточнения Whisper не затирают результат транскрибации по кнопке
+        if self.showing_live and text:
+            self.text_output.setText(text)
+
+    def handle_capture_error(self, text):
+        self._set_status(text, bad=True)
+
     def handle_transcription_complete(self, text):
         self.text_output.setText(text)
         self.status_label.setText("Транскрибация завершена")
@@ -319,49 +398,158 @@ class TranscriptionWindow(QWidget):
     def handle_transcription_progress(self, progress):
         self.progress_bar.setValue(int(progress))
 
-    def send_request(self):
+    def send_request(self, force=False):
+        """force=True - не брать ответ из кэша, а запросить заново (и обновить кэш)"""
         transcribed_text = self.text_output.text()
         if not transcribed_text or transcribed_text.startswith("Здесь будет"):
             self._set_status("Нет текста для отправки запроса", bad=True)
             return
 
-        prompt = ("Представь ты на собеседование мидл python разработчик, "
-                  "тебе надо коротко ответить на вопрос. "
-                  "Учитывай, что я могу опечататься…  Вот вопрос:")
-        query = f"{prompt} {transcribed_text}"
-        print("[GUI] Отправляемый запрос:", query, flush=True)
+        similar = None
+        if self.response_cache is not None and not force:
+            cached = self.response_cache.get(REQUEST_PROMPT, transcribed_text)
+            if cached is not None:
+                self._show_cached(*cached)
+                return
+            similar = self._find_similar(transcribed_text)
 
-        # Создаём канал для общения
-        parent_conn, child_conn = mp.Pipe()
-        # Запускаем процесс
-        self.req_proc = RequestProcess(child_conn, query)
-        self.req_proc.start()
+        query = f"{REQUEST_PROMPT} {transcribed_text}"
+        print("[GUI] Отправляемый запрос:", query, flush=True)
 
-        # Опрашиваем канал таймером, чтобы не блокировать GUI
-        self.req_timer = QTimer()
-        self.req_timer.timeout.connect(lambda: self._poll_reply(parent_conn))
-        self.req_timer.start(100)       # 10 раз в секунду
+        # Запрос уходит в постоянный процесс; предыдущий может быть еще в работе
+        self._sent_at = time.perf_counter()
+        self._reset_stream()
+        self.response_label.setText("Ответ:")
+        self.current_request = self.llm_worker.submit(query)
+        self._questions[self.current_request] = (transcribed_text, self._sent_at)
+        self._watch_reply_channel()
         self._set_status("Отправка запроса…")
-
-    def _poll_reply(self, conn):
-        while conn.poll():
-            msg = conn.recv()
-            if msg.startswith("[RequestProcess]") and "Python-ошибка" not in msg:
-                print(msg)
+        self._showing_similar = similar is not None
+        if similar is not None:
+            self._show_similar(*similar)
+
+    def _find_similar(self, question):
+        if self.question_index is None:
+            return None
+        found = self.question_index.search(question)
+        if found is None:
+            return None
+        score, key, similar_question = found
+        cached = self.response_cache.get_by_key(key)
+        return (score, similar_question) + cached if cached is not None else None
+
+    def _show_similar(self, score, similar_question, answer, created):
+        self.response_output.setPlainText(answer)
+        self.response_label.setText(f"Ответ на похожий вопрос «{similar_question}» "
+                                    f"(сходство {score:.2f}); свежий ответ загружается…")
+        self._set_status("Ответ на похожий вопрос из кэша")
+        print(f"[GUI] похожий вопрос: {similar_question!r}, сходство {score:.2f}; {self.response_cache.format()}")
+
+    def _watch_reply_channel(self):
+        # После перезапуска процесса LLM канал новый - переключаем уведомитель на него
+        if self.reply_notifier.conn is not self.llm_worker.conn:
+            self.reply_notifier.watch(self.llm_worker.conn)
+
+    def _show_cached(self, answer, created):
+        # Запрос в сети не нужен; ответы на прежние вопросы, если они еще в работе, не затрут этот
+        self.current_request = None
+        self._showing_similar = False
+        self._reset_stream()
+        self.response_output.setPlainText(answer)
+        self.response_label.setText(f"Ответ (из кэша, получен {format_age(time.time() - created)} назад; "
+                                    f"Alt+R - запросить заново):")
+        self._set_status("Ответ из кэша")
+        print(f"[GUI] {self.response_cache.format()}")
+
+    def _cache_reply(self, request_id, kind, answer):
+        question, sent_at = self._questions.pop(request_id, (None, 0.0))
+        if kind == REPLY and question is not None and self.response_cache is not None and answer.strip():
+            key = self.response_cache.put(REQUEST_PROMPT, question, answer, (time.perf_counter() - sent_at) * 1000)
+            if self.question_index is not None:
+                self.question_index.add(key, question)
+
+    def _poll_reply(self):
+        for kind, request_id, payload in self.llm_worker.poll():
+            if kind in (REPLY, ERROR):
+                self._cache_reply(request_id, kind, payload)
+            if kind == STATUS:
+                print(f"[LLMWorker] запрос {request_id}: {payload}")
+            elif request_id != self.current_request:
+                # Ответ на вопрос, который уже сменился более новым, - не затираем им актуальный
+                if kind != CHUNK:
+                    print(f"[LLMWorker] запрос {request_id} устарел, ответ пропущен")
+            elif kind == CHUNK:
+                self._stream_chunk(payload)
+            elif kind == RETRY:
+                self._reset_stream()
+                self._set_status("Процесс LLM перезапущен, запрос повторен…", bad=True)
+            else:
+                self.handle_response(payload, error=kind == ERROR)
+        self._watch_reply_channel()
+        self.reply_notifier.rearm()
+        if not self.llm_worker.in_flight():
+            print(f"[GUI] {self.llm_worker.format()}")
+
+    def _reset_stream(self):
+        self.repaint_timer.stop()
+        self._stream_buffer = []
+        self._streamed = False
+
+    def _stream_chunk(self, text):
+        if self._showing_similar:
+            return  # Ответ на похожий вопрос не перебиваем кусками - свежий придет целиком
+        self._stream_buffer.append(text)
+        if not self._streamed:
+            # Первый кусок показываем сразу - в ответе на собеседовании важнее всего первая фраза
+            self._flush_stream()
+        elif not self.repaint_timer.isActive():
+            self.repaint_timer.start(REPAINT_MS)
+
+    def _flush_stream(self):
+        if not self._stream_buffer:
+            return
+        text = "".join(self._stream_buffer)
+        self._stream_buffer = []
+        if not self._streamed:
+            self._streamed = True
+            self.response_output.setPlainText(text)
+            self._first_token_shown()
+            self._set_status(f"Ответ идет… (первый текст через {self.first_token_ms_last:.0f} мс)")
+            return
+        # Дописываем в конец без перерисовки всего документа; прокрутка остается на начале ответа
+        cursor = QTextCursor(self.response_output.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+
+    def _first_token_shown(self):
+        self.first_token_ms_last = (time.perf_counter() - self._sent_at) * 1000
+        self.first_token_ms.add(self.first_token_ms_last)
+        print(f"[GUI] первый текст ответа через {self.first_token_ms_last:.0f} мс "
+              f"(p50={self.first_token_ms.percentile(50):.0f} мс)")
+
+    def handle_response(self, response, error=False):
+        if self._showing_similar:
+            # На экране ответ на похожий вопрос; при ошибке оставляем его, иначе заменяем свежим
+            self._showing_similar = False
+            if error:
+                self.response_label.setText("Ответ на похожий вопрос (свежий ответ не получен):")
+                self._set_status("Ошибка при получении ответа", bad=True)
             else:
-                self.handle_response(msg)
-                self.req_timer.stop()
-                if self.req_proc.is_alive():
-                    self.req_proc.join(timeout=0.5)
-                break
-
-    def handle_response(self, response):
-        if "Python-ошибка" in response:
+                self.response_output.setPlainText(response)
+                self.response_label.setText("Ответ (обновлен по точному вопросу):")
+                self._set_status("Ответ получен")
+        elif error:
+            self._reset_stream()
             self.response_output.setText(response)
             self._set_status("Ошибка при получении ответа", bad=True)
         else:
-            self.response_output.setText(response)
-            self._set_status("Ответ получен")
+            if self._streamed:
+                self.repaint_timer.stop()
+                self._flush_stream()
+            else:
+                self.response_output.setText(response)
+                self._first_token_shown()
+            self._set_status(f"Ответ получен (первый текст через {self.first_token_ms_last:.0f} мс)")
         self.send_request_button.setEnabled(True)
 
     def _set_status(self, txt, bad=False):
@@ -371,6 +559,10 @@ class TranscriptionWindow(QWidget):
 
     def closeEvent(self, event):
         self.audio_recorder.stop()
+        self.reply_notifier.stop()
+        self.llm_worker.stop()
+        if self.response_cache is not None:
+            self.response_cache.close()
         event.accept()
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+import collections
+import json
+import threading
+import time
+
+import numpy as np
+
+from metrics import RollingWindow
+
+# Константы
+RATE = 16000
+MAX_QUEUED = 10 * RATE  # Сколько звука может ждать распознавателя; блоки захвата бывают разной длины
+MIN_REFINE = RATE // 2  # Фразы короче полсекунды Whisper не уточняем - на них он придумывает текст
+MAX_REFINE_QUEUED = 2  # Сколько фраз может ждать Whisper; более старые остаются с текстом Vosk
+FLUSH = "flush"  # Маркер в очереди: завершить недоговоренную фразу (пауза записи)
+CLEAR = "clear"  # Маркер в очереди: выбросить недоговоренную фразу (запись очищена)
+
+
+class Caption:
+    """Одна фраза: текст Vosk, который заменяется текстом Whisper, когда тот готов"""
+    __slots__ = ("start", "end", "text", "refined", "finished_at")
+
+    def __init__(self, start, end, text, finished_at):
+        self.start = start  # Сэмплы на общей шкале записи
+        self.end = end
+        self.text = text
+        self.refined = False
+        self.finished_at = finished_at
+
+
+class LiveCaptions:
+    """Гибридные живые подписи: быстрый Vosk во время записи и уточнение фраз Whisper в фоне.
+
+    Поток распознавателя кормит KaldiRecognizer фрагментами записи и сообщает промежуточный
+    текст сразу. Когда Vosk завершает фразу, ее звук (ровно то, что видел Vosk) уходит в
+    очередь уточнения: второй поток прогоняет через Whisper только эту фразу и заменяет
+    текст Vosk. К моменту отправки запроса почти все фразы уже уточнены, а последняя
+    отстает на одно распознавание короткого куска, а не всей записи.
+
+    Обе очереди ограничены: при переполнении выбрасывается самый старый звук (маркеры
+    FLUSH/CLEAR остаются на своих местах), а фраза, вытесненная из очереди уточнения более
+    новыми, остается с текстом Vosk - Whisper держит общую блокировку модели, и копить
+    работу для него нельзя.
+
+    refine(audio) -> str - распознавание фразы Whisper; on_update(text) вызывается из
+    фоновых потоков при каждом изменении подписей. Vosk импортируется здесь, чтобы без
+    него приложение работало как раньше: AudioRecorder просто не создает подписи.
+    """
+
+    def __init__(self, model_path, refine, on_update=None, rate=RATE):
+        import vosk
+        self.rate = rate
+        self.refine = refine
+        self.on_update = on_update
+        self.rec = vosk.KaldiRecognizer(vosk.Model(model_path), rate)
+        self.captions = []
+        self.partial = ""
+        self.dropped = 0  # Фрагменты, выброшенные из переполненной очереди распознавателя
+        self.skipped = 0  # Фразы, оставшиеся без уточнения: Whisper не успевал
+        self.refine_ms = RollingWindow(100)  # От конца фразы до готового текста Whisper
+        self._chunks = collections.deque()  # Фрагменты звука и маркеры FLUSH/CLEAR
+        self._queued = 0  # Сэмплов в очереди распознавателя
+        self._refine_queue = collections.deque()  # (фраза, звук) для Whisper
+        self._utterance = []  # Звук текущей фразы
+        self._utterance_start = None
+        self._position = None  # Где на шкале записи кончается уже распознанный звук
+        self._lock = threading.Lock()
+        self._chunks_ready = threading.Condition(self._lock)
+        self._refine_ready = threading.Condition(self._lock)
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._recognize_loop, daemon=True, name="live-vosk"),
+            threading.Thread(target=self._refine_loop, daemon=True, name="live-whisper"),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def feed(self, samples, position):
+        """Фрагмент записи (float32) с его позицией на шкале; поток записи никогда не ждет"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._chunks.append((samples, position))
+            self._queued += len(samples)
+            if self._queued > MAX_QUEUED:
+                self._drop_oldest()
+            self._chunks_ready.notify()
+
+    def _drop_oldest(self):
+        """Распознаватель отстал - для подписей важнее свежий звук, старый выбрасываем.
+        Маркеры не выбрасываются: пауза и очистка записи должны дойти до распознавателя"""
+        markers = []
+        while self._queued > MAX_QUEUED and self._chunks:
+            item = self._chunks.popleft()
+            if isinstance(item, str):
+                markers.append(item)
+                continue
+            self._queued -= len(item[0])
+            self.dropped += 1
+        # Выброшенный звук шел после маркеров, оставшийся - после них же
+        self._chunks.extendleft(reversed(markers))
+
+    def flush(self):
+        """Пауза записи: недоговоренная фраза завершается и уходит на уточнение"""
+        with self._lock:
+            self._chunks.append(FLUSH)
+            self._chunks_ready.notify()
+
+    def clear(self):
+        with self._lock:
+            self.captions = []
+            self.partial = ""
+            self._chunks.append(CLEAR)
+            self._chunks_ready.notify()
+
+    def _next_chunk(self):
+        """Следующий фрагмент или маркер; None, если за полсекунды ничего не пришло"""
+        with self._lock:
+            if not self._chunks_ready.wait_for(lambda: self._chunks, timeout=0.5):
+                return None
+            item = self._chunks.popleft()
+            if not isinstance(item, str):
+                self._queued -= len(item[0])
+            return item
+
+    def _recognize_loop(self):
+        while self.running:
+            item = self._next_chunk()
+            if item is None:
+                continue
+            try:
+                if item is FLUSH or item is CLEAR:
+                    result = json.loads(self.rec.FinalResult())
+                    self._finish(result if item is FLUSH else {})
+                    continue
+                samples, position = item
+                if self._position is not None and position != self._position:
+                    # Разрыв в записи (выброшенный фрагмент) - фраза до него закончена
+                    self._finish(json.loads(self.rec.FinalResult()))
+                if self._utterance_start is None:
+                    self._utterance_start = position
+                self._position = position + len(samples)
+                self._utterance.append(samples)
+                data = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+                if self.rec.AcceptWaveform(data):
+                    self._finish(json.loads(self.rec.Result()))
+                else:
+                    partial = json.loads(self.rec.PartialResult()).get("partial", "")
+                    if partial != self.partial:
+                        self.partial = partial
+                        self._notify()
+            except Exception as e:
+                print(f"Ошибка живых подписей: {e}")
+
+    def _finish(self, result):
+        text = result.get("text", "").strip()
+        audio = np.concatenate(self._utterance) if self._utterance else np.zeros(0, dtype=np.float32)
+        start = self._utterance_start
+        self._utterance = []
+        self._utterance_start = None
+        self._position = None
+        with self._lock:
+            self.partial = ""
+            if text:
+                caption = Caption(start, start + len(audio), text, time.monotonic())
+                self.captions.append(caption)
+                if len(audio) >= MIN_REFINE:
+                    self._refine_queue.append((caption, audio))
+                    while len(self._refine_queue) > MAX_REFINE_QUEUED:
+                        # Whisper не успевает - свежие фразы важнее, старая остается с текстом Vosk
+                        skipped, _ = self._refine_queue.popleft()
+                        skipped.refined = True
+                        self.skipped += 1
+                    self._refine_ready.notify()
+                else:
+                    caption.refined = True  # Уточнять нечего, текст Vosk окончательный
+        self._notify()
+
+    def _refine_loop(self):
+        while self.running:
+            with self._lock:
+                if not self._refine_ready.wait_for(lambda: self._refine_queue, timeout=0.5):
+                    continue
+                caption, audio = self._refine_queue.popleft()
+            try:
+                text = self.refine(audio).strip()
+            except Exception as e:
+                print(f"Ошибка уточнения фразы: {e}")
+                continue
+            with self._lock:
+                if caption not in self.captions:
+                    continue  # Подписи очищены, пока фраза распознавалась
+                if text:
+                    caption.text = text
+                caption.refined = True
+            self.refine_ms.add((time.monotonic() - caption.finished_at) * 1000)
+            self._notify()
+
+    def _notify(self):
+        if self.on_update is not None:
+            self.on_update(self.text())
+
+    def text(self):
+        """Уточненные и еще не уточненные фразы плюс промежуточный текст Vosk"""
+        with self._lock:
+            parts = [caption.text for caption in self.captions]
+            if self.partial:
+                parts.append(self.partial)
+        return " ".join(parts)
+
+    def pending(self):
+        """Сколько фраз еще ждут Whisper"""
+        with self._lock:
+            return sum(1 for caption in self.captions if not caption.refined)
+
+    def format(self):
+        return (f"подписи: фраз {len(self.captions)}, ждут Whisper {self.pending()}, "
+                f"уточнение p50={self.refine_ms.percentile(50):.0f} мс "
+                f"p95={self.refine_ms.percentile(95):.0f} мс, выброшено {self.dropped}, "
+                f"без уточнения {self.skipped}")
+
+    def stop(self):
+        self.running = False
+        for thread in self._threads:
+            thread.join(timeout=1.0)
@@ -0,0 +1,380 @@
+import asyncio
+import collections
+import json
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from llm_worker import DEFAULT_MODEL, duckai_client, new_conversation
+
+# Константы
+MAX_CONCURRENCY = 4  # Сколько запросов к бэкенду одновременно; остальные ждут в очереди
+MAX_CONNECTIONS = 8  # Сколько соединений держать к одному хосту
+TIMEOUT = 60.0  # Предел на весь ответ, секунд
+FIRST_BYTE_TIMEOUT = 15.0  # Предел до первого куска ответа
+IDLE_TIMEOUT = 20.0  # Предел тишины между кусками
+RETRIES = 3  # Повторы при сетевых ошибках, таймаутах и 429/5xx - только пока ничего не отдано
+BACKOFF = 0.5  # База экспоненциальной паузы между повторами; пауза - случайная в [0, BACKOFF * 2^n]
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Ошибка бэкенда; status - HTTP-код, если ответ был"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status in RETRY_STATUSES
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "reused")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def usable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive соединения HTTP/1.1 к хостам: TCP и TLS рукопожатие - один раз, а не на каждый запрос"""
+
+    def __init__(self, max_connections=MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.opened = 0  # Сколько соединений открыто за все время - для статистики переиспользования
+        self._idle = collections.defaultdict(collections.deque)
+        self._limits = {}
+
+    async def acquire(self, scheme, host, port):
+        key = (scheme, host, port)
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.max_connections))
+        await limit.acquire()
+        idle = self._idle[key]
+        while idle:
+            conn = idle.pop()
+            if conn.usable():
+                conn.reused = True
+                return conn
+            conn.close()
+        try:
+            reader, writer = await asyncio.open_connection(host, port, ssl=scheme == "https")
+        except BaseException:
+            limit.release()
+            raise
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    def release(self, key, conn, reusable):
+        if reusable and conn.usable():
+            self._idle[key].append(conn)
+        else:
+            conn.close()
+        self._limits[key].release()
+
+    def close(self):
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
+
+
+class HTTPClient:
+    """Минимальный асинхронный клиент HTTP/1.1 поверх asyncio: пул соединений и потоковое тело.
+
+    stream() отдает тело кусками по мере прихода (chunked, Content-Length или до закрытия);
+    соединение возвращается в пул, только если тело прочитано до конца.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or ConnectionPool()
+
+    async def stream(self, method, url, headers=None, body=b""):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}", f"Content-Length: {len(body)}",
+                 "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+        for attempt in range(2):
+            conn = await self.pool.acquire(*key)
+            reusable = False
+            try:
+                try:
+                    conn.writer.write(request)
+                    await conn.writer.drain()
+                    status, response_headers = await self._read_head(conn.reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if conn.reused and attempt == 0:
+                        continue  # Сервер уже закрыл простаивавшее соединение - повторяем на новом
+                    raise
+                if status >= 400:
+                    detail = b"".join([chunk async for chunk in self._body(conn.reader, response_headers)])
+                    reusable = response_headers.get("connection", "").lower() != "close"
+                    raise LLMError(f"HTTP {status}: {detail[:200].decode('utf-8', 'replace')}", status)
+                async for chunk in self._body(conn.reader, response_headers):
+                    yield chunk
+                reusable = (response_headers.get("connection", "").lower() != "close"
+                            and ("content-length" in response_headers
+                                 or "chunked" in response_headers.get("transfer-encoding", "")))
+                return
+            finally:
+                self.pool.release(key, conn, reusable)
+
+    @staticmethod
+    async def _read_head(reader):
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                return status, headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _body(reader, headers):
+        if "chunked" in headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while chunk := await reader.read(65536):
+                yield chunk
+
+
+class OpenAIBackend:
+    """Любой OpenAI-совместимый сервер (/chat/completions со stream=true): облако, локальная модель
+    или mock_llm_server из test_. Ответ разбирается как поток событий SSE по мере прихода"""
+
+    def __init__(self, http, base_url, api_key="", model=None):
+        self.http = http
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.model = model
+
+    async def stream(self, query, model):
+        body = json.dumps({
+            "model": self.model or model,
+            "messages": [{"role": "user", "content": query}],
+            "stream": True,
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        buffer = b""
+        done = False
+        # После [DONE] тело дочитывается до конца, иначе соединение не вернется в пул
+        async for data in self.http.stream("POST", self.url, headers, body):
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line = line.strip()
+                if done or not line.startswith(b"data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == b"[DONE]":
+                    done = True
+                    continue
+                event = json.loads(payload)
+                if "error" in event:
+                    raise LLMError(str(event["error"]))
+                text = event["choices"][0].get("delta", {}).get("content")
+                if text:
+                    yield text
+
+
+class DuckAIBackend:
+    """duckai синхронный и со своей HTTP-сессией: запросы идут в потоках, куски - в цикл событий.
+    Клиент DuckAI на поток свой и живет между запросами"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = duckai_client()
+        client = self._local.client = new_conversation(client)
+        return client
+
+    async def stream(self, query, model):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+
+        def run():
+            try:
+                for chunk in self._client().chat_yield(query, model=model):
+                    loop.call_soon_threadsafe(chunks.put_nowait, (chunk, None))
+                loop.call_soon_threadsafe(chunks.put_nowait, (None, None))
+            except Exception as e:
+                self._local.client = None
+                loop.call_soon_threadsafe(chunks.put_nowait, (None, e))
+
+        loop.run_in_executor(None, run)
+        while True:
+            chunk, error = await chunks.get()
+            if error is not None:
+                raise LLMError(f"duckai: {error}", getattr(error, "status", None))
+            if chunk is None:
+                return
+            yield chunk
+
+
+def make_backend(config, http):
+    backend = config.get("backend", "duckai")
+    if backend == "openai":
+        return OpenAIBackend(http, config["base_url"], config.get("api_key", ""), config.get("model"))
+    if backend == "duckai":
+        return DuckAIBackend()
+    raise ValueError(f"Неизвестный бэкенд LLM: {backend}")
+
+
+class LLMClient:
+    """Слой доступа к LLM: один цикл событий в своем потоке, пул соединений, ограничение
+    одновременных запросов, таймауты и повторы со случайной паузой (full jitter).
+
+    Повтор делается, только пока из ответа ничего не отдано: иначе текст на экране
+    задвоился бы. Снаружи цикла событий клиент выглядит как DuckAI - chat_yield()/chat(),
+    поэтому его можно отдать LLMWorker вместо duckai (см. client_from_config).
+    """
+
+    def __init__(self, config=None):
+        config = dict(config or {})
+        self.max_concurrency = config.get("max_concurrency", MAX_CONCURRENCY)
+        self.timeout = config.get("timeout", TIMEOUT)
+        self.first_byte_timeout = config.get("first_byte_timeout", FIRST_BYTE_TIMEOUT)
+        self.idle_timeout = config.get("idle_timeout", IDLE_TIMEOUT)
+        self.retries = config.get("retries", RETRIES)
+        self.backoff = config.get("backoff", BACKOFF)
+        self.pool = ConnectionPool(config.get("max_connections", MAX_CONNECTIONS))
+        self.backend = make_backend(config, HTTPClient(self.pool))
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._run_loop, daemon=True, name="llm-client")
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.loop.run_forever()
+
+    async def stream(self, query, model=DEFAULT_MODEL):
+        """Куски ответа; выполняется в цикле событий клиента"""
+        self.requests += 1
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    async for chunk in self._with_timeouts(self.backend.stream(query, model)):
+                        started = True
+                        yield chunk
+                    return
+                except (LLMError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    retryable = not isinstance(e, LLMError) or e.retryable
+                    if started or not retryable or attempt == self.retries:
+                        self.failed += 1
+                        raise
+                    self.retried += 1
+                    delay = random.uniform(0, self.backoff * 2 ** attempt)
+                    print(f"[LLMClient] {type(e).__name__}: {e}; повтор через {delay:.2f} с")
+                    await asyncio.sleep(delay)
+
+    async def _with_timeouts(self, chunks):
+        deadline = time.monotonic() + self.timeout
+        wait = self.first_byte_timeout
+        try:
+            while True:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise asyncio.TimeoutError(f"ответ дольше {self.timeout} с")
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), min(wait, left))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise asyncio.TimeoutError(f"нет ответа {min(wait, left):.1f} с") from None
+                wait = self.idle_timeout
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def chat_yield(self, query, model=DEFAULT_MODEL):
+        """Синхронный генератор кусков для вызова из обычных потоков"""
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self.stream(query, model):
+                    chunks.put((chunk, None))
+                chunks.put((None, None))
+            except Exception as e:
+                chunks.put((None, e))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                chunk, error = chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            future.cancel()
+
+    def chat(self, query, model=DEFAULT_MODEL):
+        return "".join(self.chat_yield(query, model))
+
+    def format(self):
+        return (f"LLM-клиент: запросов {self.requests}, повторов {self.retried}, ошибок {self.failed}, "
+                f"открыто соединений {self.pool.opened}")
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.pool.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_from_config(config):
+    """Фабрика для LLMWorker: functools.partial(client_from_config, config) передается в процесс,
+    где все потоки получают один общий LLMClient - с одним циклом событий и пулом соединений"""
+    key = json.dumps(config, sort_keys=True)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LLMClient(config)
+        return _clients[key]
@@ -0,0 +1,244 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import RollingWindow
+
+# Константы
+DEFAULT_MODEL = "gpt-4o-mini"
+MAX_IN_FLIGHT = 3  # Сколько запросов процесс выполняет одновременно
+MAX_RESTARTS = 3  # Сколько раз подряд перезапускать упавший процесс, прежде чем сдаться
+MAX_RETRIES = 1  # Сколько раз повторять запрос, который был в работе, когда процесс упал
+
+# Сообщения из процесса: (вид, номер запроса, данные)
+STATUS = "status"
+CHUNK = "chunk"  # Очередной кусок ответа по мере генерации
+REPLY = "reply"  # Ответ целиком, последнее сообщение запроса
+ERROR = "error"
+RETRY = "retry"  # Процесс упал, запрос отправлен заново - уже показанные куски недействительны
+# Состояние диалога внутри DuckAI (закрытые атрибуты) и их значения в новом диалоге
+CONVERSATION_STATE = {"_chat_messages": [], "_chat_tokens_count": 0, "_chat_vqd": "", "_chat_vqd_hash": ""}
+
+
+def duckai_client():
+    """Клиент по умолчанию: duckai импортируется один раз на процесс, сессия живет между запросами"""
+    from duckai import DuckAI
+    return DuckAI()
+
+
+_unknown_duckai_reported = False
+
+
+def new_conversation(client, client_factory=duckai_client):
+    """Клиент для следующего вопроса: каждый вопрос - отдельный диалог, как было с процессом на запрос.
+
+    DuckAI копит историю сообщений в клиенте: без сброса каждый следующий вопрос уносил бы
+    на сервер все предыдущие и скоро уперся бы в ERR_CONVERSATION_LIMIT. HTTP-клиент
+    с соединениями и версия фронтенда остаются, заново запрашивается только токен диалога.
+    Сброс трогает закрытые атрибуты DuckAI, поэтому сначала проверяется, что все они на месте
+    и прежних типов; если библиотека изменилась, возвращается новый клиент из client_factory -
+    медленнее (новая сессия), но без чужой истории. Клиенты не из duckai возвращаются как есть.
+    """
+    if not type(client).__module__.startswith("duckai"):
+        return client
+    if all(isinstance(getattr(client, name, None), type(value)) for name, value in CONVERSATION_STATE.items()):
+        for name, value in CONVERSATION_STATE.items():
+            setattr(client, name, type(value)())
+        return client
+    global _unknown_duckai_reported
+    if not _unknown_duckai_reported:
+        _unknown_duckai_reported = True
+        print("[LLMWorker] Неизвестная версия DuckAI: историю не сбросить, новый клиент на каждый вопрос")
+    return client_factory()
+
+
+class LLMWorkerProcess(mp.Process):
+    """Долгоживущий процесс с клиентом LLM.
+
+    Импорт duckai и его HTTP-стека, создание сессии и соединения с сервером происходят
+    один раз при запуске приложения, а не на каждый клик. Запросы читаются из канала
+    и выполняются пулом потоков, поэтому новый вопрос не ждет ответа на предыдущий.
+    У каждого потока свой клиент: про потокобезопасность DuckAI ничего не обещается.
+
+    client_factory - функция уровня модуля (ее нужно передать в дочерний процесс),
+    возвращающая объект с методом chat(query, model=...). Если у клиента есть
+    chat_yield (как у DuckAI), ответ передается кусками (CHUNK) по мере генерации.
+    """
+
+    def __init__(self, conn, client_factory=duckai_client, max_in_flight=MAX_IN_FLIGHT):
+        super().__init__(daemon=True, name="llm-worker")
+        self.conn = conn
+        self.client_factory = client_factory
+        self.max_in_flight = max_in_flight
+
+    def run(self):
+        print("[LLMWorker] start, pid =", os.getpid(), flush=True)
+        self._send_lock = threading.Lock()
+        self._local = threading.local()
+        with ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="llm") as pool:
+            # Первый клиент создаем сразу: импорт и сессия готовы до первого вопроса
+            pool.submit(self._client)
+            while True:
+                try:
+                    message = self.conn.recv()
+                except (EOFError, OSError):
+                    break  # Приложение закрылось
+                if message is None:
+                    break
+                pool.submit(self._handle, *message)
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.client_factory()
+        return client
+
+    def _handle(self, request_id, query, model):
+        try:
+            client = self._local.client = new_conversation(self._client(), self.client_factory)
+            self._send(STATUS, request_id, "Запрос отправлен…")
+            stream = getattr(client, "chat_yield", None)
+            if stream is None:
+                self._send(REPLY, request_id, client.chat(query, model=model))
+                return
+            chunks = []
+            for chunk in stream(query, model=model):
+                chunks.append(chunk)
+                self._send(CHUNK, request_id, chunk)
+            self._send(REPLY, request_id, "".join(chunks))
+        except Exception as e:
+            self._local.client = None  # После ошибки (лимит, разрыв соединения) поднимаем новый клиент
+            self._send(ERROR, request_id, f"Python-ошибка: {e}\n{traceback.format_exc()}")
+
+    def _send(self, kind, request_id, payload):
+        with self._send_lock:
+            try:
+                self.conn.send((kind, request_id, payload))
+            except (BrokenPipeError, OSError):
+                pass
+
+
+class LLMWorker:
+    """Сторона GUI: запускает процесс, раздает номера запросам и перезапускает процесс при падении.
+
+    submit() возвращает номер запроса, poll() - готовые сообщения [(вид, номер, данные)].
+    Запросы, которые были в работе во время падения, отправляются заново (MAX_RETRIES раз,
+    с сообщением RETRY), остальные получают ERROR. Задержка от отправки до первого куска
+    ответа копится в first_byte_ms, до полного ответа - в reply_ms.
+    """
+
+    def __init__(self, client_factory=duckai_client, max_in_flight=MAX_IN_FLIGHT):
+        self.client_factory = client_factory
+        self.max_in_flight = max_in_flight
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._pending = {}  # номер -> [query, model, время отправки, попыток, пришел ли первый кусок]
+        self.first_byte_ms = RollingWindow(100)
+        self.reply_ms = RollingWindow(100)
+
+    def start(self):
+        parent_conn, child_conn = mp.Pipe()
+        self.process = LLMWorkerProcess(child_conn, self.client_factory, self.max_in_flight)
+        self.process.start()
+        child_conn.close()  # Конец канала живет в дочернем процессе; так recv увидит EOF при его падении
+        self.conn = parent_conn
+
+    def submit(self, query, model=DEFAULT_MODEL):
+        if self.conn is None:
+            # Процесс не стартовал или перезапуски исчерпаны - новый клик пробует заново
+            self.restarts = 0
+            self.start()
+        request_id = next(self._ids)
+        self._pending[request_id] = [query, model, time.perf_counter(), 0, False]
+        self._send(request_id)
+        return request_id
+
+    def _send(self, request_id):
+        query, model = self._pending[request_id][:2]
+        try:
+            self.conn.send((request_id, query, model))
+        except (BrokenPipeError, OSError):
+            pass  # Процесс упал - запрос уйдет заново после перезапуска в poll()
+
+    def poll(self):
+        if self.conn is None:
+            return []
+        messages = []
+        try:
+            while self.conn.poll():
+                messages.append(self._receive(self.conn.recv()))
+        except (EOFError, OSError):
+            messages.extend(self._restart())
+        else:
+            if not self.process.is_alive():
+                messages.extend(self._restart())
+        return messages
+
+    def _receive(self, message):
+        kind, request_id, payload = message
+        pending = self._pending.get(request_id)
+        if kind == STATUS or pending is None:
+            return message
+        self.restarts = 0  # Процесс отвечает - счетчик падений подряд сбрасывается
+        elapsed = (time.perf_counter() - pending[2]) * 1000
+        if not pending[4]:
+            pending[4] = True
+            self.first_byte_ms.add(elapsed)
+            print(f"[LLMWorker] запрос {request_id}: первый байт через {elapsed:.0f} мс")
+        if kind != CHUNK:
+            del self._pending[request_id]
+            self.reply_ms.add(elapsed)
+            print(f"[LLMWorker] запрос {request_id}: ответ через {elapsed:.0f} мс")
+        return message
+
+    def _restart(self):
+        """Процесс упал: поднимаем новый и повторяем незавершенные запросы"""
+        print(f"[LLMWorker] процесс завершился с кодом {self.process.exitcode}, перезапуск")
+        self.conn.close()
+        self.restarts += 1
+        messages = []
+        if self.restarts > MAX_RESTARTS:
+            for request_id in list(self._pending):
+                del self._pending[request_id]
+                messages.append((ERROR, request_id, "Python-ошибка: процесс LLM перезапускался слишком часто"))
+            self.conn = None
+            return messages
+        self.start()
+        for request_id, pending in list(self._pending.items()):
+            if pending[3] >= MAX_RETRIES:
+                del self._pending[request_id]
+                messages.append((ERROR, request_id, "Python-ошибка: процесс LLM упал во время запроса"))
+                continue
+            pending[3] += 1
+            pending[4] = False
+            messages.append((RETRY, request_id, ""))
+            self._send(request_id)
+        return messages
+
+    def in_flight(self):
+        return len(self._pending)
+
+    def format(self):
+        return (f"LLM: первый байт p50={self.first_byte_ms.percentile(50):.0f} мс "
+                f"p95={self.first_byte_ms.percentile(95):.0f} мс, "
+                f"ответ целиком p50={self.reply_ms.percentile(50):.0f} мс, в работе {self.in_flight()}, "
+                f"перезапусков {self.restarts}")
+
+    def stop(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            self.process.join(timeout=1.0)
+            if self.process.is_alive():
+                self.process.terminate()
@@ -1,21 +1,50 @@
+import functools
 import os
 import sys
+import threading
 import warnings
 from PyQt5.QtWidgets import QApplication
 from audio_recorder import AudioRecorder
 from gui import TranscriptionWindow
-from soundcard.mediafoundation import SoundcardRuntimeWarning
+from llm_client import client_from_config
+from llm_worker import LLMWorker
+from response_cache import ResponseCache
+from question_index import QuestionIndex
 
-# Отключаем предупреждения SoundcardRuntimeWarning
-warnings.filterwarnings("ignore", category=SoundcardRuntimeWarning)
+# Отключаем предупреждения SoundcardRuntimeWarning (есть только в Windows-бэкенде soundcard)
+try:
+    from soundcard.mediafoundation import SoundcardRuntimeWarning
+    warnings.filterwarnings("ignore", category=SoundcardRuntimeWarning)
+except (ImportError, OSError, AssertionError):
+    pass
 
 # Указываем путь к папке platforms (измените на свой путь)
 plugins_path = r'C:\Users\Пользователь\PycharmProjects\help tech sob\venv\Lib\site-packages\PyQt5\Qt5\plugins\platforms'
-os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = plugins_path
+if os.path.isdir(plugins_path):
+    os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = plugins_path
+
+# Кэш ответов LLM между запусками: классические вопросы отвечаются без похода в сеть
+RESPONSE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite3")
+# Модель Vosk для живых подписей во время записи; без нее текст появляется после транскрибации
+VOSK_MODEL_PATH = "C:/model/vosk-model-small-ru-0.22"
+# Бэкенд LLM: "duckai" или любой OpenAI-совместимый сервер, например локальный
+# {"backend": "openai", "base_url": "http://127.0.0.1:8000/v1", "api_key": "", "model": "gpt-4o-mini"}.
+# Необязательные ключи: max_concurrency, timeout, first_byte_timeout, idle_timeout, retries, backoff
+LLM_CONFIG = {"backend": "duckai"}
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    audio_recorder = AudioRecorder()
-    window = TranscriptionWindow(audio_recorder)
+    # Постоянная запись: вопрос можно транскрибировать после того, как он прозвучал (Alt+L / Alt+K).
+    # track_mode="remote" - транскрибируется только собеседник; "both" - обе дорожки с подписями
+    live_model_path = VOSK_MODEL_PATH if os.path.isdir(VOSK_MODEL_PATH) else None
+    audio_recorder = AudioRecorder(always_on=True, track_mode="remote", live_model_path=live_model_path)
+    # Индекс похожих вопросов строится из кэша в фоне, чтобы не задерживать появление окна;
+    # вытесненные из кэша ответы убираются и из индекса
+    question_index = QuestionIndex()
+    response_cache = ResponseCache(RESPONSE_CACHE_PATH, on_evict=question_index.remove)
+    threading.Thread(target=question_index.load, args=(response_cache.entries(),), daemon=True).start()
+    llm_worker = LLMWorker(client_factory=functools.partial(client_from_config, LLM_CONFIG))
+    window = TranscriptionWindow(audio_recorder, llm_worker=llm_worker, response_cache=response_cache,
+                                 question_index=question_index)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,145 @@
+import threading
+from collections import deque
+import numpy as np
+
+# Константы
+WINDOW = 240  # Сколько последних блоков учитывать (~60 секунд при блоках по 0.25 с)
+JITTER_EDGES_MS = (0, 1, 2, 5, 10, 20, 50, 100, 250, np.inf)  # Границы корзин гистограммы джиттера
+MIN_RATE_BLOCKS = 8  # С какого числа блоков оценивать фактическую частоту устройства
+
+
+class RollingWindow:
+    """Последние N значений в кольцевом numpy-массиве: O(1) на добавление, перцентили по запросу"""
+
+    def __init__(self, size=WINDOW):
+        self._values = np.zeros(size, dtype=np.float64)
+        self._count = 0
+
+    def add(self, value):
+        self._values[self._count % len(self._values)] = value
+        self._count += 1
+
+    def values(self):
+        return self._values[:min(self._count, len(self._values))]
+
+    def percentile(self, q):
+        values = self.values()
+        return float(np.percentile(values, q)) if len(values) else 0.0
+
+    def histogram(self, edges):
+        return np.histogram(self.values(), bins=edges)[0]
+
+
+class CaptureStats:
+    """Метрики захвата одного устройства.
+
+    read_ms - сколько поток стоял в record() (задержка чтения блока), jitter_ms - отклонение
+    интервала между блоками от длительности блока, deficit - насколько полученных кадров меньше,
+    чем должно было прийти по часам хоста (потери внутри устройства/ОС). Ожидаемое считается
+    по измеренной частоте устройства, а не номинальной: расхождение часов устройства и хоста
+    (дрейф, обычно доли процента) - не потери, оно показывается отдельно в drift_ppm. dropped - кадры,
+    выброшенные нашим кольцевым буфером, depth - сколько сэмплов ждут разбора.
+    discarded - кадры, выброшенные на паузе записи намеренно; в потери они не входят.
+    """
+
+    def __init__(self, name, rate, window=WINDOW):
+        self.name = name
+        self.rate = rate
+        self.read_ms = RollingWindow(window)
+        self.jitter_ms = RollingWindow(window)
+        self.depth = RollingWindow(window)
+        self.blocks = 0
+        self.frames = 0
+        self.dropped = 0
+        self.discarded = 0
+        self.max_deficit = 0
+        self._marks = deque(maxlen=window)  # (время, всего кадров) после каждого блока
+        self._expected = 0.0  # Сколько кадров должно было прийти по измеренной частоте
+        self._last = None
+        self._lock = threading.Lock()
+
+    def record_block(self, read_seconds, frames, now, depth, dropped, discarded=0):
+        """Вызывается потоком захвата после каждого блока"""
+        with self._lock:
+            self.read_ms.add(read_seconds * 1000)
+            if self._last is None:
+                self._expected = frames
+            else:
+                expected = frames / self.rate
+                self.jitter_ms.add(abs(now - self._last - expected) * 1000)
+                # Оценка частоты уточняется по ходу, поэтому ожидаемое копится по интервалам,
+                # а не пересчитывается от начала записи по последней оценке
+                self._expected += (now - self._last) * self.measured_rate()
+            self._last = now
+            self.blocks += 1
+            self.frames += frames
+            self._marks.append((now, self.frames))
+            self.depth.add(depth)
+            self.dropped = dropped
+            self.discarded = discarded
+            self.max_deficit = max(self.max_deficit, self.deficit(now))
+
+    def deficit(self, now):
+        """Оценка потерянных кадров: ожидаемое по часам хоста минус полученное (с запасом в один блок)"""
+        if self._last is None:
+            return 0
+        expected = self._expected + (now - self._last) * self.measured_rate()
+        block = self.frames / self.blocks
+        return max(0, int(expected - self.frames - block))
+
+    def measured_rate(self):
+        """Фактическая частота устройства по часам хоста.
+
+        Медиана наклонов "кадры/время" между блоками, отстоящими на половину окна: дрейф часов
+        меняет все наклоны одинаково и попадает в оценку, а редкая потеря или задержка
+        портит лишь часть наклонов и медиану не сдвигает.
+        """
+        if len(self._marks) < MIN_RATE_BLOCKS:
+            return self.rate
+        marks = np.array(self._marks)
+        lag = len(marks) // 2
+        span = marks[lag:, 0] - marks[:-lag, 0]
+        frames = marks[lag:, 1] - marks[:-lag, 1]
+        valid = span > 0
+        if not valid.any():
+            return self.rate
+        return float(np.median(frames[valid] / span[valid]))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "blocks": self.blocks,
+                "read_ms_p50": self.read_ms.percentile(50),
+                "read_ms_p99": self.read_ms.percentile(99),
+                "jitter_ms_p50": self.jitter_ms.percentile(50),
+                "jitter_ms_p99": self.jitter_ms.percentile(99),
+                "jitter_hist": self.jitter_ms.histogram(JITTER_EDGES_MS).tolist(),
+                "depth_max": int(self.depth.values().max()) if self.blocks else 0,
+                "dropped": self.dropped,
+                "discarded": self.discarded,
+                "deficit": self.max_deficit,
+                "drift_ppm": (self.measured_rate() / self.rate - 1) * 1e6,
+            }
+
+    def format(self):
+        s = self.snapshot()
+        line = (f"{s['name']}: чтение p50={s['read_ms_p50']:.1f} p99={s['read_ms_p99']:.1f} мс, "
+                f"джиттер p50={s['jitter_ms_p50']:.1f} p99={s['jitter_ms_p99']:.1f} мс "
+                f"[{format_jitter_histogram(s['jitter_hist'])}], "
+                f"очередь до {s['depth_max'] / self.rate:.2f} с, "
+                f"дрейф часов {s['drift_ppm']:+.0f} ppm, "
+                f"потеряно {s['dropped'] + s['deficit']} кадров")
+        if s["discarded"]:
+            line += f", на паузе пропущено {s['discarded'] / self.rate:.1f} с"
+        return line
+
+
+def format_jitter_histogram(counts):
+    """Гистограмма джиттера (jitter_hist из snapshot) в одну строку: '0-1мс:120 1-2мс:3 ...'"""
+    parts = []
+    for lo, hi, count in zip(JITTER_EDGES_MS[:-1], JITTER_EDGES_MS[1:], counts):
+        if count:
+            label = f"{lo}-{hi}мс" if hi != np.inf else f">{lo}мс"
+            parts.append(f"{label}:{count}")
+    return " ".join(parts)
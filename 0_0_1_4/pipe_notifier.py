@@ -0,0 +1,81 @@
+import os
+import threading
+from multiprocessing.connection import wait
+
+from PyQt5.QtCore import QObject, QSocketNotifier, pyqtSignal
+
+# Константы
+WAIT_TIMEOUT = 1.0  # Windows: как часто поток ожидания проверяет, не остановлен ли он
+
+
+class PipeNotifier(QObject):
+    """Сигнал ready, как только в канале multiprocessing появились данные (или он закрылся).
+
+    На Linux/macOS дескриптор канала добавляется в цикл событий Qt через QSocketNotifier:
+    GUI просыпается ровно тогда, когда пришли байты, и не просыпается вовсе, пока их нет.
+    На Windows mp.Pipe - именованный канал, а QSocketNotifier умеет только сокеты, поэтому
+    там канал ждет фоновый поток в multiprocessing.connection.wait и шлет сигнал в GUI.
+
+    После сигнала получатель читает канал до конца и вызывает rearm(): уведомитель Qt
+    отключается на время обработки, а поток ждет, пока прочитанное не уберут из канала.
+    """
+    ready = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.conn = None
+        self._notifier = None
+        self._thread = None
+        self._rearm = threading.Event()
+        self._stopped = threading.Event()
+
+    def watch(self, conn):
+        """Начинает следить за conn; предыдущий канал (после перезапуска процесса) отпускается"""
+        self.stop()
+        self.conn = conn
+        if conn is None:
+            return
+        if os.name != "nt":
+            self._notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self._on_activated)
+        else:
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._wait_loop, args=(conn, self._stopped),
+                                            daemon=True, name="pipe-notifier")
+            self._thread.start()
+
+    def _on_activated(self, fd):
+        self._notifier.setEnabled(False)
+        self.ready.emit()
+
+    def _wait_loop(self, conn, stopped):
+        while not stopped.is_set():
+            try:
+                # Таймаут только для того, чтобы заметить stop(): будится этот поток, а не GUI
+                if not wait([conn], timeout=WAIT_TIMEOUT):
+                    continue
+            except (OSError, ValueError):
+                return  # Канал закрыт - его сменит новый watch
+            if stopped.is_set():
+                return
+            self._rearm.clear()
+            self.ready.emit()
+            self._rearm.wait()
+
+    def rearm(self):
+        """Канал прочитан - можно снова ждать данных"""
+        if self._notifier is not None:
+            self._notifier.setEnabled(True)
+        self._rearm.set()
+
+    def stop(self):
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+            self._notifier.activated.disconnect(self._on_activated)
+            self._notifier.deleteLater()
+            self._notifier = None
+        if self._thread is not None:
+            self._stopped.set()
+            self._rearm.set()
+            self._thread = None  # Поток выйдет сам не позже чем через WAIT_TIMEOUT
+        self.conn = None
@@ -0,0 +1,200 @@
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from response_cache import normalize_question
+
+# Константы
+NGRAM = 3  # Символьные триграммы внутри слов: устойчивы к опечаткам и окончаниям
+SIMILARITY = 0.5  # Начиная с этого косинусного сходства вопрос считается тем же самым
+# Обороты, которыми вопрос обрамляют, - о смысле говорит только тема
+FRAME_WORDS = {
+    "что", "такое", "расскажи", "расскажите", "про", "о", "об", "объясни", "объясните",
+    "в", "на", "питоне", "пайтоне", "python", "знаешь", "знаете", "можешь", "можете",
+}
+
+
+def question_terms(text):
+    """Триграммы темы вопроса: слова-паразиты и обрамление убраны, слова с пробелами по краям"""
+    words = [word for word in normalize_question(text).split() if word not in FRAME_WORDS]
+    grams = []
+    for word in words:
+        padded = f" {word} "
+        grams.extend(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+    return grams
+
+
+class QuestionIndex:
+    """Поиск ближайшего прошлого вопроса: TF-IDF по символьным триграммам и косинусное сходство.
+
+    Все вопросы лежат строками одной разреженной матрицы (scipy.sparse) с L2-нормированными
+    строками, так что поиск - умножение столбцов триграмм запроса на их веса и argmax.
+    Матрица хранится по столбцам (CSC): запрос трогает только свои несколько десятков столбцов.
+    Добавление только дописывает счетчики триграмм; IDF и матрица пересчитываются целиком
+    в фоновом потоке (векторная операция за O(числа ненулевых)), а поиск тем временем идет
+    по предыдущему снимку и никогда не ждет сборки.
+    Ключи - ключи ResponseCache, ответ берется оттуда же; вытесненные из кэша ответы
+    убираются из индекса через remove (ResponseCache.on_evict).
+    """
+
+    def __init__(self):
+        self.vocabulary = {}  # триграмма -> столбец
+        self.keys = []
+        self.questions = []
+        self._df = np.zeros(0, dtype=np.int64)  # В скольких вопросах встречается триграмма
+        self._indices = []  # Столбцы триграмм по вопросам, подряд
+        self._counts = []
+        self._indptr = [0]
+        self._positions = {}  # ключ -> строка (повторное добавление заменяет вопрос)
+        self._removed = set()  # Строки удаленных вопросов: в матрице они нулевые до уплотнения
+        self._snapshot = None  # (матрица, idf, ключи, вопросы) последней сборки
+        self._version = 0  # Номер изменения добавленных вопросов
+        self._snapshot_version = -1  # С какого изменения собран снимок
+        self._dirty = False  # Есть вопросы, которых нет в снимке
+        self._building = False
+        self._lock = threading.Lock()
+
+    def add(self, key, question, refresh=True):
+        """Добавляет вопрос; refresh=True - пересобрать матрицу в фоне, поиск тем временем идет по старой"""
+        terms = question_terms(question)
+        if not terms:
+            return
+        with self._lock:
+            if key in self._positions:
+                return  # Ответ на тот же вопрос обновился в кэше - строка индекса та же
+            columns = {}
+            for term in terms:
+                column = self.vocabulary.setdefault(term, len(self.vocabulary))
+                columns[column] = columns.get(column, 0) + 1
+            if len(self.vocabulary) > len(self._df):
+                self._df = np.concatenate([self._df, np.zeros(max(len(self._df), 1024), dtype=np.int64)])
+            self._df[list(columns)] += 1
+            self._indices.extend(columns)
+            self._counts.extend(columns.values())
+            self._indptr.append(len(self._indices))
+            self._positions[key] = len(self.keys)
+            self.keys.append(key)
+            self.questions.append(question)
+            self._version += 1
+            self._dirty = True
+        if refresh:
+            self.refresh()
+
+    def remove(self, keys):
+        """Убирает вопросы, ответы на которые вытеснены из кэша; матрица пересобирается в фоне"""
+        with self._lock:
+            for key in keys:
+                row = self._positions.pop(key, None)
+                if row is None:
+                    continue
+                self._df[self._indices[self._indptr[row]:self._indptr[row + 1]]] -= 1
+                self._removed.add(row)
+                self._version += 1
+                self._dirty = True
+            if len(self._removed) > len(self.keys) // 2:
+                self._compact()
+        if self._dirty:
+            self.refresh()
+
+    def _compact(self):
+        """Выбрасывает строки удаленных вопросов; вызывать под блокировкой"""
+        indices, counts, indptr, keys, questions = [], [], [0], [], []
+        for row, key in enumerate(self.keys):
+            if row in self._removed:
+                continue
+            lo, hi = self._indptr[row], self._indptr[row + 1]
+            indices.extend(self._indices[lo:hi])
+            counts.extend(self._counts[lo:hi])
+            indptr.append(len(indices))
+            keys.append(key)
+            questions.append(self.questions[row])
+        self._indices, self._counts, self._indptr = indices, counts, indptr
+        self.keys, self.questions = keys, questions
+        self._positions = {key: row for row, key in enumerate(keys)}
+        self._removed = set()
+
+    def load(self, pairs):
+        """Добавляет пары (ключ, вопрос) и сразу строит матрицу - для фонового потока при запуске"""
+        for key, question in pairs:
+            self.add(key, question, refresh=False)
+        self.build()
+
+    def refresh(self):
+        """Пересборка в фоновом потоке; если она уже идет, поток сам подхватит новые вопросы"""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._refresh_loop, daemon=True, name="question-index").start()
+
+    def _refresh_loop(self):
+        try:
+            while self._dirty:
+                self.build()
+        finally:
+            with self._lock:
+                self._building = False
+
+    def build(self):
+        """Пересчет IDF и матрицы по всем добавленным вопросам.
+
+        Под блокировкой снимаются только счетчики, сама сборка идет без нее, чтобы не задерживать
+        добавление и поиск. Результат - снимок (матрица, idf, ключи, вопросы), согласованный между собой.
+        """
+        with self._lock:
+            self._dirty = False
+            version = self._version
+            n = len(self.keys)
+            df = self._df[:len(self.vocabulary)].copy()
+            indices = np.asarray(self._indices, dtype=np.int32)
+            counts = np.asarray(self._counts, dtype=np.float32)
+            indptr = np.asarray(self._indptr, dtype=np.int64)
+            keys, questions = self.keys[:n], self.questions[:n]
+            removed = list(self._removed)
+        for row in removed:
+            counts[indptr[row]:indptr[row + 1]] = 0  # Нулевая строка ни с чем не совпадет
+        docs = n - len(removed)
+        idf = (np.log((docs + 1) / (df + 1)) + 1.0).astype(np.float32)
+        matrix = sparse.csr_matrix((counts * idf[indices], indices, indptr), shape=(n, len(df)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        snapshot = (sparse.diags(1.0 / norms).dot(matrix).tocsc(), idf, keys, questions)
+        with self._lock:
+            # Параллельная сборка могла успеть с более свежим снимком - его не затираем
+            if version >= self._snapshot_version:
+                self._snapshot, self._snapshot_version = snapshot, version
+            return self._snapshot
+
+    def search(self, question, threshold=SIMILARITY):
+        """(сходство, ключ, прошлый вопрос) самого похожего вопроса или None, если ниже порога"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None  # Индекс еще строится в фоне - GUI его не ждет
+        matrix, idf, keys, questions = snapshot
+        terms = question_terms(question)
+        if not terms:
+            return None
+        counts = {}
+        missing = {}  # Триграммы, которых нет в индексе, не совпадут ни с чем, но входят в норму запроса
+        for term in terms:
+            column = self.vocabulary.get(term)
+            if column is None or column >= len(idf):
+                missing[term] = missing.get(term, 0) + 1
+            else:
+                counts[column] = counts.get(column, 0) + 1
+        if not counts:
+            return None
+        columns = np.fromiter(counts, dtype=np.int32, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * idf[columns]
+        max_idf = np.log(len(keys) + 1) + 1.0
+        norm = np.sqrt(np.dot(weights, weights) + sum(c * c for c in missing.values()) * max_idf ** 2)
+        # Сходство со всеми вопросами сразу: сумма по столбцам запроса
+        scores = matrix[:, columns].dot(weights / norm)
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return float(scores[best]), keys[best], questions[best]
+
+    def __len__(self):
+        return len(self._positions)
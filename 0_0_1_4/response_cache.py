@@ -0,0 +1,132 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+# Константы
+MAX_ENTRIES = 1000  # Сколько ответов хранить; лишние вытесняются по давности использования (LRU)
+TTL_SECONDS = 30 * 24 * 3600  # Ответ старше месяца считается устаревшим и запрашивается заново
+# Слова-паразиты и обращения, которые не меняют смысл вопроса
+FILLER_WORDS = {
+    "ну", "вот", "это", "типа", "короче", "значит", "слушай", "скажи", "скажите", "пожалуйста",
+    "а", "э", "эм", "ээ", "эээ", "мм", "ммм", "хм", "так", "просто", "вообще", "допустим",
+}
+FILLER_PHRASES = ("как бы", "в общем", "так сказать", "в принципе", "если честно")
+
+
+def normalize_question(text):
+    """Вопрос без регистра, пунктуации и слов-паразитов: разные расшифровки одного вопроса совпадают"""
+    text = text.lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = " " + re.sub(r"\s+", " ", text).strip() + " "
+    for phrase in FILLER_PHRASES:
+        text = text.replace(f" {phrase} ", " ")
+    return " ".join(word for word in text.split() if word not in FILLER_WORDS)
+
+
+class ResponseCache:
+    """Ответы LLM на диске (sqlite) с вытеснением LRU и сроком жизни TTL.
+
+    Ключ - промпт плюс нормализованный вопрос, поэтому "Чем отличаются потоки и процессы?"
+    и "ну чем, э, отличаются потоки и процессы" дают один и тот же ответ без похода в сеть.
+    Вместе с ответом хранится, сколько он шел из сети: при попадании это время считается
+    сэкономленным. Пишет GUI, читать могут и фоновые потоки - обращения под блокировкой.
+    on_evict(keys) вызывается с ключами вытесненных ответов (например, QuestionIndex.remove).
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, on_evict=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.similar_hits = 0  # Ответы на похожий, но не совпавший вопрос (QuestionIndex)
+        self.saved_ms = 0.0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, question TEXT, answer TEXT, "
+            "created REAL, used REAL, latency_ms REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self._db.commit()
+
+    @staticmethod
+    def key(prompt, question):
+        return hashlib.sha1(f"{prompt}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt, question, now=None):
+        """(ответ, когда получен) или None; промах и устаревший ответ считаются промахом"""
+        now = now if now is not None else time.time()
+        key = self.key(prompt, question)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, created, latency_ms FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            self.saved_ms += row[2]
+        return row[0], row[1]
+
+    def get_by_key(self, key, now=None):
+        """Ответ по ключу, найденному поиском похожих вопросов: (ответ, когда получен) или None"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, created, latency_ms FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            self._db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.similar_hits += 1
+            self.saved_ms += row[2]
+        return row[0], row[1]
+
+    def entries(self, now=None):
+        """[(ключ, вопрос)] всех неустаревших ответов - для построения индекса похожих вопросов"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, question FROM responses WHERE created >= ?", (now - self.ttl,)).fetchall()
+
+    def put(self, prompt, question, answer, latency_ms, now=None):
+        """Сохраняет ответ; возвращает его ключ"""
+        now = now if now is not None else time.time()
+        key = self.key(prompt, question)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, question, answer, now, now, latency_ms))
+            # Вытесняем устаревшие и самые давно использованные сверх max_entries
+            evicted = self._db.execute(
+                "SELECT key FROM responses WHERE created < ? UNION "
+                "SELECT key FROM (SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl, self.max_entries)).fetchall()
+            self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self._db.commit()
+        if evicted and self.on_evict is not None:
+            self.on_evict([row[0] for row in evicted])
+        return key
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format(self):
+        return (f"кэш ответов: {len(self)} записей, попаданий {self.hits}/{self.hits + self.misses} "
+                f"({self.hit_rate():.0%}), похожих вопросов {self.similar_hits}, "
+                f"сэкономлено {self.saved_ms / 1000:.1f} с")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,104 @@
+import bisect
+import numpy as np
+from dsp import StreamingPreprocessor
+from features import IncrementalLogMel
+
+# Константы
+RATE = 16000
+SPEECH_LEVEL = 0.02  # Простой VAD на основе амплитуды
+VAD_HANGOVER = RATE // 4  # Сколько сэмплов тишины после речи сохранять (паузы между словами)
+
+# Режимы записи
+TRACKS_MIXED = "mixed"  # Один поток: динамики и микрофон смешиваются эвристикой
+TRACKS_REMOTE = "remote"  # Только собеседник (loopback)
+TRACKS_BOTH = "both"  # Две дорожки, транскрибируются отдельно и подписываются
+
+TRACK_LABELS = {
+    "mixed": "",
+    "remote": "Собеседник",
+    "local": "Я",
+}
+
+
+class Track:
+    """Дорожка записи: предобработанные фрагменты с речью и их места на общей шкале времени.
+
+    У каждой дорожки свой VAD, своя предобработка и свои лог-мел признаки. Позиции
+    фрагментов нужны, чтобы после транскрибации упорядочить реплики двух дорожек.
+    """
+
+    def __init__(self, name, n_mels=None, mel_filters=None, threshold=SPEECH_LEVEL):
+        self.name = name
+        self.label = TRACK_LABELS.get(name, name)
+        self.threshold = threshold
+        self.preprocessor = StreamingPreprocessor(RATE)
+        self.features = IncrementalLogMel(n_mels, filters=mel_filters) if n_mels else None
+        self.chunks = []
+        self._starts = []  # Начало каждого фрагмента в склеенном аудио дорожки
+        self._positions = []  # Начало каждого фрагмента на общей шкале времени
+        self.length = 0
+        self._last_speech = None  # Конец последнего фрагмента с речью на общей шкале
+
+    def append(self, chunk, position):
+        """Добавляет фрагмент, если в нем есть речь; position - его начало на общей шкале (в сэмплах)"""
+        # Размер фрагментов может меняться, поэтому короткие паузы после речи сохраняем
+        # так же, как при фиксированных фрагментах по 0.25 с
+        if np.max(np.abs(chunk)) > self.threshold:
+            self._last_speech = position + len(chunk)
+        elif self._last_speech is None or position - self._last_speech >= VAD_HANGOVER:
+            return False
+        # Предобработка прямо при записи, чтобы после нажатия "Транскрибировать" она ничего не стоила
+        processed = self.preprocessor.process(chunk)
+        self.chunks.append(processed)
+        self._starts.append(self.length)
+        self._positions.append(position)
+        self.length += len(processed)
+        if self.features is not None:
+            self.features.append(processed)
+        return True
+
+    def audio(self):
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+
+    def timeline_position(self, offset):
+        """Переводит смещение в склеенном аудио дорожки в позицию на общей шкале времени"""
+        i = max(0, bisect.bisect_right(self._starts, offset) - 1)
+        if not self._starts:
+            return offset
+        return self._positions[i] + (offset - self._starts[i])
+
+    def clear(self):
+        self.preprocessor.reset()
+        if self.features is not None:
+            self.features.reset()
+        self.chunks = []
+        self._starts = []
+        self._positions = []
+        self.length = 0
+        self._last_speech = None
+
+
+def make_tracks(mode, n_mels=None, mel_filters=None):
+    if mode == TRACKS_MIXED:
+        names = ["mixed"]
+    elif mode == TRACKS_REMOTE:
+        names = ["remote"]
+    elif mode == TRACKS_BOTH:
+        names = ["remote", "local"]
+    else:
+        raise ValueError(f"Неизвестный режим дорожек: {mode}")
+    return {name: Track(name, n_mels, mel_filters) for name in names}
+
+
+def merge_labeled(items):
+    """Склеивает реплики (позиция, подпись, текст) в диалог, объединяя подряд идущие реплики одного говорящего"""
+    lines = []
+    for _, label, text in sorted(items, key=lambda item: item[0]):
+        text = text.strip()
+        if not text:
+            continue
+        if lines and lines[-1][0] == label:
+            lines[-1][1].append(text)
+        else:
+            lines.append((label, [text]))
+    return "\n".join(f"{label}: {' '.join(texts)}" for label, texts in lines)
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Подавление эха: синтетическая комната (задержка + затухающая импульсная характеристика),
+# собеседник в loopback, пользователь иногда говорит в микрофон.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from aec import EchoCanceller
+from audio_sources import SyntheticSource
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+DURATION = 30
+
+
+def room_echo(x, delay=0.04, decay=0.05, gain=0.6, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(decay * 4 * RATE)
+    ir = rng.standard_normal(n) * np.exp(-np.arange(n) / (decay * RATE))
+    ir = np.concatenate((np.zeros(int(delay * RATE)), ir / np.sqrt(np.sum(ir ** 2)) * gain))
+    return np.convolve(x, ir)[:len(x)].astype(np.float32)
+
+
+def erle(mic, cleaned):
+    return 10 * np.log10(np.sum(mic ** 2) / max(np.sum(cleaned ** 2), 1e-12))
+
+
+def main():
+    far = SyntheticSource("speech", duration=DURATION, seed=1).generate()
+    near = SyntheticSource("speech", duration=DURATION, freq=140, seed=2).generate()
+    # Пользователь говорит только в секундах 20-25
+    near[:20 * RATE] = 0
+    near[25 * RATE:] = 0
+    echo = room_echo(far)
+    noise = np.random.default_rng(3).standard_normal(len(far)).astype(np.float32) * 1e-3
+    mic = echo + near + noise
+
+    canceller = EchoCanceller()
+    out = []
+    start = time.process_time()
+    for i in range(0, len(mic), CHUNK_SIZE):
+        out.append(canceller.process(far[i:i + CHUNK_SIZE], mic[i:i + CHUNK_SIZE]))
+    cpu = time.process_time() - start
+    cleaned = np.concatenate(out)
+
+    # Выход AEC запаздывает на фиксированную величину меньше блока - выравниваем для оценки
+    lag = int(np.argmax(np.correlate(cleaned[20 * RATE:20 * RATE + 4000], near[20 * RATE:20 * RATE + 4000], "full")) - 3999)
+    cleaned = np.roll(cleaned, -lag)
+
+    only_echo = slice(10 * RATE, 20 * RATE)
+    print(f"CPU: {cpu / DURATION * 1000:.1f} мс на секунду аудио ({cpu / DURATION * 100:.1f}% реального времени)")
+    print(f"Подавление эха (ERLE), 10-20 с: {erle(mic[only_echo], cleaned[only_echo]):.1f} дБ")
+    double_talk = slice(20 * RATE, 25 * RATE)
+    residual = cleaned[double_talk] - near[double_talk]
+    print(f"Одновременная речь, 20-25 с: голос пользователя / остаток эха = "
+          f"{erle(near[double_talk], residual):.1f} дБ (без AEC {erle(near[double_talk], echo[double_talk]):.1f} дБ)")
+
+
+if __name__ == "__main__":
+    main()
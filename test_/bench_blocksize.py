@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+import time
+
+# Адаптивный размер блока захвата: синтетические источники в реальном времени, обработка блока
+# имитируется фиксированной стоимостью вызова (как накладные расходы Python/VAD/признаков).
+# Сравниваем фиксированный блок 250 мс и адаптивный: задержку, итоговый размер блока и потери.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from audio_sources import SyntheticSource
+from capture import CaptureThread, StreamMixer, AdaptiveBlockSize
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+DURATION = 12
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run(label, cost, adaptive):
+    sources = (SyntheticSource("speech", duration=DURATION + 2), SyntheticSource("noise", duration=DURATION + 2))
+    control = AdaptiveBlockSize(RATE) if adaptive else None
+    block = control.size if control else CHUNK_SIZE
+    fixed_latency = AdaptiveBlockSize(RATE, start=CHUNK_SIZE)  # Только для подсчета задержки
+    data_ready = threading.Event()
+    with sources[0].recorder(RATE, 1, CHUNK_SIZE * 2) as speaker_rec, sources[1].recorder(RATE, 1, CHUNK_SIZE * 2) as mic_rec:
+        threads = [CaptureThread(speaker_rec, block, data_ready=data_ready, name="speaker"),
+                   CaptureThread(mic_rec, block, data_ready=data_ready, name="mic")]
+        mixer = StreamMixer(*threads)
+        for thread in threads:
+            thread.start()
+        end = time.monotonic() + DURATION
+        while time.monotonic() < end:
+            data_ready.wait(0.5)
+            data_ready.clear()
+            while True:
+                data = mixer.read(block)
+                if data is None:
+                    break
+                start = time.perf_counter()
+                busy(cost)
+                spent = time.perf_counter() - start
+                lost = sum(t.stats.dropped for t in threads)  # Как AudioRecorder._lost_frames
+                queued = max(t.ring.available() for t in threads)
+                if control:
+                    block = control.observe(spent, len(data[0]), lost, queued)
+                    for thread in threads:
+                        thread.numframes = block
+                else:
+                    fixed_latency.observe(spent, len(data[0]), lost, queued)
+        for thread in threads:
+            thread.stop()
+    stats = control or fixed_latency
+    lost = sum(t.stats.dropped + t.stats.max_deficit for t in threads)
+    print(f"{label}: {stats.format()}, изменений размера {stats.changes if control else 0}, потеряно {lost} кадров")
+
+
+if __name__ == "__main__":
+    for cost in (0.005, 0.040):
+        print(f"Стоимость обработки блока {cost * 1000:.0f} мс")
+        run("  фиксированный 250 мс", cost, adaptive=False)
+        run("  адаптивный", cost, adaptive=True)
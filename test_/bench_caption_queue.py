@@ -0,0 +1,77 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+# Очередь распознавателя Vosk при отставании: распознаватель имитируется фиксированной
+# стоимостью вызова AcceptWaveform плюс стоимостью на секунду звука (на загруженной машине
+# фиксированная часть не дает успевать за фрагментами по 0.25 с). Сравниваем старую
+# неограниченную queue.Queue и AudioChunkQueue со склейкой фрагментов.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+from caption_queue import AudioChunkQueue, CaptionLatency
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+CHUNK_BYTES = b"\0" * (CHUNK_SIZE * 2)
+DURATION = 20
+CALL_COST = 0.15  # Секунд на вызов AcceptWaveform
+AUDIO_COST = 0.5  # Секунд на секунду звука
+PARTIAL_COST = 0.02  # Разбор PartialResult
+
+
+def accept_waveform(data):
+    time.sleep(CALL_COST + AUDIO_COST * len(data) / 2 / RATE)
+
+
+def produce(put):
+    start = time.monotonic()
+    for i in range(int(DURATION * 4)):
+        # Фрагменты приходят в темпе реального времени
+        time.sleep(max(0.0, start + (i + 1) * 0.25 - time.monotonic()))
+        put(CHUNK_BYTES, time.monotonic())
+
+
+def bench_unbounded():
+    q = queue.Queue()
+    latency = CaptionLatency()
+    producer = threading.Thread(target=produce, args=(lambda data, t: q.put((data, t)),))
+    producer.start()
+    end = time.monotonic() + DURATION
+    while time.monotonic() < end:
+        try:
+            data, captured_at = q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        accept_waveform(data)
+        latency.add(captured_at)
+        time.sleep(PARTIAL_COST)
+    producer.join()
+    print(f"queue.Queue: {latency.format()}, осталось в очереди {q.qsize()} фрагментов")
+
+
+def bench_bounded():
+    chunks = AudioChunkQueue()
+    latency = CaptionLatency()
+    producer = threading.Thread(target=produce, args=(chunks.put,))
+    producer.start()
+    end = time.monotonic() + DURATION
+    while time.monotonic() < end:
+        try:
+            data, captured_at, merged, behind = chunks.get_batch(timeout=0.5)
+        except queue.Empty:
+            continue
+        if merged > 1:
+            latency.catch_up_batches += 1
+        accept_waveform(data)
+        latency.add(captured_at)
+        if not behind:
+            time.sleep(PARTIAL_COST)
+    producer.join()
+    print(f"AudioChunkQueue: {latency.format(chunks)}")
+
+
+if __name__ == "__main__":
+    print(f"Стоимость вызова {CALL_COST * 1000:.0f} мс + {AUDIO_COST:.1f} с на секунду звука, {DURATION} с звука")
+    bench_unbounded()
+    bench_bounded()
@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Модули рабочей версии
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from capture import CaptureThread, StreamMixer
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+SPEEDUP = 4  # Во сколько раз быстрее реального времени отдают данные синтетические устройства
+DURATION = 60  # Секунд аудио на каждое устройство
+
+
+class SyntheticRecorder:
+    """Имитирует recorder из soundcard: отдает синус с заданной частотой дискретизации"""
+
+    def __init__(self, rate, freq, speedup, total_frames):
+        self.rate = rate
+        self.freq = freq
+        self.speedup = speedup
+        self.total_frames = total_frames
+        self.pos = 0
+        self.next_time = None
+        self.done = threading.Event()
+
+    def record(self, numframes):
+        if self.pos >= self.total_frames:
+            self.done.set()
+            time.sleep(0.01)
+            return np.zeros((0, 1), dtype=np.float32)
+        t = (self.pos + np.arange(numframes)) / self.rate
+        self.pos += numframes
+        # Темп по абсолютному расписанию, чтобы накладные расходы не искажали частоту "устройства"
+        if self.next_time is None:
+            self.next_time = time.monotonic()
+        self.next_time += numframes / self.rate / self.speedup
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return (0.3 * np.sin(2 * np.pi * self.freq * t)).astype(np.float32)[:, None]
+
+
+def main():
+    total = RATE * DURATION
+    # Микрофон "спешит" на 0.1% - типичный дрейф между двумя звуковыми картами
+    speaker = SyntheticRecorder(RATE, 440, SPEEDUP, total)
+    mic = SyntheticRecorder(RATE * 1.001, 220, SPEEDUP, int(total * 1.001))
+
+    data_ready = threading.Event()
+    speaker_thread = CaptureThread(speaker, CHUNK_SIZE, data_ready=data_ready, name="speaker")
+    mic_thread = CaptureThread(mic, CHUNK_SIZE, data_ready=data_ready, name="mic")
+    mixer = StreamMixer(speaker_thread, mic_thread)
+
+    start = time.perf_counter()
+    speaker_thread.start()
+    mic_thread.start()
+
+    mixed_frames = 0
+    while not (speaker.done.is_set() and mic.done.is_set()):
+        data_ready.wait(timeout=0.5)
+        data_ready.clear()
+        while True:
+            block = mixer.read(CHUNK_SIZE)
+            if block is None:
+                break
+            mixed_frames += len(block[0])
+
+    elapsed = time.perf_counter() - start
+    speaker_thread.stop()
+    mic_thread.stop()
+    speaker_thread.join()
+    mic_thread.join()
+    block = mixer.flush()  # Последний неполный блок
+    if block is not None:
+        mixed_frames += len(block[0])
+
+    print(f"Аудио: {DURATION} с на устройство, ускорение x{SPEEDUP}, время: {elapsed:.2f} с")
+    print(f"Смешано сэмплов: {mixed_frames} из {total}")
+    print(f"Потеряно кадров: speaker={speaker_thread.ring.dropped}, mic={mic_thread.ring.dropped}")
+    print(f"Оценка дрейфа mic/speaker: {mixer.drift_ratio():.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import glob
+import os
+import sys
+import threading
+import time
+
+# Простой на паузе: CPU и число пробуждений (добровольных переключений контекста, Linux /proc)
+# для старого цикла с time.sleep(0.01) и для AudioRecorder с событиями и закрытием устройств.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from audio_sources import SyntheticSource
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+MEASURE_SECONDS = 10
+
+
+def context_switches():
+    total = 0
+    for path in glob.glob("/proc/self/task/*/status"):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith("voluntary_ctxt_switches"):
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            pass  # Поток успел завершиться
+    return total
+
+
+def measure(label):
+    cpu, switches = time.process_time(), context_switches()
+    time.sleep(MEASURE_SECONDS)
+    cpu = time.process_time() - cpu
+    switches = context_switches() - switches
+    print(f"{label}: CPU {cpu * 1000 / MEASURE_SECONDS:.2f} мс/с, "
+          f"пробуждений {switches / MEASURE_SECONDS:.1f} в секунду")
+
+
+def bench_polling_loop():
+    """Цикл записи до перехода на события: устройства открыты, опрос флага каждые 10 мс"""
+    state = {"running": True, "recording": False}
+    sources = (SyntheticSource("speech", duration=120), SyntheticSource("noise", duration=120, level=0.005))
+
+    def loop():
+        with sources[0].recorder() as speaker_rec, sources[1].recorder() as mic_rec:
+            while state["running"]:
+                if state["recording"]:
+                    speaker_rec.record(numframes=CHUNK_SIZE)
+                    mic_rec.record(numframes=CHUNK_SIZE)
+                time.sleep(0.01)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    measure("До (опрос time.sleep(0.01))")
+    state["running"] = False
+    thread.join()
+
+
+def bench_recorder():
+    from audio_recorder import AudioRecorder
+
+    sources = (SyntheticSource("speech", duration=120), SyntheticSource("noise", duration=120, level=0.005))
+    recorder = AudioRecorder("tiny", sources=sources, idle_timeout=1.0)
+    recorder.start_recording()
+    time.sleep(1.0)
+    recorder.pause_recording()
+    time.sleep(recorder.idle_timeout + 0.5)
+    measure("После (события, устройства закрыты после простоя)")
+
+    recorder.clear_recording()
+    start = time.perf_counter()
+    recorder.resume_recording()
+    while not recorder.has_recording():
+        time.sleep(0.001)
+    print(f"Возобновление до первого фрагмента: {(time.perf_counter() - start) * 1000:.0f} мс")
+    recorder.stop()
+
+
+if __name__ == "__main__":
+    bench_polling_loop()
+    bench_recorder()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+
+# Гибридные подписи против транскрибации после клика: запись проигрывается в темпе реального
+# времени, Vosk дает подписи сразу, Whisper уточняет фразы в фоне. В конце "клик": сколько ждать
+# готового текста Whisper с подписями и сколько - при транскрибации всей записи целиком.
+# Пример: python bench_live_captions.py --vosk C:/model/vosk-model-small-ru-0.22 --wav question.wav
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+import torch
+import whisper
+from audio_recorder import INITIAL_PROMPT, postprocess_transcription
+from dsp import StreamingPreprocessor
+from live_captions import LiveCaptions
+
+RATE = 16000
+CHUNK = RATE // 4
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vosk", default="C:/model/vosk-model-small-ru-0.22")
+    parser.add_argument("--whisper", default="medium")
+    parser.add_argument("--wav", required=True, help="Моно запись вопроса")
+    parser.add_argument("--speed", type=float, default=1.0, help="Во сколько раз быстрее реального времени")
+    args = parser.parse_args()
+
+    audio, rate = sf.read(args.wav, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if rate != RATE:
+        from scipy.signal import resample_poly
+        audio = resample_poly(audio, RATE, rate).astype(np.float32)
+
+    model = whisper.load_model(args.whisper)
+
+    def transcribe(samples):
+        result = model.transcribe(StreamingPreprocessor(RATE).process(samples), language="ru", beam_size=5,
+                                  fp16=torch.cuda.is_available(), temperature=0.2, initial_prompt=INITIAL_PROMPT)
+        return postprocess_transcription(" ".join(s["text"] for s in result["segments"]))
+
+    first_text = []
+    start = time.monotonic()
+
+    def on_update(text):
+        if text and not first_text:
+            first_text.append(time.monotonic() - start)
+
+    captions = LiveCaptions(args.vosk, transcribe, on_update=on_update)
+    for i in range(0, len(audio), CHUNK):
+        captions.feed(audio[i:i + CHUNK], i)
+        time.sleep(CHUNK / RATE / args.speed)
+
+    # Клик "пауза": последняя фраза завершается, ждем, пока Whisper уточнит все фразы
+    click = time.monotonic()
+    captions.flush()
+    time.sleep(0.1)
+    while captions.pending() or captions._chunks:
+        time.sleep(0.01)
+    hybrid_wait = time.monotonic() - click
+    hybrid_text = captions.text()
+    captions.stop()
+
+    click = time.monotonic()
+    full_text = transcribe(audio)
+    full_wait = time.monotonic() - click
+
+    print(f"Запись {len(audio) / RATE:.1f} с, фраз {len(captions.captions)}")
+    print(f"Первая подпись через {first_text[0] if first_text else float('nan'):.2f} с от начала записи")
+    print(f"{captions.format()}")
+    print(f"Ожидание после клика: гибрид {hybrid_wait:.2f} с, Whisper целиком {full_wait:.2f} с")
+    print(f"Гибрид: {hybrid_text}")
+    print(f"Целиком: {full_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Нагрузочный тест LLMClient без сети: локальный mock_llm_server с задержкой первого токена,
+# хвостом задержек и долей ошибок 503. Для каждого ограничения одновременных запросов -
+# пропускная способность, задержка первого куска и всего ответа (p50/p99), повторы
+# и сколько TCP-соединений понадобилось на все запросы.
+# Пример: python bench_llm_client.py --requests 200 --concurrency 1 4 16 --error-rate 0.05
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from llm_client import LLMClient
+from mock_llm_server import MockLLMServer, add_arguments
+
+
+def start_server(args):
+    loop = asyncio.new_event_loop()
+    server = MockLLMServer(args.first_token_ms, args.token_ms, args.tokens, args.tail_rate, args.tail_factor,
+                           args.error_rate)
+    port = loop.run_until_complete(server.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server, port
+
+
+async def one_request(client, i, first, total, errors):
+    start = time.perf_counter()
+    try:
+        async for _ in client.stream(f"вопрос {i}"):
+            if i not in first:
+                first[i] = time.perf_counter() - start
+        total.append(time.perf_counter() - start)
+    except Exception as e:
+        errors.append(e)
+
+
+async def run(client, requests):
+    first, total, errors = {}, [], []
+    await asyncio.gather(*(one_request(client, i, first, total, errors) for i in range(requests)))
+    return np.array(list(first.values())) * 1000, np.array(total) * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--timeout", type=float, default=10.0)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server, port = start_server(args)
+
+    for concurrency in args.concurrency:
+        client = LLMClient({"backend": "openai", "base_url": f"http://127.0.0.1:{port}/v1",
+                            "max_concurrency": concurrency, "max_connections": concurrency,
+                            "timeout": args.timeout, "backoff": 0.05})
+        start = time.perf_counter()
+        first, total, errors = asyncio.run_coroutine_threadsafe(run(client, args.requests), client.loop).result()
+        elapsed = time.perf_counter() - start
+        # Задержки включают ожидание своей очереди - так их видит пользователь
+        print(f"одновременно {concurrency:>3}: {len(total) / elapsed:6.1f} отв/с, "
+              f"первый кусок p50 {np.percentile(first, 50):7.0f} мс p99 {np.percentile(first, 99):7.0f} мс, "
+              f"весь ответ p50 {np.percentile(total, 50):7.0f} мс p99 {np.percentile(total, 99):7.0f} мс, "
+              f"повторов {client.retried}, ошибок {len(errors)}, соединений {client.pool.opened}")
+        client.close()
+    print(f"сервер: запросов {server.requests}, из них 503 - {server.errors}, соединений {server.connections}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+
+# Задержка от клика до первого байта ответа: процесс на каждый запрос (как было) против
+# постоянного процесса LLMWorker. --backend duckai - настоящий сервис (нужна сеть),
+# --backend local - клиент с фиксированной задержкой "сети" и тяжелым импортом, без сети.
+# Для постоянного процесса отдельно видно время до первого куска ответа (потоковая выдача).
+# Пример: python bench_llm_worker.py --backend duckai --requests 5
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from llm_worker import LLMWorker, duckai_client, STATUS, CHUNK
+
+QUERY = "Представь ты на собеседование мидл python разработчик, тебе надо коротко ответить на вопрос. Вот вопрос: чем отличаются потоки и процессы"
+NETWORK_SECONDS = 0.3
+TOKENS = 60
+TOKEN_SECONDS = 0.02
+
+
+class LocalClient:
+    def chat_yield(self, query, model=None):
+        time.sleep(NETWORK_SECONDS)
+        for i in range(TOKENS):
+            time.sleep(TOKEN_SECONDS)
+            yield f"слово{i} "
+
+    def chat(self, query, model=None):
+        return "".join(self.chat_yield(query, model))
+
+
+def local_client():
+    # Импорт, сопоставимый по весу с HTTP-стеком duckai
+    import asyncio, email.mime.multipart, http.client, json, ssl, urllib.request  # noqa: F401
+    return LocalClient()
+
+
+def spawn_request(conn, factory, query):
+    # Как прежний RequestProcess: импорт, клиент и запрос в новом процессе
+    client = factory()
+    conn.send(client.chat(query, model="gpt-4o-mini"))
+    conn.close()
+
+
+def bench_spawn(factory, requests):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=spawn_request, args=(child_conn, factory, QUERY))
+        process.start()
+        parent_conn.recv()
+        times.append(time.perf_counter() - start)
+        process.join()
+    return times
+
+
+def bench_worker(factory, requests, in_flight):
+    worker = LLMWorker(client_factory=factory)
+    worker.start()
+    time.sleep(2.0)  # Приложение запущено заранее: процесс и клиент успели подняться
+    times, first = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        ids = {worker.submit(QUERY) for _ in range(in_flight)}
+        first_seen = False
+        while ids:
+            for kind, request_id, _ in worker.poll():
+                if kind != STATUS and not first_seen:
+                    first_seen = True
+                    first.append(time.perf_counter() - start)
+                if kind not in (STATUS, CHUNK):
+                    ids.discard(request_id)
+            time.sleep(0.001)
+        times.append(time.perf_counter() - start)
+    print(worker.format())
+    worker.stop()
+    return times, first
+
+
+def report(name, times):
+    print(f"{name}: p50 {statistics.median(times) * 1000:.0f} мс, max {max(times) * 1000:.0f} мс "
+          f"({len(times)} запросов)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("duckai", "local"), default="local")
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--in-flight", type=int, default=1, help="Сколько запросов отправлять одновременно")
+    args = parser.parse_args()
+    factory = duckai_client if args.backend == "duckai" else local_client
+
+    report("процесс на запрос, ответ целиком", bench_spawn(factory, args.requests))
+    times, first = bench_worker(factory, args.requests, args.in_flight)
+    report(f"постоянный процесс, {args.in_flight} одновременно, первый кусок", first)
+    report(f"постоянный процесс, {args.in_flight} одновременно, ответ целиком", times)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Построение индекса похожих вопросов и время поиска на 1k-100k сохраненных вопросов.
+# Вопросы синтетические: обрамление + тема + уточнение, с опечатками в части слов.
+# Пример: python bench_question_index.py --sizes 1000 10000 100000
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from question_index import QuestionIndex
+
+FRAMES = ["что такое", "расскажи про", "объясни", "чем отличаются", "как работает", "зачем нужен",
+          "когда использовать", "какие минусы у", "как устроен", "приведи пример"]
+TOPICS = ["GIL", "декораторы", "генераторы", "итераторы", "метаклассы", "asyncio", "потоки и процессы",
+          "list и tuple", "словари", "множества", "сборщик мусора", "контекстные менеджеры",
+          "дескрипторы", "slots", "замыкания", "лямбда функции", "исключения", "модули и пакеты",
+          "виртуальное окружение", "pytest", "django orm", "транзакции", "индексы в базе данных",
+          "rest api", "http запросы", "celery", "redis", "docker", "git rebase", "solid"]
+DETAILS = ["", "в питоне", "на собеседовании", "в реальном проекте", "с примером", "подробно",
+           "в двух словах", "в python 3", "и зачем", "и где применяются"]
+
+
+def typo(word, rng):
+    if len(word) < 4 or rng.random() > 0.2:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def make_question(rng):
+    words = f"{rng.choice(FRAMES)} {rng.choice(TOPICS)} {rng.choice(DETAILS)} {rng.randrange(100000)}".split()
+    return " ".join(typo(word, rng) for word in words)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for size in args.sizes:
+        questions = [make_question(rng) for _ in range(size)]
+        index = QuestionIndex()
+        start = time.perf_counter()
+        index.load(enumerate(questions))
+        build = time.perf_counter() - start
+
+        # Добавление одного вопроса и пересборка матрицы - то, что происходит после нового ответа
+        start = time.perf_counter()
+        index.add(size, make_question(rng), refresh=False)
+        index.build()
+        rebuild = time.perf_counter() - start
+
+        times, found = [], 0
+        for _ in range(args.queries):
+            query = make_question(rng)
+            start = time.perf_counter()
+            found += index.search(query) is not None
+            times.append(time.perf_counter() - start)
+        times = np.array(times) * 1000
+        print(f"{size:>7} вопросов: построение {build:.2f} с, пересборка после добавления (в фоне) "
+              f"{rebuild * 1000:.0f} мс, поиск p50 {np.percentile(times, 50):.2f} мс "
+              f"p99 {np.percentile(times, 99):.2f} мс, найдено похожих {found}/{args.queries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Стоимость собственной передискретизации и джиттер цикла захвата: 16 кГц напрямую против
+# нативных 44.1/48 кГц с передискретизацией в потоке захвата.
+# Передискретизацию внутри ОС/soundcard отсюда не измерить - для нее нужен реальный звук.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from audio_sources import SyntheticSource
+from capture import CaptureThread, ResampledRecorder
+from dsp import StreamingResampler
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+JITTER_SECONDS = 10
+
+
+def cpu_cost(in_rate, seconds=30):
+    audio = SyntheticSource("speech", duration=seconds).generate(in_rate)
+    resampler = StreamingResampler(in_rate, RATE)
+    chunk = in_rate // 4
+    start = time.process_time()
+    for i in range(0, len(audio), chunk):
+        resampler.process(audio[i:i + chunk])
+    return (time.process_time() - start) / seconds
+
+
+class TimedRecorder:
+    """Запоминает моменты, когда поток захвата получил очередной блок"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.realtime = True
+        self.times = []
+
+    def record(self, numframes):
+        data = self.recorder.record(numframes=numframes)
+        self.times.append(time.perf_counter())
+        return data
+
+
+def jitter(device_rate):
+    source = SyntheticSource("speech", duration=JITTER_SECONDS + 1, realtime=True)
+    with source.recorder(samplerate=device_rate) as raw:
+        timed = TimedRecorder(raw)
+        recorder = ResampledRecorder(timed, device_rate, RATE) if device_rate != RATE else timed
+        thread = CaptureThread(recorder, CHUNK_SIZE)
+        thread.start()
+        time.sleep(JITTER_SECONDS)
+        thread.stop()
+        thread.join(timeout=1.0)
+
+    intervals = np.diff(timed.times) * 1000
+    deviation = np.abs(intervals - 1000 * CHUNK_SIZE / RATE)
+    cpu = recorder.cpu_time / JITTER_SECONDS if device_rate != RATE else 0.0
+    return deviation, cpu
+
+
+def main():
+    for rate in (44100, 48000):
+        print(f"Передискретизация {rate} -> {RATE}: {cpu_cost(rate) * 1000:.2f} мс CPU на секунду аудио")
+
+    for rate in (RATE, 44100, 48000):
+        deviation, cpu = jitter(rate)
+        print(f"Захват {rate} Гц: джиттер p50={np.percentile(deviation, 50):.2f} мс, "
+              f"p99={np.percentile(deviation, 99):.2f} мс, max={deviation.max():.2f} мс, "
+              f"CPU передискретизации {cpu * 1000:.2f} мс/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+
+# Хранение сегментов живой транскрибации Whisper: словарь с float-ключами (как было)
+# против SegmentIndex. Имитируется час: каждую секунду подтверждается сегмент, каждые 5 с
+# участок перераспознается заново, оверлей обновляется 4 раза в секунду, копирование
+# текста за 30 с - раз в 10 с. История 30 с (как в процессоре) и весь час.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+from segment_index import SegmentIndex
+
+HOUR = 3600
+DISPLAY = 10
+
+
+class Segment:
+    def __init__(self, text, start_time, end_time):
+        self.text = text
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+class DictSegments:
+    """Код из audio_processor_whisper.py до SegmentIndex"""
+
+    def __init__(self, history):
+        self.segments_dict = {}
+        self.history = history
+
+    def insert(self, segment, now):
+        start = segment.start_time
+        while start in self.segments_dict:
+            start += 0.000001
+        self.segments_dict[start] = segment
+        if self.history:
+            cutoff_time = now - self.history
+            self.segments_dict = {k: v for k, v in self.segments_dict.items() if v.end_time > cutoff_time}
+
+    def text_since(self, cutoff_time):
+        period = sorted([seg for seg in self.segments_dict.values() if seg.start_time >= cutoff_time],
+                        key=lambda x: x.start_time)
+        return " ".join([seg.text for seg in period]).strip()
+
+
+class IndexSegments:
+    def __init__(self, history):
+        self.index = SegmentIndex()
+        self.history = history
+
+    def insert(self, segment, now):
+        self.index.insert(segment)
+        if self.history:
+            self.index.drop_before(now - self.history)
+
+    def text_since(self, cutoff_time):
+        return self.index.text_between(cutoff_time)
+
+
+def simulate(store):
+    start = time.perf_counter()
+    for second in range(1, HOUR + 1):
+        store.insert(Segment(f"фраза {second}", second - 1, second), second)
+        if second % 5 == 0:
+            # Перераспознавание последних 5 секунд: в словаре - дубликаты, в индексе - замена
+            store.insert(Segment(f"уточнение {second}", second - 5, second), second)
+        for _ in range(4):
+            store.text_since(second - DISPLAY)
+        if second % 10 == 0:
+            store.text_since(second - 30)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for history, label in ((30, "история 30 с"), (None, "история весь час")):
+        old = simulate(DictSegments(history))
+        new = simulate(IndexSegments(history))
+        store = IndexSegments(history)
+        simulate(store)
+        print(f"{label}: словарь {old:.2f} с, SegmentIndex {new:.2f} с на час (x{old / new:.0f}), "
+              f"сегментов в индексе {len(store.index)}")
+    # Перекрытие: новая версия участка заменяет старую, а не дублирует ее
+    check = SegmentIndex()
+    for seg in (Segment("a", 0, 2), Segment("b", 2, 4), Segment("c", 4, 6), Segment("B", 1.9, 4.1), Segment("d", 5.5, 7)):
+        check.insert(seg)
+    print("Перекрытие:", [(s.text, s.start_time, s.end_time) for s in check])
+    # Частичное перекрытие режет и текст; сегмент, внутри которого новый, делится на два
+    check = SegmentIndex()
+    for seg in (Segment("раз два три четыре", 0, 4), Segment("ДВА", 1, 2), Segment("пять шесть", 4, 6),
+                Segment("ЧЕТЫРЕ ПЯТЬ", 3, 5)):
+        check.insert(seg)
+    print("Разрезание:", [(s.text, s.start_time, s.end_time) for s in check])
+    # Подтвержденные слова идут с нахлестом до 0.1 с - прежний текст не должен пропадать
+    check = SegmentIndex()
+    for seg in (Segment("да", 10.0, 10.15), Segment("нет", 10.05, 10.6)):
+        check.append(seg)
+    print("Подтвержденное с нахлестом:", [(s.text, s.start_time, s.end_time) for s in check])
+    # Слово, задетое обрезанным куском частично, остается в нем: "три" на 10.33-10.5 при обрезке по 10.38
+    check = SegmentIndex()
+    for seg in (Segment("один два три", 10.0, 10.5), Segment("четыре", 10.38, 11.0)):
+        check.insert(seg)
+    print("Обрезка по слову:", [(s.text, s.start_time, s.end_time) for s in check])
+    check = SegmentIndex()
+    for seg in (Segment("один два три", 10.0, 10.5), Segment("четыре", 10.38, 11.0)):
+        check.append(seg)
+    print("То же подтвержденным:", [(s.text, s.start_time, s.end_time) for s in check])
@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import wave
+
+# Прогон рекордера и процессоров без звуковой карты: источники - WAV-файл или синтетика.
+# Пример: python bench_sources.py recorder --wav question.wav
+#         python bench_sources.py vosk --model C:/model/vosk-model-small-ru-0.22
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def make_sources(args):
+    from audio_sources import SyntheticSource, WavFileSource
+    duration = args.duration
+    if args.wav:
+        speaker = WavFileSource(args.wav, realtime=args.realtime)
+        with wave.open(args.wav, "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+    else:
+        speaker = SyntheticSource("speech", duration=duration, realtime=args.realtime)
+    # Микрофон - тихий шум той же длительности, чтобы смешивание работало как в жизни
+    mic = SyntheticSource("noise", duration=duration, realtime=args.realtime, level=0.005, seed=1)
+    return speaker, mic
+
+
+def bench_recorder(args):
+    sys.path.insert(0, os.path.join(ROOT, "0_0_1_4"))
+    from PyQt5.QtCore import QCoreApplication
+    from audio_recorder import AudioRecorder, RATE
+
+    app = QCoreApplication(sys.argv)
+    recorder = AudioRecorder(args.whisper_model, sources=make_sources(args))
+
+    start = time.perf_counter()
+    recorder.start_recording()
+    recorder.record_thread.join()
+    capture_time = time.perf_counter() - start
+    audio_seconds = sum(track.length for track in recorder.tracks.values()) / RATE
+    print(f"Захват: {audio_seconds:.1f} с речи за {capture_time:.2f} с "
+          f"(x{audio_seconds / capture_time:.1f} реального времени)")
+
+    done = []
+    recorder.signals.transcription_complete.connect(lambda text: (done.append(text), app.quit()))
+    start = time.perf_counter()
+    recorder.transcribe()
+    app.exec_()
+    print(f"Транскрибация: {time.perf_counter() - start:.2f} с")
+    print(f"Текст: {done[0] if done else ''}")
+
+
+def bench_processor(args, module_name, model):
+    sys.path.insert(0, os.path.join(ROOT, "0_0_1_2a"))
+    module = __import__(module_name)
+
+    processor = module.AudioProcessor(model, sources=make_sources(args))
+    texts = []
+    processor.signals.text_updated.connect(texts.append)
+
+    audio_queue = getattr(processor, "audio_queue", None)
+    base_threads = threading.active_count()
+
+    start = time.perf_counter()
+    processor.start()
+    deadline = start + args.duration * 2 + 30
+    time.sleep(0.5)
+    if hasattr(processor, "recognizers"):
+        # Процессоры Vosk завершаются сами, когда распознаватели источников разобрали очереди
+        processor.join(deadline - time.perf_counter())
+    while processor.is_alive() and time.perf_counter() < deadline:
+        # Поток записи завершился (источники исчерпаны) и очередь разобрана - прогон закончен
+        if threading.active_count() <= base_threads + 1 and audio_queue.empty():
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    processor.stop()
+    print(f"{module_name}: {args.duration} с аудио за {elapsed:.2f} с")
+    print(f"Обновлений текста: {len(texts)}; последний: {texts[-1] if texts else ''}")
+    for recognizer in getattr(processor, "recognizers", []):
+        print(recognizer.format())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", choices=["recorder", "vosk", "vosk_b", "whisper"])
+    parser.add_argument("--wav", help="WAV-файл вместо синтетической речи")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--realtime", action="store_true", help="Отдавать данные в темпе реального времени")
+    parser.add_argument("--whisper-model", default="tiny")
+    parser.add_argument("--model", default="C:/model/vosk-model-small-ru-0.22", help="Путь к модели Vosk")
+    args = parser.parse_args()
+
+    if args.target == "recorder":
+        bench_recorder(args)
+    elif args.target == "whisper":
+        bench_processor(args, "audio_processor_whisper", args.whisper_model)
+    else:
+        name = "audio_processor_vosk" if args.target == "vosk" else "audio_processor_vosk_b"
+        bench_processor(args, name, args.model)
+
+
+if __name__ == "__main__":
+    main()
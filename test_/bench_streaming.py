@@ -0,0 +1,154 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Потоковая политика Whisper: старая (последние 5 с каждые 5 с) против local agreement.
+# По умолчанию декодер имитируется по известной разметке слов: слово, обрезанное краем окна,
+# распознается с ошибкой (как это делает настоящий Whisper). Считаем задержку подписи
+# (от конца слова до его показа), потерянные/повторенные слова и работу декодера на минуту звука.
+# С --model и --wav работает настоящий Whisper и меряется время декодирования.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+from streaming_policy import LocalAgreement, normalize_word
+
+RATE = 16000
+STEP = 0.25  # Фрагменты захвата
+DURATION = 120
+WINDOW = 5  # Старая политика
+
+
+def make_script(duration, seed=0):
+    """Разметка слов: слово 0.2-0.6 с, паузы 0.05-0.3 с, каждые 6-12 слов - конец предложения"""
+    rng = np.random.default_rng(seed)
+    words, t, i = [], 0.3, 0
+    next_stop = rng.integers(6, 13)
+    while True:
+        length = rng.uniform(0.2, 0.6)
+        if t + length > duration - 0.5:
+            return words
+        i += 1
+        text = f"слово{i}" + ("." if i == next_stop else "")
+        if i == next_stop:
+            next_stop += rng.integers(6, 13)
+        words.append((t, t + length, text))
+        t += length + rng.uniform(0.05, 0.3)
+
+
+class SimulatedDecoder:
+    def __init__(self, script):
+        self.script = script
+        self.offset = 0.0  # Время потока начала буфера (ставит вызывающий)
+        self.passes = 0
+
+    def __call__(self, audio, prompt=""):
+        self.passes += 1
+        start, end = self.offset, self.offset + len(audio) / RATE
+        out = []
+        for w_start, w_end, text in self.script:
+            if w_end <= start or w_start >= end:
+                continue
+            if w_start < start or w_end > end:
+                text = f"{text}~{self.passes}"  # Обрезанное окном слово - каждый раз по-разному
+            out.append((max(w_start, start) - start, min(w_end, end) - start, text))
+        return out
+
+
+def score(script, shown):
+    """shown - [(время показа, слово)]; задержки, потерянные и лишние слова"""
+    reference = {normalize_word(text): w_end for _, w_end, text in script}
+    latencies, seen, extra = [], set(), 0
+    for t, text in shown:
+        key = normalize_word(text)
+        if key in reference and key not in seen:
+            seen.add(key)
+            latencies.append(t - reference[key])
+        else:
+            extra += 1
+    lost = len(reference) - len(seen)
+    return np.array(latencies), lost, extra
+
+
+def report(label, latencies, lost, extra, passes, decoded, duration, wall=None):
+    minutes = duration / 60
+    line = (f"{label}: задержка p50={np.median(latencies):.2f} p90={np.percentile(latencies, 90):.2f} с, "
+            f"потеряно {lost}, лишних {extra}; декодер {passes / minutes:.0f} проходов и "
+            f"{decoded / minutes:.0f} с звука на минуту")
+    if wall is not None:
+        line += f", {wall / minutes:.1f} с времени на минуту"
+    print(line)
+
+
+def bench_old(script, duration):
+    decoder = SimulatedDecoder(script)
+    shown, decoded, passes = [], 0.0, 0
+    for now in np.arange(WINDOW, duration + 1e-9, WINDOW):
+        decoder.offset = now - WINDOW
+        words = decoder(np.zeros(int(WINDOW * RATE), dtype=np.float32))
+        shown += [(now, text) for _, _, text in words]
+        decoded += WINDOW
+        passes += 1
+    report("Старая (5 с окна)", *score(script, shown), passes, decoded, duration)
+
+
+def bench_agreement(script, duration):
+    decoder = SimulatedDecoder(script)
+    policy = LocalAgreement(decoder, RATE)
+    shown = []
+    chunk = np.zeros(int(STEP * RATE), dtype=np.float32)
+    for now in np.arange(STEP, duration + 1e-9, STEP):
+        policy.insert_audio(chunk)
+        if policy.ready():
+            decoder.offset = policy.buffer_start
+            shown += [(now, text) for _, _, text in policy.process()]
+    shown += [(duration, text) for _, _, text in policy.flush()]
+    report("Local agreement", *score(script, shown), policy.passes, policy.decoded_seconds, duration)
+
+
+def bench_real(args):
+    import soundfile as sf
+    import whisper
+
+    model = whisper.load_model(args.model)
+    audio, rate = sf.read(args.wav, dtype="float32")
+    audio = audio.mean(axis=1) if audio.ndim > 1 else audio
+    assert rate == RATE, "Нужен WAV 16 кГц"
+    wall = [0.0]
+
+    def transcribe(buf, prompt):
+        start = time.perf_counter()
+        result = model.transcribe(buf, language="ru", beam_size=1, fp16=False, temperature=0,
+                                  word_timestamps=True, initial_prompt=prompt or None,
+                                  condition_on_previous_text=False)
+        wall[0] += time.perf_counter() - start
+        return [(w["start"], w["end"], w["word"]) for s in result["segments"] for w in s.get("words", [])]
+
+    policy = LocalAgreement(transcribe, RATE)
+    latencies, step = [], int(STEP * RATE)
+    for i in range(0, len(audio), step):
+        policy.insert_audio(audio[i:i + step])
+        if policy.ready():
+            before = wall[0]
+            words = policy.process()
+            # Слово показано, когда пришел его звук и закончился проход декодера
+            now = (i + step) / RATE + (wall[0] - before)
+            latencies += [now - end for _, end, _ in words]
+    duration = len(audio) / RATE
+    report(f"Local agreement, whisper {args.model}", np.array(latencies or [0.0]), 0, 0,
+           policy.passes, policy.decoded_seconds, duration, wall[0])
+    print("Текст:", " ".join(w.strip() for _, _, w in policy.committed + policy.flush()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="Модель Whisper для прогона на настоящем звуке")
+    parser.add_argument("--wav", help="WAV 16 кГц для --model")
+    parser.add_argument("--duration", type=float, default=DURATION)
+    args = parser.parse_args()
+    if args.model:
+        bench_real(args)
+    else:
+        script = make_script(args.duration)
+        print(f"Имитация декодера: {len(script)} слов за {args.duration:.0f} с")
+        bench_old(script, args.duration)
+        bench_agreement(script, args.duration)
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+
+# Хранилище текста на часовой сессии: 3 слова в секунду, оверлей обновляется 20 раз в секунду.
+# Сравниваем стоимость обновления в начале и в конце часа с перебором списка и join
+# (как было в процессорах Vosk без обрезки окна), и проверяем чтение из нескольких потоков.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+from transcript_store import TranscriptStore
+
+WORDS_PER_SECOND = 3
+SESSION = 3600
+WINDOW = 30
+UPDATES = 200
+
+
+def per_update_us(render):
+    start = time.perf_counter()
+    for _ in range(UPDATES):
+        render()
+    return (time.perf_counter() - start) / UPDATES * 1e6
+
+
+def bench_cost():
+    store = TranscriptStore()
+    words = []
+    total = SESSION * WORDS_PER_SECOND
+    for i in range(total):
+        ts = i / WORDS_PER_SECOND
+        store.append(f"слово{i % 1000}", ts)
+        words.append((f"слово{i % 1000}", ts))
+        if i + 1 in (60 * WORDS_PER_SECOND, total):
+            now = ts
+            scan = per_update_us(lambda: " ".join(w for w, t in words if t >= now - WINDOW))
+            indexed = per_update_us(lambda: store.display_text(now - WINDOW))
+            print(f"{(i + 1) // WORDS_PER_SECOND // 60:>2} мин: перебор {scan:8.1f} мкс, "
+                  f"TranscriptStore {indexed:5.1f} мкс на обновление")
+
+    start = time.perf_counter()
+    appended = TranscriptStore()
+    for i in range(total):
+        appended.append("слово", i)
+    print(f"Добавление: {(time.perf_counter() - start) / total * 1e6:.2f} мкс на слово")
+
+
+def check_readers():
+    store = TranscriptStore()
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            text = store.text_since(0)
+            # Каждое чтение - целые слова по порядку, без обрывков
+            parts = text.split()
+            if parts and any(p != f"w{i}" for i, p in enumerate(parts)):
+                errors.append(text[-40:])
+                return
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(50000):
+        store.append(f"w{i}", i)
+    done.set()
+    for thread in readers:
+        thread.join()
+    print(f"Один писатель, 4 читателя: {'ошибок нет' if not errors else errors[0]}")
+
+
+if __name__ == "__main__":
+    bench_cost()
+    check_readers()
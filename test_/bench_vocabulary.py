@@ -0,0 +1,82 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import wave
+
+# Скорость и точность Vosk с открытым словарем и со словарем предметной области.
+# Фикстуры: папка с парами question.wav (моно, 16 бит, 16 кГц) + question.txt (эталонный текст).
+# Пример: python bench_vocabulary.py --model C:/model/vosk-model-small-ru-0.22 --fixtures fixtures
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+import vosk
+from source_recognizer import load_vocabulary, strip_unknown, UNKNOWN
+
+RATE = 16000
+CHUNK_FRAMES = RATE // 4
+
+
+def word_errors(reference, hypothesis):
+    """Расстояние Левенштейна по словам"""
+    prev = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        cur = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ref_word != hyp_word))
+        prev = cur
+    return prev[-1]
+
+
+def recognize(model, path, grammar):
+    if grammar:
+        rec = vosk.KaldiRecognizer(model, RATE, json.dumps(grammar + [UNKNOWN], ensure_ascii=False))
+    else:
+        rec = vosk.KaldiRecognizer(model, RATE)
+    texts = []
+    busy = 0.0
+    with wave.open(path, "rb") as wf:
+        duration = wf.getnframes() / wf.getframerate()
+        while True:
+            data = wf.readframes(CHUNK_FRAMES)
+            if not data:
+                break
+            start = time.perf_counter()
+            if rec.AcceptWaveform(data):
+                texts.append(json.loads(rec.Result()).get("text", ""))
+            busy += time.perf_counter() - start
+        start = time.perf_counter()
+        texts.append(json.loads(rec.FinalResult()).get("text", ""))
+        busy += time.perf_counter() - start
+    words = strip_unknown(" ".join(texts)).split()
+    return words, busy, duration
+
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="C:/model/vosk-model-small-ru-0.22")
+    parser.add_argument("--fixtures", required=True, help="Папка с парами .wav + .txt")
+    parser.add_argument("--vocabulary", default=os.path.join(root, "vocabulary.txt"))
+    args = parser.parse_args()
+
+    model = vosk.Model(args.model)
+    grammar = load_vocabulary(args.vocabulary)
+    fixtures = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    for label, phrases in (("Открытый словарь", None), (f"Словарь ({len(grammar)} фраз)", grammar)):
+        errors = total = 0
+        busy = duration = 0.0
+        for path in fixtures:
+            with open(os.path.splitext(path)[0] + ".txt", encoding="utf-8") as f:
+                reference = f.read().lower().split()
+            words, spent, seconds = recognize(model, path, phrases)
+            errors += word_errors(reference, words)
+            total += len(reference)
+            busy += spent
+            duration += seconds
+        print(f"{label}: RTF {busy / max(duration, 1e-9):.3f}, WER {errors / max(total, 1) * 100:.1f}% "
+              f"({len(fixtures)} записей, {duration:.0f} с)")
+
+
+if __name__ == "__main__":
+    main()
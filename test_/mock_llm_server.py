@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# Локальная замена LLM-сервиса для нагрузочных тестов без сети: OpenAI-совместимый
+# POST /v1/chat/completions, ответ потоком SSE (stream=true) или целиком, keep-alive.
+# Задержка до первого токена - логнормальная с медианой --first-token-ms и хвостом
+# (--tail-rate запросов ждут в --tail-factor раз дольше), дальше --tokens токенов
+# через --token-ms. --error-rate запросов получают 503 - для проверки повторов.
+# Запуск: python mock_llm_server.py --port 8000
+# В main.py: LLM_CONFIG = {"backend": "openai", "base_url": "http://127.0.0.1:8000/v1"}
+
+WORDS = ["поток", "процесс", "память", "GIL", "планировщик", "ядро", "контекст", "очередь", "блокировка",
+         "асинхронность", "ввод-вывод", "вычисления"]
+
+
+class MockLLMServer:
+    def __init__(self, first_token_ms=300.0, token_ms=20.0, tokens=60, tail_rate=0.02, tail_factor=5.0,
+                 error_rate=0.0, seed=0):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _first_token_delay(self):
+        delay = self.first_token_ms * self.rng.lognormvariate(0, 0.25)
+        if self.rng.random() < self.tail_rate:
+            delay *= self.tail_factor
+        return delay / 1000
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._respond(request_line.split()[1].decode(), body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, path, body, writer):
+        self.requests += 1
+        if not path.endswith("/chat/completions"):
+            return self._send(writer, 404, b'{"error": "not found"}')
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return self._send(writer, 503, b'{"error": "overloaded"}')
+        request = json.loads(body or b"{}")
+        await asyncio.sleep(self._first_token_delay())
+        words = [self.rng.choice(WORDS) + " " for _ in range(self.tokens)]
+        if not request.get("stream"):
+            await asyncio.sleep(self.token_ms * (self.tokens - 1) / 1000)
+            answer = {"choices": [{"message": {"role": "assistant", "content": "".join(words)}}]}
+            return self._send(writer, 200, json.dumps(answer, ensure_ascii=False).encode("utf-8"))
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            event = {"id": f"mock-{self.requests}", "created": int(time.time()),
+                     "choices": [{"index": 0, "delta": {"content": word}}]}
+            self._chunk(writer, b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n")
+            await writer.drain()
+        self._chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _chunk(writer, data):
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    @staticmethod
+    def _send(writer, status, data):
+        reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1") + data)
+
+
+async def serve(args):
+    server = MockLLMServer(args.first_token_ms, args.token_ms, args.tokens, args.tail_rate, args.tail_factor,
+                           args.error_rate)
+    port = await server.start(args.host, args.port)
+    print(f"mock LLM: http://{args.host}:{port}/v1/chat/completions")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def add_arguments(parser):
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--tail-rate", type=float, default=0.02)
+    parser.add_argument("--tail-factor", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
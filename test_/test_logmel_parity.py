@@ -0,0 +1,61 @@
+import os
+import sys
+import numpy as np
+import torch
+import whisper
+from whisper.audio import N_SAMPLES
+
+# Сверка инкрементальной лог-мел спектрограммы рекордера с whisper.log_mel_spectrogram
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_4"))
+from audio_sources import SyntheticSource
+from features import IncrementalLogMel, HOP_LENGTH, N_FRAMES
+
+TOLERANCE = 1e-3  # float32 STFT в numpy и torch расходятся в последних знаках
+
+
+def reference(audio):
+    # Кадры аудио и N_FRAMES кадров тишины после него, как в whisper.transcribe
+    mel = whisper.log_mel_spectrogram(torch.from_numpy(audio), padding=N_SAMPLES)
+    assert mel.shape[1] == len(audio) // HOP_LENGTH + N_FRAMES, mel.shape
+    return mel.numpy()
+
+
+def check(audio, chunk_sizes):
+    extractor = IncrementalLogMel()
+    rng = np.random.default_rng(len(audio))
+    pos = 0
+    while pos < len(audio):
+        size = int(rng.choice(chunk_sizes))
+        extractor.append(audio[pos:pos + size])
+        pos += size
+
+    ref = reference(audio)
+    content = len(audio) // HOP_LENGTH
+    # Без дополнения - только кадры аудио
+    ours = extractor.log_mel()
+    assert ours.shape == (ref.shape[0], content), (ours.shape, ref.shape)
+    diff = np.abs(ours - ref[:, :content]).max() if content else 0.0
+    assert diff < TOLERANCE, diff
+
+    # С дополнением - целиком, включая окна энкодера с тишиной в конце
+    ours = extractor.log_mel(padding=N_FRAMES)
+    assert ours.shape == ref.shape, (ours.shape, ref.shape)
+    for start in range(0, max(content, 1), N_FRAMES):
+        window = np.abs(ours[:, start:start + N_FRAMES] - ref[:, start:start + N_FRAMES])
+        assert window.shape[1] == N_FRAMES, window.shape
+        diff = max(diff, window.max())
+    assert diff < TOLERANCE, diff
+    return diff
+
+
+if __name__ == "__main__":
+    cases = {
+        "речь 12 с, кусочки по 0.25 с": (SyntheticSource("speech", duration=12).generate(), [4000]),
+        "шум 5 с, случайные кусочки": (SyntheticSource("noise", duration=5).generate(), [1, 37, 160, 999, 4000]),
+        "тон 0.5 с, мелкие кусочки": (SyntheticSource("tone", duration=0.5).generate(), [7, 50, 123]),
+        "очень короткая запись": (SyntheticSource("speech", duration=0.01).generate(), [64]),
+        "речь 40 с, два окна": (SyntheticSource("speech", duration=40).generate(), [4000]),
+    }
+    for name, (audio, sizes) in cases.items():
+        print(f"{name}: max |diff| = {check(audio, sizes):.2e}")
+    print("Паритет с whisper.log_mel_spectrogram подтвержден")
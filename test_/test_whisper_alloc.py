@@ -0,0 +1,80 @@
+import os
+import sys
+import tracemalloc
+import types
+import numpy as np
+
+# Выделения памяти живым циклом Whisper в установившемся режиме (tracemalloc).
+# Декодер заменен заглушкой (сам whisper выделяет память внутри torch - это не наш цикл):
+# меряем окно LocalAgreement, нормализацию AudioProcessor._transcribe и обрезку буфера.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "0_0_1_2a"))
+from streaming_policy import LocalAgreement
+from audio_processor_whisper import AudioProcessor
+
+RATE = 16000
+CHUNK_SIZE = RATE // 4
+WARMUP_PASSES = 60  # Окно успевает заполниться и хотя бы раз перенестись в начало
+PASSES = 200
+LIMIT_BYTES = 1024  # "Почти ноль" на проход (звук - мегабайты)
+
+
+def make_processor_stub():
+    """Объект с полями, которые нужны AudioProcessor._transcribe, без загрузки модели"""
+    stub = types.SimpleNamespace(_scratch=np.zeros(32 * RATE, dtype=np.float32))
+    stub.model = types.SimpleNamespace(transcribe=lambda audio, **kw: {"segments": []})
+    return stub
+
+
+def run_passes(policy, chunks, passes):
+    i = 0
+    for _ in range(passes):
+        while not policy.ready():
+            policy.insert_audio(chunks[i % len(chunks)])
+            i += 1
+        policy.process()
+
+
+def measure(label, policy, chunks):
+    run_passes(policy, chunks, WARMUP_PASSES)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    base = tracemalloc.get_traced_memory()[0]
+    peak_bytes = 0
+    for _ in range(PASSES):
+        tracemalloc.reset_peak()
+        run_passes(policy, chunks, 1)
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - base)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    print(f"{label}: прирост {allocated / PASSES:.0f} байт на проход, "
+          f"пик временных выделений {peak_bytes / 1024:.1f} КБ")
+    return allocated / PASSES, peak_bytes
+
+
+def old_loop_bytes(chunks):
+    """Для сравнения: буфер через np.concatenate и нормализация audio / peak, как было"""
+    buffer = np.zeros(0, dtype=np.float32)
+    tracemalloc.start()
+    peak_bytes = 0
+    for _ in range(PASSES):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for chunk in chunks[:4]:
+            buffer = np.concatenate((buffer, chunk))[-15 * RATE:]
+        normalized = buffer / np.max(np.abs(buffer))
+        del normalized
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return peak_bytes
+
+
+if __name__ == "__main__":
+    stub = make_processor_stub()
+    policy = LocalAgreement(lambda audio, prompt: AudioProcessor._transcribe(stub, audio, prompt), RATE)
+    chunks = [np.random.default_rng(i).standard_normal(CHUNK_SIZE).astype(np.float32) * 0.1 for i in range(8)]
+    per_pass, peak_bytes = measure("LocalAgreement + нормализация", policy, chunks)
+    print(f"Для сравнения, старый буфер: пик временных выделений {old_loop_bytes(chunks) / 1024:.0f} КБ на проход")
+    assert per_pass < LIMIT_BYTES, f"Прирост памяти на проход {per_pass:.0f} байт > {LIMIT_BYTES}"
+    assert peak_bytes < 64 * LIMIT_BYTES, f"Временные выделения на проход {peak_bytes} байт"
+    print("OK")